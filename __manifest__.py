@@ -1,7 +1,7 @@
 # __manifest__.py
 {
     'name': 'Custom WooCommerce API2',
-    'version': '1.0',
+    'version': '1.6',
     'category': 'Custom',
     'author': 'Tu Nombre',
     'description': 'Módulo para integrar WooCommerce con Odoo a través de una API personalizada.',
@@ -21,6 +21,14 @@
         'views/account_move_form_patch.xml',
         'views/res_partner_views.xml',
         'views/product_views.xml',
+        'views/woocommerce_order_queue_views.xml',
+        'views/sale_order_reprice_views.xml',
+        'views/report_bulk_render_views.xml',
+        'views/rent_billing_run_views.xml',
+        'views/woocommerce_outbox_views.xml',
+        'views/sale_order_installment_views.xml',
+        'views/portfolio_exposure_views.xml',
+        'data/ir_cron.xml',
     ],
     'controllers': [
         'controllers/main.py',
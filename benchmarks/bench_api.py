@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Query counts and timings of the API write paths.
+
+Orders go through woocommerce.order.import.import_orders and products
+through the same model calls as the /api/product endpoints, without the
+HTTP layer.
+
+    odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/bench_api.py
+"""
+from odoo.addons.custom_woocommerce_api.benchmarks.common import Recorder, make_products
+from odoo.addons.custom_woocommerce_api.benchmarks.payloads import order_payload, product_payload
+
+ORDER_LINE_COUNTS = (1, 10, 100)
+PRODUCT_COUNT = 50
+# Consultas extra toleradas entre el pedido de 1 línea y el de 100
+ORDER_SLACK = 10
+
+
+def bench_orders(env, recorder):
+    Import = env['woocommerce.order.import'].sudo()
+    skus = make_products(env, 40, prefix='BAPI').mapped('default_code')
+
+    for index, line_count in enumerate(ORDER_LINE_COUNTS):
+        payload = order_payload(index, skus, line_count, prefix='BAPI')
+        with recorder.measure('import_order', lines=line_count):
+            result = Import.import_orders([payload])[0]
+        assert result['status'] == 'success', result
+        with recorder.measure('replay_order', budget=3, lines=line_count):
+            replay = Import.import_orders([payload])[0]
+        assert replay.get('replayed'), replay
+
+    payloads = [order_payload(100 + i, skus, 10, prefix='BAPI') for i in range(20)]
+    with recorder.measure('import_batch', orders=len(payloads), lines=10):
+        results = Import.import_orders(payloads)
+    assert all(r['status'] == 'success' for r in results), results
+    recorder.check_flat('import_order', slack=ORDER_SLACK)
+    recorder.check_flat('replay_order')
+
+
+def bench_products(env, recorder):
+    Import = env['woocommerce.product.import'].sudo()
+    Product = env['product.product'].sudo()
+    payloads = [product_payload(i, prefix='BPRD') for i in range(PRODUCT_COUNT)]
+
+    # POST /api/product
+    for payload in payloads[:3]:
+        with recorder.measure('create_product', sku=payload['sku']):
+            assert not Product._get_id_by_sku(payload['sku'])
+            Product.create(Import._prepare_create_vals(payload))
+
+    # PUT /api/product
+    for payload in payloads[:3]:
+        with recorder.measure('update_product', sku=payload['sku']):
+            product = Product._get_by_sku(payload['sku'])
+            product.product_tmpl_id.write(Import._prepare_update_vals(dict(payload, sales_price='999')))
+
+    # POST /api/product/bulk
+    with recorder.measure('bulk_upsert', products=len(payloads)):
+        _results, counters = Import.upsert_products(payloads)
+    assert counters['failed'] == 0, counters
+
+    # DELETE /api/product
+    for payload in payloads[:3]:
+        with recorder.measure('delete_product', sku=payload['sku']):
+            Product._get_by_sku(payload['sku']).unlink()
+
+
+def run(env, recorder=None):
+    recorder = recorder or Recorder(env, 'api')
+    try:
+        bench_orders(env, recorder)
+        bench_products(env, recorder)
+    finally:
+        env.cr.rollback()
+    return recorder
+
+
+if __name__ == '__main__':
+    recorder = run(env)  # noqa: F821 (provided by odoo-bin shell)
+    recorder.dump()
+    recorder.check()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Query count and timing of the fused sale.order.line amount compute.
+
+    odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/bench_line_amounts.py
+"""
+from odoo.addons.custom_woocommerce_api.benchmarks.common import Recorder, make_order, make_products
+
+LINE_COUNTS = (1, 50, 500)
+
+
+def run(env):
+    recorder = Recorder(env, 'line_amounts')
+    partner = env['res.partner'].create({'name': 'Benchmark Customer'})
+    products = make_products(env, 20)
+    tax = env['account.tax'].create({'name': 'Bench VAT 20%', 'amount': 20.0, 'type_tax_use': 'sale'})
+
+    for count in LINE_COUNTS:
+        with recorder.measure('create_order', lines=count):
+            order = make_order(env, partner, products, count, taxes=tax)
+        with recorder.measure('change_installments', lines=count):
+            order.write({'installments': '48'})
+        with recorder.measure('change_warranty', lines=count):
+            order.write({'full_service_warranty_percentage': 12.5})
+        with recorder.measure('edit_one_line', lines=count):
+            order.order_line[:1].write({'product_uom_qty': 4})
+        with recorder.measure('edit_all_discounts', lines=count):
+            order.order_line.write({'discount_price': 7.5})
+
+    recorder.dump()
+    env.cr.rollback()
+
+
+if __name__ == '__main__':
+    run(env)  # noqa: F821 (provided by odoo-bin shell)
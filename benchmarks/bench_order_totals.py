@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Order totals: per-order path vs batch-loading path (timings and equality check).
+
+    odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/bench_order_totals.py
+"""
+from odoo.addons.custom_woocommerce_api.benchmarks.common import Recorder, make_order, make_products
+
+ORDER_COUNT = 1000
+TOTAL_FIELDS = [
+    'amount_untaxed', 'amount_tax', 'amount_total', 'amount_vat_20', 'amount_total_incl_vat_20',
+    'amount_total_sans_tva', 'list_price_total', 'margin_amount', 'margin_percent',
+]
+
+
+def recompute(env, orders):
+    for fname in TOTAL_FIELDS:
+        env.add_to_compute(orders._fields[fname], orders)
+    orders.flush_recordset(TOTAL_FIELDS)
+    return {o.id: tuple(o[f] for f in TOTAL_FIELDS) for o in orders}
+
+
+def run(env, order_count=ORDER_COUNT):
+    from odoo.addons.custom_woocommerce_api.models import sale_order_lines
+
+    recorder = Recorder(env, 'order_totals')
+    partner = env['res.partner'].create({'name': 'Benchmark Customer'})
+    products = make_products(env, 40)
+    orders = env['sale.order']
+    for i in range(order_count):
+        orders |= make_order(env, partner, products, 1 + i % 12, installments=('24', '36', '48', '60')[i % 4])
+    env.flush_all()
+
+    threshold = sale_order_lines.ORDER_TOTALS_BATCH_THRESHOLD
+    try:
+        sale_order_lines.ORDER_TOTALS_BATCH_THRESHOLD = order_count + 1
+        env.invalidate_all()
+        with recorder.measure('loop', orders=order_count):
+            loop_values = recompute(env, orders)
+
+        sale_order_lines.ORDER_TOTALS_BATCH_THRESHOLD = 1
+        env.invalidate_all()
+        with recorder.measure('batch', orders=order_count):
+            grouped_values = recompute(env, orders)
+    finally:
+        sale_order_lines.ORDER_TOTALS_BATCH_THRESHOLD = threshold
+
+    mismatches = [oid for oid in loop_values if loop_values[oid] != grouped_values[oid]]
+    recorder.results.append({'name': 'mismatches', 'params': {'orders': order_count}, 'count': len(mismatches)})
+    print(f"{len(mismatches)} orders with different stored totals")
+
+    recorder.dump()
+    env.cr.rollback()
+
+
+if __name__ == '__main__':
+    run(env)  # noqa: F821 (provided by odoo-bin shell)
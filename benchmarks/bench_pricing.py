@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Query counts and timings of the stored pricing computes and invoice numbering.
+
+    odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/bench_pricing.py
+"""
+from odoo.addons.custom_woocommerce_api.benchmarks.common import Recorder, make_order, make_products
+
+QUOTE_LINES = 10000
+TOTAL_ORDERS = 1000
+POST_COUNTS = (10, 500)
+
+
+def recompute(env, records, fnames):
+    for fname in fnames:
+        env.add_to_compute(records._fields[fname], records)
+    records.flush_recordset(fnames)
+
+
+def bench_price_quote(env, recorder, partner, products):
+    orders = env['sale.order']
+    for _ in range(QUOTE_LINES // 100):
+        orders |= make_order(env, partner, products, 100)
+    lines = orders.order_line
+    env.flush_all()
+    env.invalidate_all()
+    with recorder.measure('recompute_price_quote', lines=len(lines)):
+        recompute(env, lines, ['price_quote', 'display_price_quote'])
+    env.invalidate_all()
+    with recorder.measure('recompute_line_amounts', lines=len(lines)):
+        recompute(env, lines, ['effective_price_quote', 'price_subtotal', 'price_tax', 'price_total'])
+
+
+def bench_order_totals(env, recorder, partner, products):
+    orders = env['sale.order']
+    for i in range(TOTAL_ORDERS):
+        orders |= make_order(env, partner, products, 1 + i % 12)
+    env.flush_all()
+    for count in (10, TOTAL_ORDERS):
+        env.invalidate_all()
+        with recorder.measure('recompute_order_totals', orders=count):
+            recompute(env, orders[:count], ['amount_untaxed', 'amount_tax', 'amount_total', 'margin_amount'])
+    recorder.check_flat('recompute_order_totals', slack=5)
+
+
+def bench_numbering(env, recorder, partner, products):
+    Move = env['account.move']
+    for count in POST_COUNTS:
+        moves = Move.create([{
+            'move_type': 'out_invoice',
+            'partner_id': partner.id,
+            'invoice_date': '2099-01-15',
+            'invoice_line_ids': [(0, 0, {'product_id': products[i % len(products)].id, 'quantity': 1,
+                                         'price_unit': 100.0, 'tax_ids': [(6, 0, [])]})],
+        } for i in range(count)])
+        with recorder.measure('action_post', invoices=count):
+            moves.action_post()
+        numbers = moves.mapped('custom_display_number')
+        assert len(set(numbers)) == count, "duplicated custom invoice numbers"
+        moves.custom_display_number = False
+        env.flush_all()
+        with recorder.measure('custom_numbering', invoices=count):
+            moves._compute_custom_display_number()
+    recorder.check_flat('custom_numbering')
+
+
+def run(env, recorder=None):
+    recorder = recorder or Recorder(env, 'pricing')
+    try:
+        partner = env['res.partner'].create({'name': 'Benchmark Customer'})
+        products = make_products(env, 40, prefix='BPRC')
+        bench_price_quote(env, recorder, partner, products)
+        bench_order_totals(env, recorder, partner, products)
+        bench_numbering(env, recorder, partner, products)
+    finally:
+        env.cr.rollback()
+    return recorder
+
+
+if __name__ == '__main__':
+    recorder = run(env)  # noqa: F821 (provided by odoo-bin shell)
+    recorder.dump()
+    recorder.check()
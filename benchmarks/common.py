@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Helpers for the benchmark scripts of this module.
+
+The scripts run inside `odoo-bin shell`, which provides `env`:
+
+    odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/<script>.py
+
+or, from an open shell, `from odoo.addons.custom_woocommerce_api.benchmarks
+import <script>; <script>.run(env)`.
+
+Every script rolls its data back at the end, so it can run against a copy
+of the production database.
+
+Query counts are checked two ways: `check_flat` fails when a measure needs
+more queries for a bigger input (N+1), and with BENCH_BASELINE pointing to
+the JSON of a previous run, every measure must stay within the query count
+of that run. `run_all.py` writes all the suites to one file to compare
+before and after a deploy.
+"""
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class Recorder:
+    """Collect query counts and wall-clock timings, then dump them as JSON."""
+
+    def __init__(self, env, suite, baseline=None):
+        self.env = env
+        self.suite = suite
+        self.results = []
+        self.failures = []
+        # Resultados de una ejecución anterior ($BENCH_BASELINE): sus consultas son el presupuesto
+        self.baseline = {}
+        path = baseline or os.environ.get('BENCH_BASELINE')
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            for suite_data in data.get('suites', [data]):
+                if suite_data.get('suite') == suite:
+                    self.baseline = {self._key(e['name'], e['params']): e['queries'] for e in suite_data['results']}
+
+    @staticmethod
+    def _key(name, params):
+        return name + json.dumps(params, sort_keys=True)
+
+    @contextmanager
+    def measure(self, name, budget=None, **params):
+        """Record queries and ms of the block.
+
+        `budget` is the maximum number of queries allowed; without it, the
+        query count of the same measure in the baseline run is used.
+        """
+        if budget is None:
+            budget = self.baseline.get(self._key(name, params))
+        cr = self.env.cr
+        self.env.flush_all()
+        queries_before = cr.sql_log_count
+        started = time.perf_counter()
+        entry = {'name': name, 'params': params}
+        yield entry
+        self.env.flush_all()
+        entry['ms'] = round((time.perf_counter() - started) * 1000.0, 3)
+        entry['queries'] = cr.sql_log_count - queries_before
+        if budget is not None:
+            entry['budget'] = budget
+            if entry['queries'] > budget:
+                self.failures.append(f"{name} {params}: {entry['queries']} queries > budget {budget}")
+        self.results.append(entry)
+        print(f"{self.suite}/{name} {params}: {entry['queries']} queries, {entry['ms']} ms")
+
+    def check_flat(self, name, slack=0):
+        """The query count of `name` must not grow with its params (no N+1).
+
+        Compares the smallest and the largest run: the largest may use at
+        most `slack` more queries.
+        """
+        runs = [entry for entry in self.results if entry['name'] == name]
+        if len(runs) < 2:
+            return
+        first, last = runs[0], runs[-1]
+        if last['queries'] > first['queries'] + slack:
+            self.failures.append(
+                f"{name}: {first['queries']} queries for {first['params']} but "
+                f"{last['queries']} for {last['params']} (slack {slack})"
+            )
+
+    def check(self):
+        """Fail if a budget or a flatness check was exceeded."""
+        if self.failures:
+            raise AssertionError(f"{self.suite}: " + "; ".join(self.failures))
+
+    def dump(self, path=None):
+        """Write the results as JSON (default: $BENCH_OUTPUT or ./bench_<suite>.json)."""
+        path = path or os.environ.get('BENCH_OUTPUT') or f'bench_{self.suite}.json'
+        payload = self.as_dict()
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f"Results written to {path}")
+        return payload
+
+    def as_dict(self):
+        return {
+            'suite': self.suite,
+            'database': self.env.cr.dbname,
+            'host': platform.node(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'results': self.results,
+            'failures': self.failures,
+        }
+
+
+def make_products(env, count, prefix='BENCH'):
+    return env['product.product'].create([{
+        'name': f'{prefix} Product {i}',
+        'default_code': f'{prefix}-{i:05d}',
+        'list_price': 500.0 + 37.5 * (i % 40),
+        'x_brand_discount': float(i % 3) * 5.0,
+    } for i in range(count)])
+
+
+def make_order(env, partner, products, line_count, taxes=None, installments='36'):
+    order = env['sale.order'].create({'partner_id': partner.id, 'installments': installments})
+    env['sale.order.line'].create([{
+        'order_id': order.id,
+        'product_id': products[i % len(products)].id,
+        'product_uom_qty': 1 + i % 3,
+        'price_unit': products[i % len(products)].lst_price,
+        'discount_price': float(i % 4) * 2.5,
+        'include_full_service_warranty': bool(i % 2),
+        'tax_id': [(6, 0, taxes.ids if taxes else [])],
+    } for i in range(line_count)])
+    return order
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""Replay WooCommerce traffic against a running Odoo at a given concurrency.
+
+Standalone (standard library only, no network access besides the local
+Odoo): start Odoo with several workers, then
+
+    python3 benchmarks/load_replay.py --url http://localhost:8069 --db leasymat \\
+        --login admin --password admin --concurrency 16 --orders 500 --customers 40
+
+Phases:
+  1. products: POST /api/product for every SKU, each SKU sent twice
+     concurrently (creation race);
+  2. orders: POST /api/woocommerce/order with generated payloads (or the
+     NDJSON file given with --payloads), customers shared between orders
+     and a share of replays of the same WooCommerce id.
+
+A stub WordPress server records the outbox callbacks; with
+--configure-outbox the harness points `custom_woocommerce_api.outbox_url`
+to it (needs an administrator login).
+
+After the run the harness reports throughput, p50/p95/p99 latency and
+errors by category, then checks through JSON-RPC that no partner, product
+or order was created twice. The report can be written as JSON with
+--output.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import json
+import math
+import random
+import re
+import threading
+import time
+
+try:
+    from .payloads import order_payload, product_payload
+except ImportError:
+    from payloads import order_payload, product_payload
+
+
+# ---------- ODOO CLIENT ----------
+
+class OdooClient:
+    """JSON client with one keep-alive connection per thread and a shared session cookie."""
+
+    def __init__(self, url, timeout=60):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.cookie = None
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self._local.connection = cls(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def post(self, path, body):
+        """POST JSON; returns (http status, decoded body or None)."""
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        data = json.dumps(body).encode()
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request('POST', path, body=data, headers=headers)
+                response = connection.getresponse()
+                raw = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # Conexión keep-alive cerrada por el servidor: se reabre una vez
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        cookie = response.getheader('Set-Cookie')
+        if cookie and 'session_id=' in cookie and not self.cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        try:
+            return response.status, json.loads(raw) if raw else None
+        except ValueError:
+            return response.status, None
+
+    def authenticate(self, db, login, password):
+        status, body = self.post('/web/session/authenticate', {
+            'jsonrpc': '2.0', 'method': 'call', 'params': {'db': db, 'login': login, 'password': password},
+        })
+        if status != 200 or not body or body.get('error') or not (body.get('result') or {}).get('uid'):
+            raise SystemExit(f"Authentication failed: {status} {body}")
+
+    def call_kw(self, model, method, args, kwargs=None):
+        status, body = self.post(f'/web/dataset/call_kw/{model}/{method}', {
+            'jsonrpc': '2.0', 'method': 'call',
+            'params': {'model': model, 'method': method, 'args': args, 'kwargs': kwargs or {}},
+        })
+        if status != 200 or not body or body.get('error'):
+            raise RuntimeError(f"{model}.{method} failed: {status} {body and body.get('error')}")
+        return body['result']
+
+
+# ---------- STUB WORDPRESS ----------
+
+class StubWordPress(ThreadingHTTPServer):
+    """Receives the outbox callbacks and keeps them in memory."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        super().__init__(('127.0.0.1', port), StubWordPressHandler)
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/wp-json/leasymat/v1/order-status'
+
+
+class StubWordPressHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = {'raw': raw.decode(errors='replace')}
+        with self.server.lock:
+            self.server.callbacks.append(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+# ---------- LOAD ----------
+
+def categorize(status, body):
+    """'ok' or an error category: HTTP status, Odoo exception or API message."""
+    if status != 200:
+        return f'http_{status}'
+    if not isinstance(body, dict):
+        return 'invalid_response'
+    if body.get('error'):
+        data = body['error'].get('data') or {}
+        return f"exception:{data.get('name') or body['error'].get('message')}"
+    result = body.get('result')
+    if isinstance(result, dict) and result.get('status') == 'error':
+        # Mensajes agrupados sin identificadores (SKU, número de pedido...)
+        return 'api_error:' + re.sub(r'[\w.-]*\d[\w.-]*', '#', result.get('message') or '')[:80]
+    return 'ok'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_phase(client, name, requests_list, concurrency):
+    """POST every (path, body); returns the phase report and the per-request results."""
+    latencies, categories, results = [], Counter(), []
+    lock = threading.Lock()
+
+    def send(item):
+        path, body = item
+        started = time.perf_counter()
+        try:
+            status, response = client.post(path, body)
+            category = categorize(status, response)
+        except (OSError, http.client.HTTPException) as e:
+            status, response, category = None, None, f'connection:{type(e).__name__}'
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            categories[category] += 1
+            results.append((body, category, response))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, requests_list))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    report = {
+        'phase': name,
+        'requests': len(requests_list),
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(requests_list) / duration, 2) if duration else None,
+        'latency_ms': {
+            f'p{pct}': round(percentile(latencies, pct) * 1000.0, 1) if latencies else None
+            for pct in (50, 95, 99)
+        },
+        'max_ms': round(latencies[-1] * 1000.0, 1) if latencies else None,
+        'ok': categories.pop('ok', 0),
+        'errors': dict(categories.most_common()),
+    }
+    return report, results
+
+
+def load_payloads(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_requests(args, prefix):
+    skus = [f'{prefix}-{i:05d}' for i in range(args.products)]
+    products = [('/api/product', product_payload(i, prefix=prefix)) for i in range(args.products)]
+    products = products * 2  # cada SKU se envía dos veces a la vez
+    random.Random(1).shuffle(products)
+
+    if args.payloads:
+        orders = [{'order': payload.get('order', payload)} for payload in load_payloads(args.payloads)]
+    else:
+        rng = random.Random(2)
+        orders = []
+        for index in range(args.orders):
+            payload = order_payload(index, skus, rng.randint(1, args.max_lines), prefix=prefix,
+                                    customer_index=rng.randrange(args.customers))
+            orders.append({'order': payload})
+            if rng.random() < args.replay_ratio:
+                orders.append({'order': payload})  # reintento del plugin con el mismo id
+        rng.shuffle(orders)
+    return products, [('/api/woocommerce/order', body) for body in orders]
+
+
+# ---------- DUPLICATE CHECKS ----------
+
+def check_duplicates(client, prefix, order_results):
+    """Records created twice for the same business key during the run."""
+    checks = {}
+    pattern = f'{prefix.lower()}-%'
+
+    groups = client.call_kw('res.partner', 'read_group', [
+        [('email', '=ilike', pattern), ('parent_id', '=', False)], ['email'], ['email'],
+    ], {'lazy': False})
+    checks['partners_per_email'] = {g['email']: g['__count'] for g in groups if g['__count'] > 1}
+
+    groups = client.call_kw('product.product', 'read_group', [
+        [('default_code', '=like', f'{prefix}-%')], ['default_code'], ['default_code'],
+    ], {'lazy': False})
+    checks['products_per_sku'] = {g['default_code']: g['__count'] for g in groups if g['__count'] > 1}
+
+    groups = client.call_kw('sale.order', 'read_group', [
+        [('woo_order_id', '=like', f'{prefix}-WOO-%')], ['woo_order_id'], ['woo_order_id'],
+    ], {'lazy': False})
+    checks['orders_per_woo_id'] = {g['woo_order_id']: g['__count'] for g in groups if g['__count'] > 1}
+
+    # Respuestas distintas para el mismo pedido (dos sale.order distintos devueltos)
+    answered = defaultdict(set)
+    for body, category, response in order_results:
+        result = (response or {}).get('result') or {}
+        if category == 'ok' and result.get('order_id'):
+            answered[body['order'].get('id')].add(result['order_id'])
+    checks['order_ids_per_woo_id'] = {key: sorted(ids) for key, ids in answered.items() if len(ids) > 1}
+
+    # Informativo: contactos de entrega repetidos (misma dirección, mismo cliente)
+    groups = client.call_kw('res.partner', 'read_group', [
+        [('type', '=', 'delivery'), ('parent_id.email', '=ilike', pattern)],
+        ['street'], ['parent_id', 'street'],
+    ], {'lazy': False})
+    checks['repeated_delivery_addresses'] = sum(g['__count'] - 1 for g in groups if g['__count'] > 1)
+    return checks
+
+
+# ---------- MAIN ----------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--login', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--products', type=int, default=40, help="SKUs created in the product phase")
+    parser.add_argument('--orders', type=int, default=200, help="generated orders")
+    parser.add_argument('--customers', type=int, default=20, help="distinct customers shared by the orders")
+    parser.add_argument('--max-lines', type=int, default=10)
+    parser.add_argument('--replay-ratio', type=float, default=0.1, help="share of orders sent twice")
+    parser.add_argument('--payloads', help="NDJSON file of recorded order payloads instead of generated ones")
+    parser.add_argument('--prefix', help="prefix of generated SKUs, emails and order ids (default: per run)")
+    parser.add_argument('--configure-outbox', action='store_true',
+                        help="point the outbox to the stub WordPress server")
+    parser.add_argument('--callback-wait', type=float, default=0.0,
+                        help="seconds to wait for outbox callbacks after the run")
+    parser.add_argument('--output', help="write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    prefix = args.prefix or f'LOAD{int(time.time())}'
+
+    stub = StubWordPress()
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    client = OdooClient(args.url)
+    client.authenticate(args.db, args.login, args.password)
+    if args.configure_outbox:
+        client.call_kw('ir.config_parameter', 'set_param', ['custom_woocommerce_api.outbox_url', stub.url])
+
+    product_requests, order_requests = build_requests(args, prefix)
+    report = {'prefix': prefix, 'phases': []}
+    product_report, _ = run_phase(client, 'products', product_requests, args.concurrency)
+    report['phases'].append(product_report)
+    order_report, order_results = run_phase(client, 'orders', order_requests, args.concurrency)
+    report['phases'].append(order_report)
+
+    if args.callback_wait:
+        time.sleep(args.callback_wait)
+    callbacks = [c for c in stub.callbacks if str(c.get('woo_order_id', '')).startswith(prefix)]
+    report['callbacks'] = {
+        'received': len(callbacks),
+        'by_event': dict(Counter(c.get('event') for c in callbacks)),
+        'duplicates': sum(n - 1 for n in Counter(json.dumps(c, sort_keys=True) for c in callbacks).values()),
+    }
+    report['duplicates'] = check_duplicates(client, prefix, order_results)
+    stub.shutdown()
+
+    for phase in report['phases']:
+        print(f"[{phase['phase']}] {phase['requests']} requests in {phase['duration_s']}s "
+              f"({phase['throughput_rps']} req/s) p50={phase['latency_ms']['p50']}ms "
+              f"p95={phase['latency_ms']['p95']}ms p99={phase['latency_ms']['p99']}ms "
+              f"ok={phase['ok']}")
+        for category, count in phase['errors'].items():
+            print(f"    {count:6d}  {category}")
+    print(f"[callbacks] {report['callbacks']}")
+    problems = {k: v for k, v in report['duplicates'].items() if v and k != 'repeated_delivery_addresses'}
+    print(f"[duplicates] {'none' if not problems else problems}")
+    print(f"[info] repeated delivery addresses: {report['duplicates']['repeated_delivery_addresses']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Synthetic WooCommerce payloads, shaped like the ones the WordPress plugin sends."""
+import random
+
+COUNTRIES = ('FR', 'France', 'BE', 'Belgique', 'LU')
+INSTALLMENTS = ('24', '36', '48', '60')
+
+
+def product_payload(index, prefix='BENCH', **overrides):
+    """Body of POST/PUT /api/product."""
+    payload = {
+        'sku': f'{prefix}-{index:05d}',
+        'name': f'{prefix} Product {index}',
+        'sales_price': str(500.0 + 37.5 * (index % 40)),
+        'description': f'Synthetic product {index}',
+        'discount': float(index % 3) * 5.0,
+        'product_url': f'https://shop.example.com/product/{prefix.lower()}-{index}',
+    }
+    payload.update(overrides)
+    return payload
+
+
+def order_payload(index, skus, line_count, prefix='BENCH', seed=None, existing_customer=False, customer_index=None):
+    """Content of `order` in POST /api/woocommerce/order.
+
+    Each order gets a new customer unless `existing_customer` is set, in
+    which case every order uses the same email, or `customer_index` is
+    given, in which case orders with the same index share a customer.
+    """
+    rng = random.Random(seed if seed is not None else index)
+    if existing_customer:
+        email = f'{prefix.lower()}-customer@example.com'
+    elif customer_index is not None:
+        email = f'{prefix.lower()}-customer-{customer_index}@example.com'
+    else:
+        email = f'{prefix.lower()}-{index}@example.com'
+    address = {
+        'street': f'{index} rue de la Paix',
+        'city': 'Paris',
+        'zip_code': f'750{index % 20 + 1:02d}',
+        'country': rng.choice(COUNTRIES),
+    }
+    return {
+        'id': f'{prefix}-WOO-{index}',
+        'customer': {'name': f'{prefix} Customer {index}', 'email': email, 'siren': f'{index:09d}'},
+        'billing': {'address': address},
+        'shipping': {'address': dict(address, street=f'{index} avenue Foch')} if index % 2 else {},
+        'quote': rng.choice(INSTALLMENTS),
+        'metadata': {'order_note': f'Synthetic order {index}'},
+        'products': [{
+            'sku': skus[(index + i) % len(skus)],
+            'quantity': 1 + rng.randrange(3),
+            'price_discount': rng.choice(('', 0, 5, 10)),
+            'price_quote': rng.choice(('', 0, 120.5)),
+        } for i in range(line_count)],
+    }
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Run every benchmark suite and write one JSON file to compare deploys.
+
+    BENCH_OUTPUT=before.json odoo-bin shell -c /etc/odoo/odoo.conf -d leasymat --no-http < benchmarks/run_all.py
+    BENCH_BASELINE=before.json BENCH_OUTPUT=after.json odoo-bin shell ... < benchmarks/run_all.py
+
+With BENCH_BASELINE, a measure that needs more queries than in the
+baseline run is reported as a failure.
+"""
+import json
+import os
+
+from odoo.addons.custom_woocommerce_api.benchmarks import bench_api, bench_pricing
+from odoo.addons.custom_woocommerce_api.benchmarks.common import Recorder
+
+SUITES = {'api': bench_api, 'pricing': bench_pricing}
+
+
+def run(env):
+    recorders = [module.run(env, Recorder(env, suite)) for suite, module in SUITES.items()]
+    path = os.environ.get('BENCH_OUTPUT') or 'bench_all.json'
+    with open(path, 'w') as f:
+        json.dump({'suites': [recorder.as_dict() for recorder in recorders]}, f, indent=2)
+    print(f"Results written to {path}")
+    failures = [failure for recorder in recorders for failure in recorder.failures]
+    if failures:
+        raise AssertionError("; ".join(failures))
+
+
+if __name__ == '__main__':
+    run(env)  # noqa: F821 (provided by odoo-bin shell)
@@ -1,2 +1,4 @@
+from . import payload
 from . import main
-from . import product_api
\ No newline at end of file
+from . import product_api
+from . import metrics
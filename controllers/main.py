@@ -1,139 +1,98 @@
 from odoo import http
 from odoo.http import request
-import json
+from ..models.woocommerce_order_import import is_concurrency_error
+from ..tools import payload_schema
+from ..tools.payload_schema import PayloadError
+from ..tools.metrics import track_endpoint
+from .payload import json_body
 
 class WooCommerceAPIController(http.Controller):
 
     @http.route('/api/woocommerce/order', auth='user', methods=['POST'], type='json', csrf=False)
+    @track_endpoint('receive_order')
     def receive_order(self, **post):
         try:
-            # If type='json', post might already be parsed, but we keep this defensive parse.
-            raw = request.httprequest.data
-            data = json.loads(raw) if raw else (post or {})
+            # Cuerpo ya decodificado por el dispatcher JSON (una sola decodificación)
+            data = json_body(post)
 
             order_data = (data or {}).get('order', {})
-            customer_data = order_data.get('customer', {}) or {}
-            products_data = order_data.get('products', []) or []
-            
-            # Datos de dirección: Billing (Principal) y Shipping (Entrega)
-            billing_data = (order_data.get('billing', {}) or {}).get('address', {}) or {}
-            shipping_data = (order_data.get('shipping', {}) or {}).get('address', {}) or {}
-            
-            # Usamos Billing como dirección principal. Si falta, fallback a Shipping (por seguridad)
-            main_address = billing_data if billing_data.get('street') else shipping_data
-            
-            metadata = order_data.get('metadata', {}) or {}
-
-            # installments (quote) - normalize to the string keys used by your PALIER dict
-            installments_in = order_data.get('quote', '24')
-            installments = str(installments_in or '24')
-            if installments not in {'12', '24', '36', '48', '60'}:
-                installments = '24'  # default safe fallback
-
-
-
-            if not customer_data or not products_data:
-                return {"status": "error", "message": "Missing required fields: customer or products"}
-
-            # 0) Resolver ID del País (Buscando por Código ISO o Nombre)
-            country_id = False
-            country_input = (main_address.get('country') or '').strip()
-            if country_input:
-                country = request.env['res.country'].sudo().search([
-                    '|', ('code', '=', country_input.upper()), ('name', '=', country_input)
-                ], limit=1)
-                country_id = country.id
-
-            # Find or create customer
-            partner = request.env['res.partner'].sudo().search([('email', '=', customer_data.get('email'))], limit=1)
-            if not partner:
-                partner_vals = {
-                    'name': customer_data.get('name') or 'Customer',
-                    'email': customer_data.get('email') or '',
-                    'siren': customer_data.get('siren', '') or '',
-                    'street': main_address.get('street', '') or '',
-                    'city': main_address.get('city', '') or '',
-                    'zip': main_address.get('zip_code', '') or '',  # Mapeo zip_code -> zip
-                    'country_id': country_id,
-                }
-                partner = request.env['res.partner'].sudo().create(partner_vals)
-            else:
-                # Si el cliente existe, actualizamos su dirección con la nueva info (si la hay)
-                partner.sudo().write({
-                    'street': main_address.get('street', '') or partner.street,
-                    'city': main_address.get('city', '') or partner.city,
-                    'zip': main_address.get('zip_code', '') or partner.zip,
-                    'country_id': country_id or partner.country_id.id,
-                    'siren': customer_data.get('siren', '') or partner.siren,
-                })
-
-            # 1) Create the order first (installments set up-front)
-            sale_order_vals = {
-                'partner_id': partner.id,
-                'note': metadata.get('order_note', '') or '',
-                'installments': installments,   # critical: parent has value before lines
-            }
-            sale_order = request.env['sale.order'].sudo().create(sale_order_vals)
-
-            # 2) Now create lines referencing the existing order
-            for p in products_data:
-                sku = (p or {}).get('sku')
-                qty = (p or {}).get('quantity', 1) or 1
-
-                if not sku:
-                    return {"status": "error", "message": "One of the products is missing SKU"}
-
-                odoo_product = request.env['product.product'].sudo().search([('default_code', '=', sku)], limit=1)
-                if not odoo_product:
-                    return {"status": "error", "message": f"Product with SKU {sku} not found"}
-
-                discount = float((p or {}).get('price_discount', 0.0)) if (p or {}).get('price_discount') not in (None, '') else 0.0
-
-                # price_quote from metadata (manual override per month)
-                try:
-                    manual_quote = float((p or {}).get('price_quote', 0.0)) if (p or {}).get('price_quote') not in (
-                    None, '') else 0.0
-                except (TypeError, ValueError):
-                    manual_quote = 0.0
-
-
-                line_vals = {
-                    'order_id': sale_order.id,
-                    'product_id': odoo_product.id,
-                    'product_uom_qty': qty,
-                    'price_unit': odoo_product.lst_price,
-                    'price_quote': manual_quote if manual_quote > 0 else 0.0,
-                    'display_price_quote': manual_quote if manual_quote > 0 else 0.0,
-                    'discount_price': discount
-                }
-
-                request.env['sale.order.line'].sudo().create(line_vals)
-
-            # 3) Shipping partner (optional)
-            if any(shipping_data.values()):
-                # Usamos el country_id ya resuelto arriba para evitar errores con códigos ISO
-                shipping_partner = request.env['res.partner'].sudo().create({
-                    'name': partner.name,
-                    'street': shipping_data.get('street', '') or '',
-                    'city': shipping_data.get('city', '') or '',
-                    'zip': shipping_data.get('zip_code', '') or '',
-                    'country_id': country_id,
-                    'type': 'delivery',
-                    'parent_id': partner.id,
-                })
-                sale_order.sudo().write({'partner_shipping_id': shipping_partner.id})
-
-            # (Optional) Force ORM to flush and ensure computes stored on lines are finalized
-            sale_order.flush()
-            sale_order.invalidate_cache()
 
+            # Modo asíncrono: se guarda el payload y se responde con un ticket
+            if (data or {}).get('async') or 'respond-async' in (request.httprequest.headers.get('Prefer') or ''):
+                return self._enqueue_order(order_data)
+
+            return request.env['woocommerce.order.import'].sudo().import_orders([order_data])[0]
+
+        except Exception as e:
+            if is_concurrency_error(e):
+                raise  # Odoo vuelve a ejecutar la petición con backoff
+            return {"status": "error", "message": f"Error: {str(e)}"}
+
+    @http.route('/api/woocommerce/orders/batch', auth='user', methods=['POST'], type='json', csrf=False)
+    @track_endpoint('receive_orders_batch')
+    def receive_orders_batch(self, **post):
+        """Create many orders in one call: {"orders": [<order>, ...]}.
+
+        Each item has the same shape as `order` in /api/woocommerce/order and
+        gets its own `status`/`message` entry in `results`.
+        """
+        try:
+            data = json_body(post)
+
+            orders = (data or {}).get('orders')
+            if not orders or not isinstance(orders, list):
+                return {"status": "error", "message": "Missing required field: orders"}
+
+            # Se aceptan tanto pedidos sueltos como envueltos en {"order": {...}}
+            orders = [(o or {}).get('order', o) if isinstance(o, dict) else o for o in orders]
+            results = request.env['woocommerce.order.import'].sudo().import_orders(orders)
+
+            created = sum(1 for r in results if r['status'] == 'success')
             return {
                 "status": "success",
-                "message": "Order created successfully",
-                "order_id": sale_order.id,
-                "order_name": sale_order.name,
-                "installments": installments,
+                "message": f"{created} orders created, {len(results) - created} failed",
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
             }
 
         except Exception as e:
-            return {"status": "error", "message": f"Error: {str(e)}"}
\ No newline at end of file
+            if is_concurrency_error(e):
+                raise  # Odoo vuelve a ejecutar la petición con backoff
+            return {"status": "error", "message": f"Error: {str(e)}"}
+
+    def _enqueue_order(self, order_data):
+        importer = request.env['woocommerce.order.import'].sudo()
+        # Un payload inválido se rechaza aquí en lugar de llegar a la cola
+        try:
+            payload_schema.validate_order(order_data)
+        except PayloadError as e:
+            return e.to_response()
+
+        # Un reintento de un pedido ya importado recibe la respuesta original
+        key = importer._order_key(order_data)
+        if key:
+            imported = importer._find_imported_orders([key])
+            if key in imported:
+                return imported[key]
+
+        row = request.env['woocommerce.order.queue'].sudo().enqueue(order_data)
+        return {"status": "accepted", "message": "Order queued for processing", "ticket": row.ticket}
+
+    @http.route('/api/woocommerce/order/status', auth='user', methods=['POST'], type='json', csrf=False)
+    def order_status(self, **post):
+        """Poll an asynchronous order: {"ticket": "<ticket>"}."""
+        try:
+            data = json_body(post)
+
+            ticket = (data or {}).get('ticket')
+            if not ticket:
+                return {"status": "error", "message": "Missing required field: ticket"}
+
+            row = request.env['woocommerce.order.queue'].sudo().search([('ticket', '=', ticket)], limit=1)
+            if not row:
+                return {"status": "error", "message": f"Ticket {ticket} not found"}
+            return row._status_response()
+
+        except Exception as e:
+            return {"status": "error", "message": f"Error: {str(e)}"}
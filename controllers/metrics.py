@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+from odoo.tools import config
+from ..tools import metrics
+import hmac
+
+
+class MetricsController(http.Controller):
+
+    @http.route('/metrics', auth='none', methods=['GET'], type='http', csrf=False, save_session=False)
+    def metrics(self, **kw):
+        """Metrics of every worker in the Prometheus text format.
+
+        With `metrics_token` in the configuration file the scraper must send
+        `Authorization: Bearer <token>`; without it only local scrapes are
+        answered.
+        """
+        token = config.get('metrics_token')
+        if token:
+            sent = (request.httprequest.headers.get('Authorization') or '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(sent, token):
+                return request.make_response('Unauthorized\n', status=401)
+        elif request.httprequest.remote_addr not in ('127.0.0.1', '::1'):
+            return request.make_response('Forbidden\n', status=403)
+        return request.make_response(
+            metrics.render(), headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')]
+        )
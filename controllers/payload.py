@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from odoo.http import request
+
+
+def json_body(post=None):
+    """Body of a type='json' request, as already decoded by Odoo's JSON dispatcher.
+
+    WordPress posts the payload as the whole body (not as JSON-RPC
+    `params`), so the controllers read the dispatcher's decoded document
+    instead of parsing `request.httprequest.data` a second time.
+    """
+    data = getattr(request.dispatcher, 'jsonrequest', None)
+    if data is None:
+        data = post or {}
+    return data
@@ -1,77 +1,122 @@
-from odoo import http
+from odoo import http, api
 from odoo.http import request
+from datetime import datetime
+import base64
+import hashlib
 import json
+import logging
+import threading
+from ..tools import payload_schema
+from ..tools.payload_schema import PayloadError
+from ..tools.metrics import track_endpoint
+from .payload import json_body
+
+_logger = logging.getLogger(__name__)
+
+# Filas aplicadas (y confirmadas) por lote en la importación NDJSON
+STREAM_BATCH_SIZE = 500
+
+# Tamaño de página de GET /api/product
+EXPORT_PAGE_SIZE = 200
+EXPORT_MAX_PAGE_SIZE = 1000
 
 class ProductAPIController(http.Controller):
 
     @http.route('/api/product', auth='user', methods=['POST'], type='json', csrf=False)
+    @track_endpoint('create_product')
     def create_product(self, **post):
         try:
-            data = json.loads(request.httprequest.data)
-            
-            name = data.get('name')
-            if not name:
-                return {"status": "error", "message": "Missing required field: name"}
-
+            data = payload_schema.validate_product_create(json_body(post))
             sku = data.get('sku')
-            sales_price = data.get('sales_price')
-            description = data.get('description')
-            discount = data.get('discount') # Nuevo campo
-            product_url = data.get('product_url') # Nuevo campo URL
 
             if sku:
-                product = request.env['product.product'].sudo().search([('default_code', '=', sku)], limit=1)
-                if product:
+                if request.env['product.product'].sudo()._get_id_by_sku(sku):
                     return {"status": "error", "message": f"Product with SKU {sku} already exists"}
 
-            new_product = request.env['product.product'].sudo().create({
-                'default_code': sku,
-                'name': name,
-                'list_price': float(sales_price) if sales_price else 0.0,
-                'description': description,
-                # Guardamos el descuento en el nuevo campo creado en el paso 1
-                'x_brand_discount': float(discount) if discount else 0.0,
-                'x_product_url': product_url or '',
-            })
+            # Mismo mapeo que la importación masiva (descuento y URL incluidos)
+            vals = request.env['woocommerce.product.import']._prepare_create_vals(data)
+            new_product = request.env['product.product'].sudo().create(vals)
 
             return {"status": "success", "message": "Product created successfully", "product_id": new_product.id}
 
+        except PayloadError as e:
+            return e.to_response()
         except Exception as e:
             return {"status": "error", "message": f"Error: {str(e)}"}
 
-    @http.route('/api/product', auth='user', methods=['PUT'], type='json', csrf=False)
-    def update_product(self, **post):
+    @http.route('/api/product', auth='user', methods=['GET'], type='http', csrf=False)
+    @track_endpoint('export_products')
+    def export_products(self, cursor=None, since=None, limit=None, **kw):
+        """Export sku, list_price, x_brand_discount, x_product_url, active and write_date.
+
+        Pages are ordered by (write_date, id): pass the `next_cursor` of a
+        page as `cursor` to get the next one, or `since` (ISO datetime) to
+        pull the products changed after that date. Archived products are
+        exported with `active: false`; deleted ones are not reported, so
+        products should be archived rather than deleted.
+
+        write_date is the time a transaction started, not when it committed:
+        a transaction still running while a later page is read commits rows
+        with an older write_date, which a cursor already past them never
+        returns. `since` pulls must therefore overlap the previous pull by
+        the longest transaction on products (e.g. since = last pull - 1 hour).
+
+        The response carries a strong ETag computed from the page keys
+        (template and exported variant SKU, active flag and write dates); a
+        request with a matching If-None-Match gets 304 without reading or
+        serializing the products.
+        """
         try:
-            data = json.loads(request.httprequest.data)
+            limit = min(max(int(limit or EXPORT_PAGE_SIZE), 1), EXPORT_MAX_PAGE_SIZE)
+            if cursor:
+                after = self._decode_cursor(cursor)
+            elif since:
+                after = (datetime.fromisoformat(since), 0)
+            else:
+                after = None
+        except ValueError as e:
+            return request.make_json_response({"status": "error", "message": f"Error: {str(e)}"}, status=400)
 
-            sku = data.get('sku')
-            name = data.get('name')
-            sales_price = data.get('sales_price')
-            description = data.get('description')
-            discount = data.get('discount') # Nuevo campo
-            product_url = data.get('product_url') # Nuevo campo URL
+        Template = request.env['product.template'].sudo()
+        keys = Template._woo_export_keys(after, limit)
+        digest = hashlib.sha256(repr((after, limit, keys)).encode()).hexdigest()
+        headers = [('ETag', f'"{digest}"'), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(digest):
+            return request.make_response(b'', headers=headers, status=304)
 
-            if not sku:
-                return {"status": "error", "message": "Missing required field: sku"}
+        next_cursor = self._encode_cursor(keys[-1][1], keys[-1][0]) if keys else cursor
+        return request.make_json_response({
+            "status": "success",
+            "count": len(keys),
+            "has_more": len(keys) == limit,
+            "next_cursor": next_cursor,
+            "products": Template._woo_export_rows([key[0] for key in keys]),
+        }, headers=headers)
 
-            product = request.env['product.product'].sudo().search([('default_code', '=', sku)], limit=1)
+    @staticmethod
+    def _encode_cursor(write_date, record_id):
+        return base64.urlsafe_b64encode(f"{write_date.isoformat()}|{record_id}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            write_date, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(write_date), int(record_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+
+    @http.route('/api/product', auth='user', methods=['PUT'], type='json', csrf=False)
+    @track_endpoint('update_product')
+    def update_product(self, **post):
+        try:
+            data = payload_schema.validate_product_update(json_body(post))
+            sku = data['sku']
+
+            product = request.env['product.product'].sudo()._get_by_sku(sku)
             if not product:
                 return {"status": "error", "message": f"Product with SKU {sku} not found"}
 
-            update_vals = {}
-            if name:
-                update_vals['name'] = name
-            if sales_price:
-                update_vals['list_price'] = float(sales_price)
-            if description:
-                update_vals['description'] = description
-            
-            # Actualizamos el descuento si viene en el JSON
-            if discount is not None:
-                update_vals['x_brand_discount'] = float(discount)
-
-            if product_url is not None:
-                update_vals['x_product_url'] = product_url
+            update_vals = request.env['woocommerce.product.import']._prepare_update_vals(data)
 
             # Escribimos directamente en la plantilla del producto (product.template)
             # ya que todos los campos que actualizamos (name, list_price, x_brand_discount, x_product_url)
@@ -80,24 +125,140 @@ class ProductAPIController(http.Controller):
 
             return {"status": "success", "message": "Product updated successfully", "product_id": product.id}
 
+        except PayloadError as e:
+            return e.to_response()
         except Exception as e:
             return {"status": "error", "message": f"Error: {str(e)}"}
 
     @http.route('/api/product', auth='user', methods=['DELETE'], type='json', csrf=False)
+    @track_endpoint('delete_product')
     def delete_product(self, **post):
         try:
-            data = json.loads(request.httprequest.data)
-            sku = data.get('sku')
-
-            if not sku:
-                return {"status": "error", "message": "Missing required field: sku"}
+            sku = payload_schema.validate_product_ref(json_body(post))['sku']
 
-            product = request.env['product.product'].sudo().search([('default_code', '=', sku)], limit=1)
+            product = request.env['product.product'].sudo()._get_by_sku(sku)
             if not product:
                 return {"status": "error", "message": f"Product with SKU {sku} not found"}
 
             product.unlink()
             return {"status": "success", "message": "Product deleted successfully"}
 
+        except PayloadError as e:
+            return e.to_response()
         except Exception as e:
-            return {"status": "error", "message": f"Error: {str(e)}"}
\ No newline at end of file
+            return {"status": "error", "message": f"Error: {str(e)}"}
+
+    @http.route('/api/product/sku_cache', auth='user', methods=['POST'], type='json', csrf=False)
+    def sku_cache_stats(self, **post):
+        """Hit/miss counters of the SKU resolution cache (worker serving the call)."""
+        return {"status": "success", "message": "SKU cache statistics",
+                **request.env['product.product'].sudo()._sku_cache_stats()}
+
+    @http.route('/api/product/bulk', auth='user', methods=['POST'], type='json', csrf=False)
+    @track_endpoint('upsert_products')
+    def upsert_products(self, **post):
+        """Create or update many products by SKU: {"products": [<product>, ...]}.
+
+        Each item uses the same fields as POST/PUT /api/product.
+        """
+        try:
+            data = json_body(post)
+
+            items = data.get('products') if isinstance(data, dict) else None
+            if not items or not isinstance(items, list):
+                return {"status": "error", "message": "Missing required field: products"}
+
+            results, counters = request.env['woocommerce.product.import'].sudo().upsert_products(items)
+
+            return {
+                "status": "success",
+                "message": "{created} created, {updated} updated, {skipped} skipped, {failed} failed".format(**counters),
+                **counters,
+                "results": results,
+            }
+
+        except Exception as e:
+            return {"status": "error", "message": f"Error: {str(e)}"}
+
+
+    @http.route('/api/product/stream', auth='user', methods=['POST'], type='http', csrf=False)
+    @track_endpoint('stream_products')
+    def stream_products(self, batch_size=None, **post):
+        """Create or update products from newline-delimited JSON (one product per line).
+
+        Each line uses the same fields as POST/PUT /api/product. Lines are
+        read from the request stream and applied in committed batches of
+        STREAM_BATCH_SIZE, and one JSON line is sent back per batch, so
+        memory does not grow with the size of the catalog.
+        """
+        try:
+            batch_size = max(int(batch_size or STREAM_BATCH_SIZE), 1)
+        except ValueError as e:
+            return request.make_json_response({"status": "error", "message": f"Error: {str(e)}"}, status=400)
+        body = self._stream_import(
+            request.env.registry, request.env.uid, dict(request.env.context),
+            request.httprequest.stream, batch_size,
+        )
+        return request.make_response(body, headers=[('Content-Type', 'application/x-ndjson')])
+
+    @staticmethod
+    def _iter_ndjson_batches(stream, batch_size):
+        """Yield lists of (line number, item or error message) read line by line from `stream`."""
+        batch = []
+        for number, raw in enumerate(iter(stream.readline, b''), start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                batch.append((number, json.loads(raw)))
+            except ValueError as e:
+                batch.append((number, f"Invalid JSON: {e}"))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @classmethod
+    def _stream_import(cls, registry, uid, context, stream, batch_size):
+        """Response body generator: it runs after the request cursor is closed, so it uses its own."""
+        threading.current_thread().dbname = registry.db_name
+        totals = {'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            Import = env['woocommerce.product.import'].sudo()
+            for index, batch in enumerate(cls._iter_ndjson_batches(stream, batch_size), start=1):
+                lines = [number for number, item in batch]
+                items = [item for number, item in batch if not isinstance(item, str)]
+                try:
+                    results, counters = Import.upsert_products(items)
+                    cr.commit()
+                except Exception as e:
+                    cr.rollback()
+                    _logger.exception("NDJSON product import failed on batch %s", index)
+                    results = [{"sku": item.get('sku') if isinstance(item, dict) else None,
+                                "status": "error", "message": f"Error: {str(e)}"} for item in items]
+                    counters = {'created': 0, 'updated': 0, 'skipped': 0, 'failed': len(items)}
+                # Liberamos la caché del ORM entre lotes
+                env.invalidate_all()
+
+                # Reinsertamos los errores de JSON en su posición
+                results = iter(results)
+                batch_results = []
+                for number, item in batch:
+                    if isinstance(item, str):
+                        counters['failed'] += 1
+                        batch_results.append({"line": number, "status": "error", "message": item})
+                    else:
+                        batch_results.append(dict(next(results), line=number))
+                for key in totals:
+                    totals[key] += counters[key]
+                yield json.dumps({"batch": index, "first_line": lines[0], "last_line": lines[-1],
+                                  **{key: counters[key] for key in totals},
+                                  "results": batch_results}) + "\n"
+
+        yield json.dumps({
+            "status": "success",
+            "message": "{created} created, {updated} updated, {skipped} skipped, {failed} failed".format(**totals),
+            **totals,
+        }) + "\n"
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Seed the invoice number counters from the moves already posted."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['account.move.display.counter']._seed_from_moves()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import logging
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+
+
+def migrate(cr, version):
+    """Create and fill the stored VAT 20% totals of account.move in SQL.
+
+    The columns exist before the registry loads the new field definitions,
+    so the ORM does not recompute every move one by one during the update.
+    """
+    cr.execute("""
+        ALTER TABLE account_move
+            ADD COLUMN IF NOT EXISTS amount_vat_20 numeric,
+            ADD COLUMN IF NOT EXISTS amount_total_incl_vat_20 numeric
+    """)
+    cr.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM account_move")
+    min_id, max_id = cr.fetchone()
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        # Mismo cálculo que _compute_iva_20: base = suma de price_subtotal, IVA redondeado a la moneda
+        cr.execute("""
+            WITH base AS (
+                SELECT m.id,
+                       COALESCE(SUM(l.price_subtotal), 0) AS total_base,
+                       COALESCE(c.rounding, 0.01) AS rounding
+                  FROM account_move m
+             LEFT JOIN account_move_line l
+                    ON l.move_id = m.id AND l.display_type IN ('product', 'line_section', 'line_note')
+             LEFT JOIN res_currency c ON c.id = m.currency_id
+                 WHERE m.id >= %s AND m.id < %s
+              GROUP BY m.id, c.rounding
+            ), vat AS (
+                SELECT id, total_base, ROUND(total_base * 0.2 / rounding) * rounding AS vat_amount
+                  FROM base
+            )
+            UPDATE account_move m
+               SET amount_vat_20 = vat.vat_amount,
+                   amount_total_incl_vat_20 = vat.total_base + vat.vat_amount
+              FROM vat
+             WHERE m.id = vat.id
+        """, [start, start + BATCH_SIZE])
+        _logger.info("VAT 20%% totals backfilled up to move %s", min(start + BATCH_SIZE - 1, max_id))
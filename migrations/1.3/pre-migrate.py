@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Create res_partner.woo_address_hash in SQL.
+
+    The column exists before the field is loaded, so the ORM does not
+    compute it for every partner during the update. It is filled by
+    migrations/1.6 for the delivery contacts of the WooCommerce import.
+    """
+    cr.execute("ALTER TABLE res_partner ADD COLUMN IF NOT EXISTS woo_address_hash varchar")
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def migrate(cr, version):
+    """Build the installment schedule of the confirmed contracts and link the rent invoices already issued."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Installment = env['sale.order.installment']
+    cr.execute("SELECT id FROM sale_order WHERE state = 'sale' AND financing_start_date IS NOT NULL ORDER BY id")
+    order_ids = [row[0] for row in cr.fetchall()]
+    inserted = 0
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        inserted += Installment._sync_schedule(order_ids[start:start + BATCH_SIZE])[2]
+    Installment._mark_invoiced(env['account.move'].search([('rent_order_id', '!=', False)]))
+    _logger.info("Installment schedule: %s rows for %s contracts", inserted, len(order_ids))
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Build the portfolio exposure summary in the background (first run is a full refresh)."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env.ref('custom_woocommerce_api.ir_cron_refresh_portfolio_exposure')._trigger()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Flag the delivery contacts created by the WooCommerce import and merge their duplicates,
+    then rebuild the portfolio exposure summary, now bucketed by due month.
+
+    Only contacts used as shipping address by WooCommerce orders, and by no
+    other order, are considered: contacts entered by users are left alone.
+    For each customer, recipient and address (same key as
+    `delivery_address_hash` in models/res_partner.py) the oldest contact is
+    flagged and keyed; the shipping address of the WooCommerce orders and
+    their invoices is repointed to it and the other contacts are archived.
+    """
+    cr.execute("""
+        CREATE TEMP TABLE woo_delivery_candidates ON COMMIT DROP AS
+        SELECT p.id, p.parent_id,
+               md5(concat_ws('|',
+                   lower(trim(regexp_replace(coalesce(p.name, ''), '\\s+', ' ', 'g'))),
+                   lower(trim(regexp_replace(coalesce(p.street, ''), '\\s+', ' ', 'g'))),
+                   lower(trim(regexp_replace(coalesce(p.street2, ''), '\\s+', ' ', 'g'))),
+                   lower(trim(regexp_replace(coalesce(p.zip, ''), '\\s+', ' ', 'g'))),
+                   lower(trim(regexp_replace(coalesce(p.city, ''), '\\s+', ' ', 'g'))),
+                   coalesce(p.country_id::text, ''))) AS address_hash
+          FROM res_partner p
+         WHERE p.type = 'delivery' AND p.active AND p.parent_id IS NOT NULL
+           AND EXISTS (SELECT 1 FROM sale_order o WHERE o.partner_shipping_id = p.id AND o.woo_order_id IS NOT NULL)
+           AND NOT EXISTS (SELECT 1 FROM sale_order o WHERE o.partner_shipping_id = p.id AND o.woo_order_id IS NULL)
+    """)
+    cr.execute("""
+        CREATE TEMP TABLE woo_delivery_merge ON COMMIT DROP AS
+        SELECT id, parent_id, address_hash,
+               min(id) OVER (PARTITION BY parent_id, address_hash) AS keep_id
+          FROM woo_delivery_candidates
+    """)
+    cr.execute("""
+        UPDATE res_partner p
+           SET woo_delivery = TRUE, woo_address_hash = m.address_hash
+          FROM woo_delivery_merge m
+         WHERE p.id = m.id AND m.id = m.keep_id
+    """)
+    flagged = cr.rowcount
+    for table in ('sale_order', 'account_move'):
+        cr.execute(f"""
+            UPDATE {table} t
+               SET partner_shipping_id = m.keep_id
+              FROM woo_delivery_merge m
+             WHERE t.partner_shipping_id = m.id AND m.id <> m.keep_id
+        """)
+    cr.execute("""
+        UPDATE res_partner p
+           SET active = FALSE
+          FROM woo_delivery_merge m
+         WHERE p.id = m.id AND m.id <> m.keep_id
+    """)
+    _logger.info("WooCommerce delivery contacts: %s flagged, %s duplicates archived", flagged, cr.rowcount)
+
+    # La fusión diaria ya no hace falta: el índice único impide los duplicados
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cron = env.ref('custom_woocommerce_api.ir_cron_merge_delivery_duplicates', raise_if_not_found=False)
+    if cron:
+        cron.unlink()
+
+    # Las contribuciones pasan a una fila por mes de vencimiento: refresco completo en segundo plano
+    env['ir.config_parameter'].set_param('custom_woocommerce_api.exposure_refreshed_at', False)
+    env.ref('custom_woocommerce_api.ir_cron_refresh_portfolio_exposure')._trigger()
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Create res_partner.woo_delivery and reset the delivery keys.
+
+    Keys are now limited to the contacts of the WooCommerce import and
+    include the recipient name: the post-migration fills them again.
+    """
+    cr.execute("ALTER TABLE res_partner ADD COLUMN IF NOT EXISTS woo_delivery boolean")
+    cr.execute("UPDATE res_partner SET woo_address_hash = NULL WHERE woo_address_hash IS NOT NULL")
@@ -4,4 +4,14 @@ from . import crm_lead
 from . import sale_order_lines
 from . import account_move
 from . import res_partner
-from . import product
\ No newline at end of file
+from . import res_country
+from . import product
+from . import woocommerce_order_import
+from . import woocommerce_product_import
+from . import woocommerce_order_queue
+from . import sale_order_reprice
+from . import report_bulk_render
+from . import rent_billing_run
+from . import woocommerce_outbox
+from . import sale_order_installment
+from . import portfolio_exposure
@@ -1,4 +1,9 @@
 from odoo import fields, models, api
+from collections import defaultdict
+from ..tools.metrics import track_compute
+
+# Cambios que se notifican a WooCommerce a través de woocommerce.outbox
+WOO_OUTBOX_FIELDS = {'state', 'financing_agency_id'}
 
 class AccountMoveLine(models.Model):
     _inherit = 'account.move.line'
@@ -20,8 +25,9 @@ class AccountMoveLine(models.Model):
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
-    amount_vat_20 = fields.Monetary(string='IVA 20%', compute='_compute_iva_20')
-    amount_total_incl_vat_20 = fields.Monetary(string='Total Incl. IVA', compute='_compute_iva_20')
+    # Almacenados: se recalculan solo cuando cambian las líneas (backfill en migrations/1.2)
+    amount_vat_20 = fields.Monetary(string='IVA 20%', compute='_compute_iva_20', store=True)
+    amount_total_incl_vat_20 = fields.Monetary(string='Total Incl. IVA', compute='_compute_iva_20', store=True)
 
     custom_display_number = fields.Char(string="Custom Invoice Number", readonly=True)
 
@@ -33,26 +39,52 @@ class AccountMove(models.Model):
 
     invoice_title = fields.Char(string="Invoice Title", help="Custom title for the invoice.", default="Facture")
 
+    # Facturación mensual de alquileres (rent.billing.run)
+    rent_order_id = fields.Many2one('sale.order', string="Rent Contract", readonly=True, copy=False, index=True)
+    rent_period = fields.Date(string="Rent Period", readonly=True, copy=False)
+
+    _sql_constraints = [
+        ('rent_order_period_unique', 'unique(rent_order_id, rent_period)',
+         'This contract has already been billed for this period.'),
+    ]
+
+    @track_compute
     def _compute_custom_display_number(self):
-        for record in self:
-            if not record.invoice_date:
-                record.custom_display_number = ''
-                continue
-
-            date_str = record.invoice_date.strftime('%Y%m%d')
-            domain = [
-                ('move_type', '=', record.move_type),
-                ('state', '=', 'posted'),
-                ('invoice_date', '=', record.invoice_date),
-            ]
-            count = self.search_count(domain) + 1
-            record.custom_display_number = f'{date_str}-{count:02d}'
+        """Assign `YYYYMMDD-NN` numbers from the per-day, per-type counters.
+
+        All the numbers of the batch are reserved with one statement on
+        account.move.display.counter and written with one UPDATE, whatever
+        the number of moves posted.
+        """
+        moves = self.filtered('invoice_date').sorted('id')
+        (self - moves).custom_display_number = ''
+        if not moves:
+            return
+
+        counts = defaultdict(int)
+        for move in moves:
+            counts[(move.invoice_date, move.move_type)] += 1
+        last_numbers = self.env['account.move.display.counter']._reserve(counts)
+
+        next_number = {key: last - counts[key] + 1 for key, last in last_numbers.items()}
+        ids, numbers = [], []
+        for move in moves:
+            key = (move.invoice_date, move.move_type)
+            ids.append(move.id)
+            numbers.append(f"{move.invoice_date.strftime('%Y%m%d')}-{next_number[key]:02d}")
+            next_number[key] += 1
+
+        self.env.cr.execute("""
+            UPDATE account_move AS m
+               SET custom_display_number = v.number
+              FROM unnest(%s::int[], %s::varchar[]) AS v(id, number)
+             WHERE m.id = v.id
+        """, [ids, numbers])
+        moves.invalidate_recordset(['custom_display_number'])
 
     def action_post(self):
         res = super().action_post()
-        for move in self:
-            if not move.custom_display_number:
-                move._compute_custom_display_number()
+        self.filtered(lambda m: not m.custom_display_number)._compute_custom_display_number()
         return res
 
     @api.depends('invoice_line_ids.price_subtotal', 'currency_id')
@@ -74,19 +106,130 @@ class AccountMove(models.Model):
         if self.financing_agency_id:
             self.partner_id = self.financing_agency_id.partner_id
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Ensure partner_id is set when financing_agency_id is provided."""
-        if vals.get('financing_agency_id') and not vals.get('partner_id'):
-            agency = self.env['financing.agency'].browse(vals['financing_agency_id'])
-            vals['partner_id'] = agency.partner_id.id
-        return super(AccountMove, self).create(vals)
+        missing = [vals for vals in vals_list if vals.get('financing_agency_id') and not vals.get('partner_id')]
+        if missing:
+            # Una sola lectura de las agencias implicadas
+            agencies = self.env['financing.agency'].browse(list({vals['financing_agency_id'] for vals in missing}))
+            partner_by_agency = {agency['id']: agency['partner_id'] for agency in agencies.read(['partner_id'], load=None)}
+            for vals in missing:
+                vals['partner_id'] = partner_by_agency.get(vals['financing_agency_id'])
+        return super(AccountMove, self).create(vals_list)
 
     def write(self, vals):
         """Ensure partner_id updates if financing_agency_id changes."""
+        before = self._woo_outbox_snapshot() if WOO_OUTBOX_FIELDS.intersection(vals) else None
         res = super(AccountMove, self).write(vals)
+        if before:
+            self._woo_outbox_notify(before)
         if 'financing_agency_id' in vals:
+            # Un solo write por agencia, y solo en los asientos cuyo partner cambia
+            by_partner = defaultdict(lambda: self.browse())
             for record in self:
-                if record.financing_agency_id:
-                    record.partner_id = record.financing_agency_id.partner_id
-        return res
\ No newline at end of file
+                partner = record.financing_agency_id.partner_id
+                if partner and record.partner_id != partner:
+                    by_partner[partner] |= record
+            for partner, records in by_partner.items():
+                records.partner_id = partner
+        return res
+
+    # ---------- WOOCOMMERCE OUTBOX ----------
+
+    def _woo_outbox_orders(self):
+        """WooCommerce orders invoiced by this move (sale lines or rent contract)."""
+        self.ensure_one()
+        orders = self.invoice_line_ids.sale_line_ids.order_id | self.rent_order_id
+        return orders.filtered('woo_order_id')
+
+    def _woo_outbox_snapshot(self):
+        return {
+            move.id: (move.state, move.financing_agency_id.id)
+            for move in self if move.is_sale_document() and move._woo_outbox_orders()
+        }
+
+    def _woo_outbox_notify(self, before):
+        """Stage an outbox event per WooCommerce order for invoices whose state or agency changed."""
+        events = []
+        for move in self.browse(list(before)):
+            state, agency_id = before[move.id]
+            changes = []
+            if move.state != state:
+                changes.append('invoice.state')
+            if move.financing_agency_id.id != agency_id:
+                changes.append('invoice.financing_agency')
+            for order in move._woo_outbox_orders() if changes else []:
+                data = dict(order._woo_outbox_data(), invoice={
+                    'id': move.id,
+                    'name': move.name,
+                    'number': move.custom_display_number or None,
+                    'state': move.state,
+                    'payment_state': move.payment_state,
+                    'amount_total': move.amount_total,
+                    'financing_agency': move.financing_agency_id.name or None,
+                })
+                events += [(event_type, move, order.woo_order_id, data) for event_type in changes]
+        self.env['woocommerce.outbox']._enqueue(events)
+
+
+class AccountMoveDisplayCounter(models.Model):
+    _name = 'account.move.display.counter'
+    _description = 'Custom Invoice Number Counter'
+
+    date = fields.Date(required=True)
+    move_type = fields.Char(required=True)
+    last_number = fields.Integer(default=0, required=True)
+
+    _sql_constraints = [
+        ('date_move_type_unique', 'unique(date, move_type)', 'One counter per day and move type.'),
+    ]
+
+    @api.model
+    def _reserve(self, counts):
+        """Reserve `counts[(date, move_type)]` numbers per key; returns {key: last number reserved}.
+
+        The upsert locks each counter row until the end of the transaction,
+        so concurrent postings of the same day wait for each other instead of
+        reusing a number. Keys are sorted to always lock rows in the same order.
+        Under REPEATABLE READ the transaction that waited then fails with a
+        serialization error: HTTP requests are replayed by Odoo, other callers
+        must run the whole transaction through `odoo.service.model.retrying`.
+        """
+        keys = sorted(counts)
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO account_move_display_counter (date, move_type, last_number, create_uid, create_date, write_uid, write_date)
+                 SELECT v.date, v.move_type, v.count, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                   FROM unnest(%s::date[], %s::varchar[], %s::int[]) WITH ORDINALITY AS v(date, move_type, count, seq)
+               ORDER BY v.seq
+            ON CONFLICT (date, move_type) DO UPDATE
+                    SET last_number = account_move_display_counter.last_number + EXCLUDED.last_number,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+              RETURNING date, move_type, last_number
+        """, [self.env.uid, self.env.uid,
+              [key[0] for key in keys], [key[1] for key in keys], [counts[key] for key in keys]])
+        self.invalidate_model()
+        return {(date, move_type): last for date, move_type, last in self.env.cr.fetchall()}
+
+    @api.model
+    def _seed_from_moves(self):
+        """Start every counter after the numbers already given to posted moves."""
+        self.env.flush_all()
+        self.env.cr.execute("""
+            INSERT INTO account_move_display_counter (date, move_type, last_number, create_uid, create_date, write_uid, write_date)
+                 SELECT invoice_date, move_type,
+                        GREATEST(
+                            COUNT(*),
+                            MAX(CASE WHEN custom_display_number ~ '^[0-9]{8}-[0-9]+$'
+                                     THEN split_part(custom_display_number, '-', 2)::int END)
+                        ),
+                        %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                   FROM account_move
+                  WHERE state = 'posted' AND invoice_date IS NOT NULL
+               GROUP BY invoice_date, move_type
+            ON CONFLICT (date, move_type) DO UPDATE
+                    SET last_number = GREATEST(account_move_display_counter.last_number, EXCLUDED.last_number)
+        """, [self.env.uid, self.env.uid])
+        self.invalidate_model()
@@ -8,18 +8,29 @@ class CrmLead(models.Model):
 
     sale_order_id = fields.Many2one('sale.order', string="Linked Quotation", readonly=True)
 
-    @api.model
-    def create(self, vals):
-        lead = super().create(vals)
-        _logger.info(f"🔥 New lead created: {lead.name}")
+    @api.model_create_multi
+    def create(self, vals_list):
+        leads = super().create(vals_list)
+        _logger.info(f"🔥 New leads created: {len(leads)}")
 
-        if lead.partner_id:
-            sale_order = self.env['sale.order'].create({
+        # Un solo create múltiple de presupuestos para todos los leads con cliente
+        with_partner = leads.filtered('partner_id')
+        if with_partner:
+            sale_orders = self.env['sale.order'].create([{
                 'partner_id': lead.partner_id.id,
                 'opportunity_id': lead.id,
                 'origin': f'Lead: {lead.name}',
-            })
-            lead.sale_order_id = sale_order.id
-            _logger.info(f"✅ Quotation created: {sale_order.name}")
+            } for lead in with_partner])
+            # Enlace en un solo UPDATE: por el ORM cada lead lleva su propio valor, un UPDATE por lead.
+            # Se mantienen write_uid/write_date como haría write()
+            with_partner.flush_recordset(['sale_order_id', 'write_uid', 'write_date'])
+            self.env.cr.execute("""
+                UPDATE crm_lead AS l
+                   SET sale_order_id = v.order_id, write_uid = %s, write_date = now() at time zone 'UTC'
+                  FROM unnest(%s::int[], %s::int[]) AS v(id, order_id)
+                 WHERE l.id = v.id
+            """, [self.env.uid, with_partner.ids, sale_orders.ids])
+            with_partner.invalidate_recordset(['sale_order_id', 'write_uid', 'write_date'])
+            _logger.info(f"✅ Quotations created: {len(sale_orders)}")
 
-        return lead
\ No newline at end of file
+        return leads
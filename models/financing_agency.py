@@ -22,14 +22,16 @@ class FinancingAgency(models.Model):
     address = fields.Char(string="Address", help="Physical address of the financing agency.", required=True)
     phone = fields.Char(string="Phone", help="Contact phone number of the financing agency.", required=True)
 
-    @api.model
-    def create(self, vals):
-        if 'partner_id' not in vals:
-            partner_vals = {
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Un solo create de contactos para las agencias que no traen partner
+        missing = [vals for vals in vals_list if 'partner_id' not in vals]
+        if missing:
+            partners = self.env['res.partner'].create([{
                 'name': vals.get('name'),
                 'is_company': True,
                 'customer_rank': 1,  # Marca este contacto como cliente
-            }
-            partner = self.env['res.partner'].create(partner_vals)
-            vals['partner_id'] = partner.id
-        return super(FinancingAgency, self).create(vals)
\ No newline at end of file
+            } for vals in missing])
+            for vals, partner in zip(missing, partners):
+                vals['partner_id'] = partner.id
+        return super(FinancingAgency, self).create(vals_list)
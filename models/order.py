@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
 from odoo.tools.float_utils import float_round
+from ..tools import quote_engine
+from ..tools.metrics import track_compute
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Campos de línea que cambian la cuota mensual del pedido (plan de cuotas)
+INSTALLMENT_LINE_FIELDS = {
+    'product_id', 'product_uom_qty', 'price_unit', 'discount_price', 'manual_price_quote',
+    'include_full_service_warranty',
+}
+
 class SaleOrderLine(models.Model):
     _inherit = 'sale.order.line'
 
@@ -35,17 +43,20 @@ class SaleOrderLine(models.Model):
     # Final monthly after applying manual/auto + warranty
     effective_price_quote = fields.Float(
         string="Monthly Quote (Final)",
-        compute="_compute_effective_price_quote",
-        store=True
+        compute="_compute_line_amounts",
+        store=True,
+        precompute=True
     )
 
     # Subtotal = monthly final * qty (stored)
     price_subtotal = fields.Monetary(
         string='Subtotal',
-        compute='_compute_price_subtotal_custom',
+        compute='_compute_line_amounts',
         store=True,
         currency_field='currency_id'
     )
+    price_tax = fields.Float(compute='_compute_line_amounts')
+    price_total = fields.Monetary(compute='_compute_line_amounts')
 
     discount_price = fields.Float(string='Discount (%)', default=0.0, store=True)
 
@@ -66,103 +77,86 @@ class SaleOrderLine(models.Model):
         'order_id.installments',
         # Quitamos discount_price de aquí porque el descuento ya no afecta la cuota bruta
     )
+    @track_compute
     def _compute_price_quote(self):
-        for line in self:
-            # 1. Obtenemos el precio base del activo
-            total = (line.price_unit or 0.0) * 2.2
-            months = int(line.order_id.installments or 24)
-            rate = 0.05 / 12.0
-
-            try:
-                # 2. Calculamos la Cuota Financiera Base
-                base_quote = (total + (total * rate * months)) / months
-                
-                # 3. Sumamos garantía si aplica
-                if line.include_full_service_warranty and line.order_id.full_service_warranty_percentage:
-                    base_quote += base_quote * (line.order_id.full_service_warranty_percentage / 100.0)
-                
-                # --- CAMBIO IMPORTANTE: YA NO RESTAMOS EL DESCUENTO AQUÍ ---
-                # Queremos que 'price_quote' sea el valor BRUTO de la cuota.
-                # El descuento se aplicará visualmente en el subtotal.
-                
-                final = float_round(base_quote, precision_digits=2)
-                
-                line.price_quote = final
-                
-                if not line.manual_price_quote:
-                    line.display_price_quote = final
-
-            except Exception as e:
-                _logger.error(f"Error computing price_quote for line {line.id}: {e}")
-                line.price_quote = 0.0
-                if not line.manual_price_quote:
-                    line.display_price_quote = 0.0
+        # Cuota BRUTA (sin descuento): el descuento se aplica en el subtotal
+        quotes = quote_engine.monthly_quotes(
+            (line.price_unit, line.order_id.installments,
+             line.include_full_service_warranty, line.order_id.full_service_warranty_percentage)
+            for line in self
+        )
+        for line, final in zip(self, quotes):
+            line.price_quote = final
+            if not line.manual_price_quote:
+                line.display_price_quote = final
 
     @api.depends(
         'manual_price_quote',
         'price_quote',
         'include_full_service_warranty',
         'order_id.full_service_warranty_percentage',
-        'order_id.installments'
+        'order_id.installments',
+        'product_uom_qty',
+        'currency_id',
+        'price_unit',
+        'discount_price',
+        'tax_id',
+        'order_id.currency_id',
+        'order_id.partner_shipping_id',
     )
-    def _compute_effective_price_quote(self):
-        for line in self:
-            # Esto ahora representa la CUOTA BRUTA (antes de descuento)
-            base = line.manual_price_quote or line.price_quote or 0.0
-            if line.include_full_service_warranty and line.order_id.full_service_warranty_percentage:
-                base += base * (line.order_id.full_service_warranty_percentage / 100.0)
-            line.effective_price_quote = float_round(base, precision_digits=2)
-
-    @api.depends('effective_price_quote', 'product_uom_qty', 'currency_id', 'price_unit', 'price_tax', 'discount_price')
-    def _compute_price_subtotal_custom(self):
-        for line in self:
-            # A) Determinamos el PRECIO UNITARIO BASE
-            # Si hay cuota calculada (Leasing), usamos la cuota bruta.
-            # Si no (Venta WP simple), usamos el precio de lista.
-            if line.effective_price_quote and line.effective_price_quote > 0.0:
-                unit_price_to_use = line.effective_price_quote
-            else:
-                unit_price_to_use = line.price_unit
-
-            # B) Aplicamos el DESCUENTO matemáticamente aquí
-            discount_factor = 1.0 - ((line.discount_price or 0.0) / 100.0)
-            
-            # C) Calculamos el subtotal (Precio * FactorDescuento * Cantidad)
-            subtotal = (unit_price_to_use or 0.0) * discount_factor * (line.product_uom_qty or 0.0)
-            
-            line.price_subtotal = float_round(subtotal, precision_rounding=line.currency_id.rounding)
-            line.price_total = line.price_subtotal + (line.price_tax or 0.0)
-
-    @api.depends('effective_price_quote', 'product_uom_qty', 'tax_id', 'price_unit', 'discount_price')
+    @track_compute
+    def _compute_line_amounts(self):
+        """Effective monthly quote, subtotal, tax and total in one pass.
+
+        Lines with the same taxes, reduced price, quantity, currency and
+        partner share a single `compute_all` call.
+        """
+        # Cuota final (manual/auto + garantía): CUOTA BRUTA, antes de descuento
+        effective_quotes = quote_engine.effective_quotes(
+            (line.manual_price_quote, line.price_quote,
+             line.include_full_service_warranty, line.order_id.full_service_warranty_percentage)
+            for line in self
+        )
+        tax_results = {}
+        for line, effective in zip(self, effective_quotes):
+            rounding = line.currency_id.rounding
+            qty = line.product_uom_qty or 0.0
+
+            # Cuota (Leasing) o precio de lista (Venta WP simple), con el descuento aplicado aquí
+            subtotal = quote_engine.subtotal(effective, line.price_unit, line.discount_price, qty, rounding)
+
+            price_tax = 0.0
+            if line.tax_id:
+                # Odoo compute_all no acepta 'discount': le pasamos el precio NETO (ya rebajado)
+                price_reduced = quote_engine.reduced_price(effective, line.price_unit, line.discount_price)
+                key = (tuple(line.tax_id.ids), price_reduced, qty,
+                       line.order_id.currency_id.id, line.order_id.partner_shipping_id.id)
+                if any(tax.amount_type == 'code' for tax in line.tax_id):
+                    key += (line.product_id.id,)  # los impuestos Python pueden depender del producto
+                if key not in tax_results:
+                    tax_results[key] = line.tax_id.compute_all(
+                        price_reduced,
+                        currency=line.order_id.currency_id,
+                        quantity=qty,
+                        product=line.product_id,
+                        partner=line.order_id.partner_shipping_id,
+                        handle_price_include=False
+                    )
+                taxes = tax_results[key]
+                price_tax = float_round(
+                    taxes['total_included'] - taxes['total_excluded'], precision_rounding=rounding
+                )
+
+            line.effective_price_quote = effective
+            line.price_subtotal = subtotal
+            line.price_tax = price_tax
+            line.price_total = subtotal + price_tax
+
+    @api.depends('product_id', 'company_id')
     def _compute_tax_id(self):
-        for line in self:
-            # 1. Lógica Híbrida: Elegir precio base (Cuota o Precio Lista)
-            if line.effective_price_quote and line.effective_price_quote > 0.0:
-                unit_price_to_use = line.effective_price_quote
-            else:
-                unit_price_to_use = line.price_unit
-
-            # 2. CORRECCIÓN: Aplicar el descuento manualmente AQUÍ
-            # Odoo compute_all no acepta 'discount' como parámetro.
-            # Debemos pasarle el precio NETO (ya rebajado).
-            discount_factor = 1.0 - ((line.discount_price or 0.0) / 100.0)
-            price_reduced = (unit_price_to_use or 0.0) * discount_factor
-
-            # 3. Calcular impuestos sobre el precio reducido
-            taxes = line.tax_id.compute_all(
-                price_reduced,
-                currency=line.order_id.currency_id,
-                quantity=line.product_uom_qty or 0.0,
-                product=line.product_id,
-                partner=line.order_id.partner_shipping_id,
-                handle_price_include=False
-                # Ya no pasamos 'discount' aquí, porque ya lo aplicamos arriba
-            )
-            
-            line.price_tax = float_round(
-                taxes['total_included'] - taxes['total_excluded'],
-                precision_rounding=line.currency_id.rounding
-            )
+        # Los impuestos de la línea no se rellenan automáticamente (comportamiento
+        # histórico del módulo); el importe de impuestos vive en _compute_line_amounts.
+        return
 
     # ---------- HOOK DEL MOTOR DE IMPUESTOS (HÍBRIDO) ----------
     def _convert_to_tax_base_line_dict(self):
@@ -187,24 +181,43 @@ class SaleOrderLine(models.Model):
 
     @api.onchange('product_uom_qty', 'display_price_quote', 'discount_price')
     def _onchange_qty_or_quote(self):
-        self._compute_effective_price_quote()
-        self._compute_price_subtotal_custom()
+        self._compute_line_amounts()
 
     @api.onchange('include_full_service_warranty', 'order_id.full_service_warranty_percentage')
     def _onchange_warranty_toggle(self):
         for line in self:
             if not line.manual_price_quote:
                 line._compute_price_quote()
-                line._compute_effective_price_quote()
-                line._compute_price_subtotal_custom()
+                line._compute_line_amounts()
 
     def _prepare_invoice_line(self, **optional_values):
         res = super()._prepare_invoice_line(**optional_values)
         res.update({
             'include_full_service_warranty': self.include_full_service_warranty,
-            'price_unit': (self.product_id.list_price or 0.0) * 2.2, 
+            'price_unit': (self.product_id.list_price or 0.0) * quote_engine.LIST_PRICE_FACTOR,
             'product_list_price': self.product_id.list_price or 0.0,
             'tax_ids': [(6, 0, [])],
             'discount': self.discount_price # Pasamos el descuento a la factura también
         })
-        return res
\ No newline at end of file
+        return res
+
+    # ---------- PLAN DE CUOTAS ----------
+    # Las líneas de contratos confirmados editadas fuera del formulario del pedido
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines.order_id.filtered(lambda o: o.state == 'sale')._sync_installments()
+        return lines
+
+    def write(self, vals):
+        res = super().write(vals)
+        if INSTALLMENT_LINE_FIELDS.intersection(vals):
+            self.order_id.filtered(lambda o: o.state == 'sale')._sync_installments()
+        return res
+
+    def unlink(self):
+        orders = self.order_id.filtered(lambda o: o.state == 'sale')
+        res = super().unlink()
+        orders._sync_installments()
+        return res
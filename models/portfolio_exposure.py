@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PARAM_REFRESHED_AT = 'custom_woocommerce_api.exposure_refreshed_at'
+# Margen para los pedidos escritos por transacciones largas que confirmaron tras el último refresco.
+# write_date es la hora de escritura, no la de confirmación: un pedido escrito por una transacción que
+# confirma más de REFRESH_OVERLAP después no se ve hasta su siguiente escritura o un refresco completo
+# (_refresh(full=True)). Debe superar la transacción más larga que escribe pedidos o cuotas.
+REFRESH_OVERLAP = timedelta(minutes=10)
+# Clave de bloqueo consultivo: un solo refresco a la vez
+REFRESH_LOCK = 'custom_woocommerce_api.portfolio_exposure'
+
+INSTALLMENT_TIERS = [('24', '24'), ('36', '36'), ('48', '48'), ('60', '60')]
+
+# Columnas que identifican una fila del resumen
+KEY_COLUMNS = ('company_id', 'currency_id', 'financing_agency_id', 'installments', 'month')
+KEY_MATCH = """{a}.month = {b}.month
+               AND {a}.company_id IS NOT DISTINCT FROM {b}.company_id
+               AND {a}.currency_id IS NOT DISTINCT FROM {b}.currency_id
+               AND {a}.financing_agency_id IS NOT DISTINCT FROM {b}.financing_agency_id
+               AND {a}.installments IS NOT DISTINCT FROM {b}.installments"""
+KEYS_UNNEST = "unnest(%s::int[], %s::int[], %s::int[], %s::varchar[], %s::date[]) AS k({})".format(', '.join(KEY_COLUMNS))
+
+
+class SalePortfolioExposure(models.Model):
+    _name = 'sale.portfolio.exposure'
+    _description = 'Portfolio Exposure'
+    _order = 'month desc, financing_agency_id, installments'
+    _log_access = False
+
+    month = fields.Date(string="Due Month", required=True, readonly=True)
+    financing_agency_id = fields.Many2one('financing.agency', string="Financing Agency", readonly=True)
+    installments = fields.Selection(INSTALLMENT_TIERS, string="Quotas", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Currency", readonly=True)
+    contract_count = fields.Integer(string="Contracts", readonly=True,
+                                    help="Contracts with an installment due this month; an order without installments counts "
+                                         "in its order month.")
+    exposure = fields.Monetary(string="Outstanding Exposure", currency_field='currency_id', readonly=True,
+                               help="Planned installments due this month and not invoiced yet.")
+    mrr = fields.Monetary(string="Monthly Recurring Revenue", currency_field='currency_id', readonly=True,
+                          help="Installments due this month of the contracts not ended yet.")
+    margin_amount = fields.Monetary(string="Margin (€)", currency_field='currency_id', readonly=True)
+    amount_total_sans_tva = fields.Monetary(string="TOTAL (Sans TVA)", currency_field='currency_id', readonly=True)
+
+    def init(self):
+        super().init()
+        if not tools.index_exists(self._cr, 'sale_portfolio_exposure_month_index'):
+            tools.create_index(self._cr, 'sale_portfolio_exposure_month_index', self._table, ['month'])
+
+    # ---------- REFRESH ----------
+
+    @api.model
+    def _changed_order_ids(self, since):
+        """Orders written since `since`, whose installments were (rent billing marks them invoiced)
+        or whose contract ended since then (they leave the MRR without being written)."""
+        self.env.cr.execute("""
+            SELECT id FROM sale_order WHERE write_date > %(since)s
+             UNION
+            SELECT order_id FROM sale_order_installment WHERE write_date > %(since)s
+             UNION
+            SELECT id FROM sale_order
+             WHERE state = 'sale' AND financing_end_date >= %(since)s::date AND financing_end_date < current_date
+        """, {'since': since})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _refresh_orders(self, order_ids):
+        """Recompute the contribution of `order_ids` and the summary rows they belong to.
+
+        A contract contributes one row per month it has installments due:
+        the planned ones are its exposure and, until financing_end_date is
+        past, all of them its MRR. margin_amount and amount_total_sans_tva
+        are spread evenly over those months, so a sum across months gives
+        the order amounts; an order without installments has a single row
+        in the month of the order. The contributions are kept in
+        sale.portfolio.exposure.order, so a summary row is rebuilt from its
+        own contracts only, and the rows an order leaves (new agency, tier
+        or schedule) are found without scanning the orders. Returns the
+        number of summary rows rebuilt.
+        """
+        cr = self.env.cr
+        # Claves afectadas: las que tenían los pedidos y las que tienen ahora
+        cr.execute(f"""
+            SELECT {', '.join(KEY_COLUMNS)}
+              FROM sale_portfolio_exposure_order
+             WHERE order_id = ANY(%(ids)s) OR order_id IS NULL
+        """, {'ids': order_ids})
+        keys = set(cr.fetchall())
+
+        # Contribución de cada pedido, por mes de vencimiento
+        cr.execute("""
+            DELETE FROM sale_portfolio_exposure_order WHERE order_id = ANY(%(ids)s) OR order_id IS NULL
+        """, {'ids': order_ids})
+        cr.execute(f"""
+            WITH due AS (
+                SELECT order_id, date_trunc('month', due_date)::date AS month,
+                       sum(amount) FILTER (WHERE state = 'planned') AS exposure, sum(amount) AS amount,
+                       count(*) OVER (PARTITION BY order_id) AS months
+                  FROM sale_order_installment
+                 WHERE order_id = ANY(%(ids)s)
+              GROUP BY order_id, date_trunc('month', due_date)
+            )
+            INSERT INTO sale_portfolio_exposure_order (order_id, company_id, currency_id, financing_agency_id,
+                                                       installments, month, exposure, mrr, margin_amount,
+                                                       amount_total_sans_tva)
+                 SELECT o.id, o.company_id, o.currency_id, o.financing_agency_id, o.installments,
+                        coalesce(d.month, date_trunc('month', o.date_order)::date),
+                        coalesce(d.exposure, 0),
+                        CASE WHEN o.financing_end_date < current_date THEN 0 ELSE coalesce(d.amount, 0) END,
+                        coalesce(o.margin_amount, 0) / coalesce(d.months, 1),
+                        coalesce(o.amount_total_sans_tva, 0) / coalesce(d.months, 1)
+                   FROM sale_order o
+              LEFT JOIN due d ON d.order_id = o.id
+                  WHERE o.id = ANY(%(ids)s) AND o.state = 'sale'
+              RETURNING {', '.join(KEY_COLUMNS)}
+        """, {'ids': order_ids})
+        keys.update(cr.fetchall())
+        if not keys:
+            return 0
+
+        # Filas del resumen afectadas, rehechas desde las contribuciones
+        key_arrays = [list(column) for column in zip(*keys)]
+        cr.execute(f"""
+            DELETE FROM sale_portfolio_exposure s
+                  USING {KEYS_UNNEST}
+                  WHERE {KEY_MATCH.format(a='s', b='k')}
+        """, key_arrays)
+        cr.execute(f"""
+            INSERT INTO sale_portfolio_exposure ({', '.join(KEY_COLUMNS)}, contract_count, exposure, mrr,
+                                                 margin_amount, amount_total_sans_tva)
+                 SELECT {', '.join('m.' + column for column in KEY_COLUMNS)}, count(*), sum(m.exposure), sum(m.mrr),
+                        sum(m.margin_amount), sum(m.amount_total_sans_tva)
+                   FROM sale_portfolio_exposure_order m
+                   JOIN {KEYS_UNNEST} ON {KEY_MATCH.format(a='m', b='k')}
+               GROUP BY {', '.join('m.' + column for column in KEY_COLUMNS)}
+        """, key_arrays)
+        return len(keys)
+
+    @api.model
+    def _refresh(self, full=False):
+        """Refresh the rows of the orders changed since the last refresh (all of them the first time)."""
+        cr = self.env.cr
+        cr.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [REFRESH_LOCK])
+        if not cr.fetchone()[0]:
+            _logger.info("Portfolio exposure refresh already running, skipped")
+            return False
+        self.env['sale.order'].flush_model([
+            'state', 'date_order', 'financing_end_date', 'installments', 'financing_agency_id', 'company_id', 'currency_id',
+            'amount_untaxed', 'margin_amount', 'amount_total_sans_tva',
+        ])
+        self.env['sale.order.installment'].flush_model()
+        params = self.env['ir.config_parameter'].sudo()
+        cr.execute("SELECT now() at time zone 'UTC'")
+        started = cr.fetchone()[0]
+        refreshed_at = params.get_param(PARAM_REFRESHED_AT)
+
+        if full or not refreshed_at:
+            cr.execute("SELECT id FROM sale_order WHERE state = 'sale' UNION SELECT order_id FROM sale_portfolio_exposure_order")
+            order_ids = [row[0] for row in cr.fetchall() if row[0]]
+            cr.execute("DELETE FROM sale_portfolio_exposure")
+        else:
+            order_ids = self._changed_order_ids(fields.Datetime.to_datetime(refreshed_at) - REFRESH_OVERLAP)
+
+        rows = self._refresh_orders(order_ids)
+        params.set_param(PARAM_REFRESHED_AT, fields.Datetime.to_string(started))
+        self.invalidate_model()
+        _logger.info("Portfolio exposure: %s orders changed, %s summary rows rebuilt", len(order_ids), rows)
+        return True
+
+    @api.model
+    def _cron_refresh(self):
+        self._refresh()
+
+    def action_refresh(self):
+        self._refresh()
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
+
+
+class SalePortfolioExposureOrder(models.Model):
+    _name = 'sale.portfolio.exposure.order'
+    _description = 'Portfolio Exposure Contribution'
+    _log_access = False
+
+    # set null: la contribución de un pedido borrado se descuenta en el siguiente refresco
+    order_id = fields.Many2one('sale.order', string="Order", ondelete='set null', index=True)
+    month = fields.Date(string="Month", required=True, index=True)
+    financing_agency_id = fields.Many2one('financing.agency', string="Financing Agency")
+    installments = fields.Selection(INSTALLMENT_TIERS, string="Quotas")
+    company_id = fields.Many2one('res.company', string="Company")
+    currency_id = fields.Many2one('res.currency', string="Currency")
+    exposure = fields.Float(string="Outstanding Exposure")
+    mrr = fields.Float(string="Monthly Recurring Revenue")
+    margin_amount = fields.Float(string="Margin")
+    amount_total_sans_tva = fields.Float(string="TOTAL (Sans TVA)")
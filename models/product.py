@@ -1,5 +1,17 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+from odoo import models, fields, api, tools
+from ..tools.signaled_cache import SignaledCache
+import os
+
+# Contadores del caché SKU -> product.product (por proceso/worker)
+_SKU_CACHE_STATS = {'calls': 0, 'misses': 0}
+
+# Campos que cambian el resultado de la resolución por SKU
+SKU_CACHE_FIELDS = {'default_code', 'active', 'product_tmpl_id'}
+
+# SKU -> id de product.product (False si no existe), propio de este módulo
+SKU_CACHE = SignaledCache('sku')
+
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -7,4 +19,159 @@ class ProductTemplate(models.Model):
     # Campo para guardar el porcentaje de descuento que viene de WP
     # Este es el dato "maestro" que sincroniza el plugin.
     x_brand_discount = fields.Float(string='WP Brand Discount (%)', default=0.0)
-    x_product_url = fields.Char(string='Product URL')
\ No newline at end of file
+    x_product_url = fields.Char(string='Product URL')
+
+    def init(self):
+        super().init()
+        # Índice para la exportación paginada por (write_date, id) de GET /api/product
+        if not tools.index_exists(self._cr, 'product_template_write_date_id_woo_index'):
+            tools.create_index(
+                self._cr, 'product_template_write_date_id_woo_index', self._table, ['write_date', 'id'],
+            )
+
+    @api.model
+    def _woo_export_keys(self, after=None, limit=200):
+        """(id, write_date, active, variant id, variant SKU, variant write_date) of the next templates.
+
+        Templates come in (write_date, id) order after the key `after`, read
+        from the (write_date, id) index. Archived templates are included
+        (with active = False) so that consumers learn about them; archiving
+        writes write_date, so they come back in the next pull. The exported
+        variant (first active one, or first one of an archived template) is
+        part of the key so that editing its SKU changes the page ETag even
+        though the template's write_date does not move.
+        """
+        self.flush_model(['write_date', 'active'])
+        self.env['product.product'].flush_model(['default_code', 'active', 'product_tmpl_id'])
+        where, params = "TRUE", []
+        if after:
+            where, params = "(t.write_date, t.id) > (%s, %s)", [after[0], after[1]]
+        self.env.cr.execute(f"""
+            SELECT t.id, t.write_date, t.active, v.id, v.default_code, v.write_date
+              FROM (SELECT id, write_date, active FROM product_template t
+                     WHERE {where}
+                  ORDER BY write_date, id
+                     LIMIT %s) t
+         LEFT JOIN LATERAL (
+                    SELECT id, default_code, write_date FROM product_product p
+                     WHERE p.product_tmpl_id = t.id
+                  ORDER BY p.active DESC, p.id LIMIT 1
+                   ) v ON TRUE
+          ORDER BY t.write_date, t.id
+        """, params + [limit])
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _woo_export_rows(self, ids):
+        """Exported values of the given templates, in the order of `ids`."""
+        self.env['product.product'].flush_model(['default_code', 'active', 'product_tmpl_id'])
+        self.flush_model(['list_price', 'x_brand_discount', 'x_product_url', 'active'])
+        self.env.cr.execute("""
+            SELECT t.id, v.default_code, t.list_price, t.x_brand_discount, t.x_product_url, t.active, t.write_date
+              FROM product_template t
+         LEFT JOIN LATERAL (
+                    SELECT default_code FROM product_product p
+                     WHERE p.product_tmpl_id = t.id
+                  ORDER BY p.active DESC, p.id LIMIT 1
+                   ) v ON TRUE
+             WHERE t.id = ANY(%s)
+        """, [list(ids)])
+        rows = {row[0]: row for row in self.env.cr.fetchall()}
+        return [{
+            'id': tmpl_id,
+            'sku': sku,
+            'list_price': list_price or 0.0,
+            'x_brand_discount': discount or 0.0,
+            'x_product_url': url or '',
+            'active': bool(active),
+            'write_date': fields.Datetime.to_string(write_date),
+        } for tmpl_id, sku, list_price, discount, url, active, write_date in (rows[i] for i in ids if i in rows)]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if any(vals.get('default_code') for vals in vals_list):
+            self.env['product.product']._clear_sku_cache()
+        return records
+
+    def write(self, vals):
+        skus = self.product_variant_ids.mapped('default_code') if SKU_CACHE_FIELDS.intersection(vals) else None
+        res = super().write(vals)
+        if skus is not None:
+            self.env['product.product']._clear_sku_cache(skus + self.product_variant_ids.mapped('default_code'))
+        return res
+
+    def unlink(self):
+        skus = self.with_context(active_test=False).product_variant_ids.mapped('default_code')
+        res = super().unlink()
+        self.env['product.product']._clear_sku_cache(skus)
+        return res
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    @api.model
+    def _get_id_by_sku(self, sku):
+        """Return the id of the active product with this SKU, or False.
+
+        Results are kept in SKU_CACHE (bounded LRU per worker). Creating,
+        renaming, archiving or deleting a product drops the SKUs involved,
+        and the cache's own signaling makes the other workers reload it.
+        """
+        _SKU_CACHE_STATS['calls'] += 1
+        product_id, hit = SKU_CACHE.get(self.env.cr, sku, lambda: self._lookup_id_by_sku(sku))
+        if not hit:
+            _SKU_CACHE_STATS['misses'] += 1
+        return product_id
+
+    @api.model
+    def _get_by_sku(self, sku):
+        return self.browse(self._get_id_by_sku(sku)) if sku else self.browse()
+
+    @api.model
+    def _lookup_id_by_sku(self, sku):
+        products = self.sudo().with_context(active_test=True)
+        return products.search([('default_code', '=', sku)], limit=1).id or False
+
+    @api.model
+    def _clear_sku_cache(self, skus=None):
+        """Forget `skus` (every SKU if None) in all workers, without touching the registry caches."""
+        SKU_CACHE.invalidate(self.env, None if skus is None else {sku for sku in skus if sku})
+
+    @api.model
+    def _sku_cache_stats(self):
+        """Hit/miss counters of the SKU cache for the current worker."""
+        calls, misses = _SKU_CACHE_STATS['calls'], _SKU_CACHE_STATS['misses']
+        return {
+            'pid': os.getpid(),
+            'hits': calls - misses,
+            'misses': misses,
+            'hit_ratio': round((calls - misses) / calls, 4) if calls else 0.0,
+        }
+
+    def init(self):
+        super().init()
+        SKU_CACHE.create_sequence(self._cr)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        skus = [vals.get('default_code') for vals in vals_list if vals.get('default_code')]
+        if skus:
+            # Un SKU antes desconocido puede estar en caché como False
+            self._clear_sku_cache(skus)
+        return records
+
+    def write(self, vals):
+        skus = self.mapped('default_code') if SKU_CACHE_FIELDS.intersection(vals) else None
+        res = super().write(vals)
+        if skus is not None:
+            self._clear_sku_cache(skus + self.mapped('default_code'))
+        return res
+
+    def unlink(self):
+        skus = self.mapped('default_code')
+        res = super().unlink()
+        self._clear_sku_cache(skus)
+        return res
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.service.model import retrying
+from odoo.tools import date_utils
+from collections import defaultdict
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Tiempo máximo de una ejecución del cron antes de re-dispararse
+CRON_TIME_BUDGET = 240
+
+
+class RentBillingRun(models.Model):
+    _name = 'rent.billing.run'
+    _description = 'Monthly Rent Billing Run'
+    _order = 'period desc, id desc'
+
+    name = fields.Char(string="Description", compute='_compute_name', store=True)
+    period = fields.Date(
+        string="Period", required=True, default=lambda self: date_utils.start_of(fields.Date.today(), 'month'),
+        help="Month to bill (any day of the month)."
+    )
+    invoice_date = fields.Date(string="Invoice Date", help="Defaults to the first day of the period.")
+    auto_post = fields.Boolean(string="Post Invoices", default=True)
+    chunk_size = fields.Integer(string="Contracts per Chunk", default=500, required=True)
+
+    state = fields.Selection(
+        [('draft', 'Draft'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')],
+        string="Status", default='draft', required=True, readonly=True
+    )
+    last_order_id = fields.Integer(string="Last Processed Contract", readonly=True, default=0)
+    contract_count = fields.Integer(string="Contracts Due", readonly=True)
+    invoice_count = fields.Integer(string="Invoices Created", readonly=True)
+    skipped_count = fields.Integer(string="Already Billed", readonly=True)
+    date_start = fields.Datetime(string="Started", readonly=True)
+    date_end = fields.Datetime(string="Finished", readonly=True)
+    processing_time = fields.Float(string="Processing Time (s)", readonly=True)
+    invoices_per_second = fields.Float(string="Invoices / Second", compute='_compute_throughput')
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    @api.depends('period')
+    def _compute_name(self):
+        for run in self:
+            run.name = f"Rent {run.period.strftime('%m/%Y')}" if run.period else "Rent"
+
+    @api.depends('invoice_count', 'processing_time')
+    def _compute_throughput(self):
+        for run in self:
+            run.invoices_per_second = run.invoice_count / run.processing_time if run.processing_time else 0.0
+
+    # ---------- CONTRACTS ----------
+
+    def _period_bounds(self):
+        self.ensure_one()
+        return date_utils.start_of(self.period, 'month'), date_utils.end_of(self.period, 'month')
+
+    def _contract_domain(self):
+        """Confirmed financed orders whose financing covers (part of) the period."""
+        period_start, period_end = self._period_bounds()
+        return [
+            ('state', '=', 'sale'),
+            ('financing_start_date', '!=', False),
+            ('financing_start_date', '<=', period_end),
+            '|', ('financing_end_date', '=', False), ('financing_end_date', '>=', period_start),
+        ]
+
+    def _is_due(self, order):
+        """Without an end date, the contract runs for `installments` months."""
+        if order.financing_end_date:
+            return True
+        period_start = self._period_bounds()[0]
+        start = order.financing_start_date
+        elapsed = (period_start.year - start.year) * 12 + period_start.month - start.month
+        return elapsed < int(order.installments or '0')
+
+    # ---------- ACTIONS ----------
+
+    def action_start(self):
+        for run in self:
+            if run.state != 'draft':
+                raise UserError("Only draft billing runs can be started.")
+            run.write({
+                'state': 'running',
+                'period': run._period_bounds()[0],
+                'contract_count': self.env['sale.order'].search_count(run._contract_domain()),
+                'date_start': fields.Datetime.now(),
+            })
+        self.env.ref('custom_woocommerce_api.ir_cron_run_rent_billing')._trigger()
+
+    def action_resume(self):
+        """Continue a failed run from its last committed chunk."""
+        self.filtered(lambda r: r.state == 'failed').write({'state': 'running', 'last_error': False})
+        self.env.ref('custom_woocommerce_api.ir_cron_run_rent_billing')._trigger()
+
+    def action_view_invoices(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.name,
+            'res_model': 'account.move',
+            'view_mode': 'tree,form',
+            'domain': [('rent_period', '=', self._period_bounds()[0]), ('rent_order_id', '!=', False)],
+        }
+
+    # ---------- PROCESSING ----------
+
+    def _prepare_rent_invoice(self, order, invoice_date):
+        """One invoice per contract for the period; the monthly quota is the order's untaxed amount."""
+        period_start = self._period_bounds()[0]
+        agency = order.financing_agency_id
+        return {
+            'move_type': 'out_invoice',
+            'partner_id': agency.partner_id.id if agency else order.partner_invoice_id.id,
+            'financing_agency_id': agency.id,
+            'invoice_date': invoice_date,
+            'invoice_origin': order.name,
+            'currency_id': order.currency_id.id,
+            'company_id': order.company_id.id,
+            'narration': f"Customer financed: {order.partner_id.name}" if agency else False,
+            'rent_order_id': order.id,
+            'rent_period': period_start,
+            'invoice_line_ids': [(0, 0, {
+                'name': f"Loyer {period_start.strftime('%m/%Y')} - {order.name}",
+                'quantity': 1.0,
+                'price_unit': order.amount_untaxed,
+                'tax_ids': [(6, 0, [])],
+            })],
+        }
+
+    def _process_chunk(self):
+        """Bill the next chunk of contracts. Returns False once the run is finished."""
+        self.ensure_one()
+        started = time.monotonic()
+        orders = self.env['sale.order'].search(
+            self._contract_domain() + [('id', '>', self.last_order_id)], order='id', limit=self.chunk_size
+        )
+        if not orders:
+            self.write({'state': 'done', 'date_end': fields.Datetime.now()})
+            return False
+
+        # Re-ejecutable: los contratos ya facturados en el periodo se saltan
+        period_start = self._period_bounds()[0]
+        billed = set(self.env['account.move'].search([
+            ('rent_order_id', 'in', orders.ids), ('rent_period', '=', period_start),
+        ]).rent_order_id.ids)
+        due = orders.filtered(lambda o: o.id not in billed and self._is_due(o))
+
+        by_agency = defaultdict(list)
+        for order in due:
+            by_agency[order.financing_agency_id].append(order)
+
+        invoice_date = self.invoice_date or period_start
+        moves = self.env['account.move']
+        for agency, agency_orders in by_agency.items():
+            moves |= moves.create([self._prepare_rent_invoice(order, invoice_date) for order in agency_orders])
+        if self.auto_post and moves:
+            moves.action_post()
+        self.env['sale.order.installment']._mark_invoiced(moves)
+        self.env.flush_all()
+
+        self.write({
+            'last_order_id': orders[-1].id,
+            'invoice_count': self.invoice_count + len(moves),
+            'skipped_count': self.skipped_count + len(billed),
+            'processing_time': self.processing_time + (time.monotonic() - started),
+        })
+        return True
+
+    @api.model
+    def _cron_run_billing(self, time_budget=CRON_TIME_BUDGET):
+        """Run the running billing runs chunk by chunk, committing after every chunk.
+
+        The (rent_order_id, rent_period) constraint on account.move makes a
+        chunk replayed after a crash fail instead of billing a contract twice.
+        Posting reserves invoice numbers on the shared per-day counters; a
+        chunk that hits a serialization failure on them (another posting of
+        the same day) is rolled back and replayed, as Odoo does for HTTP
+        requests.
+        """
+        started = time.monotonic()
+        for run_id in self.search([('state', '=', 'running')], order='id').ids:
+            while True:
+                run = self.browse(run_id)
+                try:
+                    # retrying() confirma la transacción si el bloque termina bien
+                    more = retrying(run._process_chunk, self.env)
+                except Exception as e:
+                    self.env.cr.rollback()
+                    _logger.exception("Rent billing run %s failed", run_id)
+                    self.browse(run_id).write({'state': 'failed', 'last_error': str(e)})
+                    self.env.cr.commit()
+                    break
+                # Liberamos la caché del ORM entre bloques
+                self.env.invalidate_all()
+                run = self.browse(run_id)
+                _logger.info("Rent billing run %s: %s invoices, %s already billed (%.1f invoices/s)",
+                             run_id, run.invoice_count, run.skipped_count, run.invoices_per_second)
+                if not more:
+                    break
+                if time.monotonic() - started > time_budget:
+                    self.env.ref('custom_woocommerce_api.ir_cron_run_rent_billing')._trigger()
+                    return
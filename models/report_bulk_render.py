@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.pdf import merge_pdf
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import base64
+import hashlib
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 20
+MAX_WORKERS = 4
+CACHE_RETENTION_DAYS = 60
+
+# Campos leídos por las plantillas, precargados por bloques antes de renderizar
+REPORT_PREFETCH = {
+    'account.move': [
+        'partner_id', 'invoice_line_ids', 'invoice_line_ids.product_id', 'invoice_line_ids.product_list_price',
+        'invoice_line_ids.product_id.x_product_url', 'amount_vat_20', 'amount_total_incl_vat_20',
+        'custom_display_number', 'financing_agency_id',
+    ],
+    'sale.order': [
+        'partner_id', 'order_line', 'order_line.product_id', 'order_line.price_quote',
+        'order_line.price_subtotal', 'amount_vat_20', 'amount_total_incl_vat_20',
+    ],
+}
+
+# Registros cuya fecha de modificación forma parte de la clave del caché: todo lo
+# que muestran las plantillas (productos y su plantilla, agencia y su contacto)
+REPORT_HASH_RELATIONS = {
+    'account.move': [
+        'invoice_line_ids', 'invoice_line_ids.product_id', 'invoice_line_ids.product_id.product_tmpl_id',
+        'partner_id', 'financing_agency_id', 'financing_agency_id.partner_id',
+    ],
+    'sale.order': [
+        'order_line', 'order_line.product_id', 'order_line.product_id.product_tmpl_id',
+        'partner_id', 'partner_shipping_id',
+    ],
+}
+# Los PDF combinados solo sirven para la descarga inmediata
+BULK_PDF_RETENTION = timedelta(hours=1)
+
+
+class ReportPdfCache(models.Model):
+    _name = 'report.pdf.cache'
+    _description = 'Rendered Report Cache'
+
+    report_name = fields.Char(required=True, index=True)
+    res_model = fields.Char(required=True)
+    res_id = fields.Integer(required=True)
+    content_hash = fields.Char(required=True, index=True)
+    pdf = fields.Binary(attachment=True)
+
+    @api.autovacuum
+    def _gc_report_cache(self):
+        limit = fields.Datetime.now() - timedelta(days=CACHE_RETENTION_DAYS)
+        self.search([('create_date', '<', limit)]).unlink()
+
+
+class ReportBulkRenderer(models.AbstractModel):
+    _name = 'report.bulk.renderer'
+    _description = 'Bulk PDF Report Renderer'
+
+    @api.model
+    def _content_hashes(self, report, records):
+        """{res_id: hash} of the report/template version, the document id and its write_dates."""
+        relations = REPORT_HASH_RELATIONS.get(records._name, [])
+        # Cualquier cambio de plantilla QWeb (actualización del módulo) invalida el caché
+        template = self.env['ir.ui.view'].sudo().search([('type', '=', 'qweb')], order='write_date desc', limit=1)
+        version = [report.report_name, str(report.write_date), str(template.write_date)]
+        hashes = {}
+        for record in records:
+            # El id entra en el hash: documentos creados en la misma transacción comparten write_date
+            stamps = version + [records._name, str(record.id), str(record.write_date)]
+            for relation in relations:
+                stamps += sorted(str(d) for d in record.mapped(relation).mapped('write_date'))
+            hashes[record.id] = hashlib.sha256('|'.join(stamps).encode()).hexdigest()
+        return hashes
+
+    @api.model
+    def _prefetch(self, records):
+        for path in REPORT_PREFETCH.get(records._name, []):
+            records.mapped(path)
+
+    def _render_chunk(self, report_ref, res_ids):
+        """Render each document of a chunk with a dedicated cursor (runs in a worker thread)."""
+        threading.current_thread().dbname = self.env.cr.dbname
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context, su=self.env.su)
+            Report = env['ir.actions.report']
+            records = env[Report._get_report(report_ref).model].browse(res_ids)
+            self.with_env(env)._prefetch(records)
+            return {
+                res_id: Report._render_qweb_pdf(report_ref, [res_id])[0]
+                for res_id in res_ids
+            }
+
+    @api.model
+    def render(self, report_ref, records, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+        """Merged PDF of `records`, reusing cached documents whose content did not change.
+
+        Missing documents are rendered in chunks by a bounded pool of worker
+        threads, each with its own cursor; the time is spent in the
+        wkhtmltopdf processes, so at most `max_workers` of them run at once.
+        """
+        report = self.env['ir.actions.report']._get_report(report_ref)
+        if not records:
+            raise UserError("Nothing to print.")
+
+        self._prefetch(records)
+        hashes = self._content_hashes(report, records)
+        Cache = self.env['report.pdf.cache'].sudo()
+        cached = Cache.search([
+            ('report_name', '=', report.report_name),
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+            ('content_hash', 'in', list(hashes.values())),
+        ])
+        pdfs = {
+            entry.res_id: base64.b64decode(entry.pdf)
+            for entry in cached if entry.pdf and entry.content_hash == hashes.get(entry.res_id)
+        }
+
+        missing = [res_id for res_id in records.ids if res_id not in pdfs]
+        if missing:
+            # Los hilos usan su propio cursor: solo ven datos ya confirmados
+            # (la impresión se lanza desde la lista, sobre documentos guardados)
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+                for rendered in pool.map(lambda chunk: self._render_chunk(report_ref, chunk), chunks):
+                    pdfs.update(rendered)
+
+            # Reemplazamos las entradas antiguas de esos documentos
+            Cache.search([
+                ('report_name', '=', report.report_name),
+                ('res_model', '=', records._name),
+                ('res_id', 'in', missing),
+            ]).unlink()
+            Cache.create([{
+                'report_name': report.report_name,
+                'res_model': records._name,
+                'res_id': res_id,
+                'content_hash': hashes[res_id],
+                'pdf': base64.b64encode(pdfs[res_id]),
+            } for res_id in missing])
+
+        _logger.info("Bulk report %s: %s documents, %s from cache",
+                     report.report_name, len(records), len(records) - len(missing))
+        return merge_pdf([pdfs[res_id] for res_id in records.ids])
+
+    @api.autovacuum
+    def _gc_bulk_pdfs(self):
+        """Delete the merged PDFs downloaded by `action_print`."""
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('create_date', '<', fields.Datetime.now() - BULK_PDF_RETENTION),
+        ]).unlink()
+
+    @api.model
+    def action_print(self, report_ref, records):
+        """Render `records` in bulk and download the merged PDF.
+
+        The PDF is a temporary attachment of this model, deleted by
+        `_gc_bulk_pdfs` once the download is over.
+        """
+        pdf = self.render(report_ref, records)
+        attachment = self.env['ir.attachment'].create({
+            'name': f"{records._description or records._name} ({len(records)}).pdf",
+            'type': 'binary',
+            'raw': pdf,
+            'mimetype': 'application/pdf',
+            'res_model': self._name,
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'self',
+        }
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+from ..tools.signaled_cache import SignaledCache
+
+# ({código ISO: id}, {nombre: id}) por idioma
+COUNTRY_MAP_CACHE = SignaledCache('country_map', max_size=64)
+
+
+class ResCountry(models.Model):
+    _inherit = 'res.country'
+
+    def init(self):
+        super().init()
+        COUNTRY_MAP_CACHE.create_sequence(self._cr)
+
+    def _woo_country_map(self):
+        """({ISO code: id}, {name: id}) for resolving WooCommerce addresses in memory."""
+        return COUNTRY_MAP_CACHE.get(self.env.cr, self.env.lang, self._woo_build_country_map)[0]
+
+    def _woo_build_country_map(self):
+        countries = self.sudo().search([])
+        by_code = {c.code: c.id for c in countries if c.code}
+        by_name = {}
+        for lang in ('en_US', self.env.lang):
+            for c in countries.with_context(lang=lang):
+                by_name.setdefault(c.name, c.id)
+        return by_code, by_name
+
+    @api.model
+    def _woo_resolve_country(self, value):
+        """Same matching as the former `code = VALUE.upper() OR name = value` search."""
+        value = (value or '').strip()
+        if not value:
+            return False
+        by_code, by_name = self._woo_country_map()
+        return by_code.get(value.upper()) or by_name.get(value) or False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        COUNTRY_MAP_CACHE.invalidate(self.env)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'code', 'name'}.intersection(vals):
+            COUNTRY_MAP_CACHE.invalidate(self.env)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        COUNTRY_MAP_CACHE.invalidate(self.env)
+        return res
@@ -1,7 +1,186 @@
 # models/res_partner.py
-from odoo import models, fields
+from odoo import models, fields, api, tools
+from psycopg2.errors import UniqueViolation
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Índice único de los contactos de entrega creados por la ingesta
+DELIVERY_UNIQUE_INDEX = 'res_partner_woo_delivery_unique'
+
+
+def normalize_email(email):
+    """Key used to match WooCommerce customers: trimmed, case-insensitive."""
+    return (email or '').strip().lower()
+
+
+def delivery_address_hash(name, street, street2, zip_code, city, country_id):
+    """Key of a delivery contact (recipient and address): whitespace-collapsed, case-insensitive.
+
+    migrations/1.6 computes the same key in SQL; keep both in sync.
+    """
+    parts = [' '.join((value or '').split()).lower() for value in (name, street, street2, zip_code, city)]
+    parts.append(str(country_id or ''))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
 
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
-    siren = fields.Char(string="SIREN", help="SIREN number of the partner", required=False)
\ No newline at end of file
+    siren = fields.Char(string="SIREN", help="SIREN number of the partner", required=False)
+
+    woo_delivery = fields.Boolean(
+        string="WooCommerce Delivery Contact", copy=False, readonly=True,
+        help="Delivery contact created by the WooCommerce order import, reused by later orders of the "
+             "customer with the same recipient and address."
+    )
+    woo_address_hash = fields.Char(
+        string="Delivery Address Key", compute='_compute_woo_address_hash', store=True, copy=False,
+        help="Normalized recipient and address of the WooCommerce delivery contacts."
+    )
+
+    @api.depends('woo_delivery', 'type', 'name', 'street', 'street2', 'zip', 'city', 'country_id')
+    def _compute_woo_address_hash(self):
+        for partner in self:
+            partner.woo_address_hash = delivery_address_hash(
+                partner.name, partner.street, partner.street2, partner.zip, partner.city, partner.country_id.id
+            ) if partner.woo_delivery and partner.type == 'delivery' else False
+
+    def init(self):
+        super().init()
+        # Índice funcional para la búsqueda de clientes por email normalizado
+        if not tools.index_exists(self._cr, 'res_partner_email_normalized_woo_index'):
+            tools.create_index(
+                self._cr, 'res_partner_email_normalized_woo_index', self._table,
+                ['lower(trim(email))'], where='email IS NOT NULL',
+            )
+        # Un solo contacto de entrega de la ingesta por cliente, destinatario y dirección;
+        # los contactos creados a mano no entran en el índice
+        if not tools.index_exists(self._cr, DELIVERY_UNIQUE_INDEX):
+            tools.create_unique_index(
+                self._cr, DELIVERY_UNIQUE_INDEX, self._table, ['parent_id', 'woo_address_hash'],
+                where="woo_delivery AND type = 'delivery' AND active AND woo_address_hash IS NOT NULL",
+            )
+        for index in ('res_partner_delivery_address_woo_index', 'res_partner_delivery_address_woo_unique'):
+            tools.drop_index(self._cr, index, self._table)
+
+    @api.model
+    def _woo_lock_emails(self, emails):
+        """Serialize customer upserts per normalized email until the end of the transaction.
+
+        Locks are taken in a stable order so two batches never deadlock.
+        """
+        for key in sorted({normalize_email(email) for email in emails} - {''}):
+            self._cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", ['woocommerce.customer:' + key])
+
+    @api.model
+    def _woo_find_by_emails(self, emails):
+        """Return {normalized email: partner} using the functional index.
+
+        Top-level contacts win over child contacts, then the oldest record.
+        """
+        keys = list({normalize_email(email) for email in emails} - {''})
+        if not keys:
+            return {}
+        self.flush_model(['email', 'active', 'parent_id'])
+        self._cr.execute("""
+            SELECT DISTINCT ON (lower(trim(email))) lower(trim(email)), id
+              FROM res_partner
+             WHERE lower(trim(email)) = ANY(%s) AND email IS NOT NULL AND active
+          ORDER BY lower(trim(email)), parent_id IS NOT NULL, id
+        """, [keys])
+        return {key: self.browse(partner_id) for key, partner_id in self._cr.fetchall()}
+
+    @api.model
+    def _woo_create_customers(self, vals_list):
+        """Create WooCommerce customers and claim their email keys.
+
+        If another transaction created the same customer after ours started,
+        claiming the key raises a serialization failure and Odoo retries the
+        whole request, which then finds the existing partner.
+        """
+        partners = self.create(vals_list)
+        claims = [(normalize_email(p.email), p.id) for p in partners if normalize_email(p.email)]
+        if claims:
+            self.env['woocommerce.customer.key']._claim(claims)
+        return partners
+
+
+    @api.model
+    def _woo_get_delivery_contacts(self, vals_list):
+        """Delivery contact for each of `vals_list` (parent_id, name, street, zip, city, country_id...).
+
+        An active delivery contact created by the import for the same parent,
+        recipient and normalized address is reused; the others are created
+        with one `create`, once per distinct key. The unique index on
+        (parent_id, woo_address_hash) guarantees one such contact per key:
+        if one was created since our lookup, the creation is rolled back to
+        its savepoint and the contacts are read again.
+        """
+        keys = [(vals['parent_id'], delivery_address_hash(
+            vals.get('name'), vals.get('street'), vals.get('street2'), vals.get('zip'), vals.get('city'),
+            vals.get('country_id'),
+        )) for vals in vals_list]
+        existing = self._woo_find_delivery_contacts(keys)
+
+        to_create = {}
+        for key, vals in zip(keys, vals_list):
+            if key not in existing and key not in to_create:
+                to_create[key] = dict(vals, type='delivery', woo_delivery=True)
+        if to_create:
+            try:
+                with self.env.cr.savepoint():
+                    created = self.create(list(to_create.values()))
+                existing.update(zip(to_create, created))
+            except UniqueViolation as e:
+                if e.diag.constraint_name != DELIVERY_UNIQUE_INDEX:
+                    raise
+                # Se reutilizan los contactos creados entretanto y se crean los que siguen faltando;
+                # si otro vuelve a existir, lo confirmó una transacción concurrente y el error sube
+                existing = self._woo_find_delivery_contacts(keys)
+                missing = [key for key in to_create if key not in existing]
+                if missing:
+                    existing.update(zip(missing, self.create([to_create[key] for key in missing])))
+        return [existing[key] for key in keys]
+
+    @api.model
+    def _woo_find_delivery_contacts(self, keys):
+        """{(parent_id, woo_address_hash): contact} of the active import delivery contacts of `keys`."""
+        existing = {}
+        if keys:
+            for partner in self.search([
+                ('woo_delivery', '=', True),
+                ('type', '=', 'delivery'),
+                ('parent_id', 'in', list({parent_id for parent_id, _ in keys})),
+                ('woo_address_hash', 'in', list({key for _, key in keys})),
+            ], order='id'):
+                existing.setdefault((partner.parent_id.id, partner.woo_address_hash), partner)
+        return existing
+
+
+class WooCommerceCustomerKey(models.Model):
+    _name = 'woocommerce.customer.key'
+    _description = 'WooCommerce Customer Email Key'
+    _rec_name = 'email_key'
+
+    email_key = fields.Char(string="Normalized Email", required=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string="Customer", required=True, ondelete='cascade', readonly=True)
+
+    _sql_constraints = [
+        ('email_key_unique', 'unique(email_key)', 'A customer already exists for this email.'),
+    ]
+
+    @api.model
+    def _claim(self, claims):
+        # INSERT ... ON CONFLICT (y no create()) para obtener un error de serialización
+        # reintentable cuando la fila la insertó una transacción concurrente.
+        query = """
+            INSERT INTO woocommerce_customer_key (email_key, partner_id, create_uid, create_date, write_uid, write_date)
+                 VALUES {}
+            ON CONFLICT (email_key) DO NOTHING
+        """.format(', '.join(["(%s, %s, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')"] * len(claims)))
+        params = []
+        for key, partner_id in claims:
+            params += [key, partner_id, self.env.uid, self.env.uid]
+        self._cr.execute(query, params)
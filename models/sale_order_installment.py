@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+
+# Cálculo del plan de cuotas de los pedidos confirmados `ids`: una fila por mes.
+# Con fecha de fin, el contrato cubre todos los meses hasta ella; sin fecha de
+# fin, `installments` meses (mismo criterio que rent.billing.run._is_due).
+# La cuota mensual es el importe sin impuestos del pedido, como en la facturación.
+SCHEDULE_PLAN = """
+    SELECT o.id AS order_id,
+           s.n AS sequence,
+           (o.financing_start_date + (s.n - 1) * interval '1 month')::date AS due_date,
+           o.amount_untaxed AS amount,
+           o.currency_id,
+           o.financing_agency_id,
+           o.partner_id,
+           o.company_id
+      FROM sale_order o
+CROSS JOIN LATERAL generate_series(1, CASE
+               WHEN o.financing_end_date IS NOT NULL THEN
+                   ((date_part('year', o.financing_end_date) - date_part('year', o.financing_start_date)) * 12
+                    + date_part('month', o.financing_end_date) - date_part('month', o.financing_start_date))::int + 1
+               ELSE coalesce(nullif(o.installments, '')::int, 0)
+           END) AS s(n)
+     WHERE o.id = ANY(%(ids)s)
+       AND o.state = 'sale'
+       AND o.financing_start_date IS NOT NULL
+"""
+
+
+class SaleOrderInstallment(models.Model):
+    _name = 'sale.order.installment'
+    _description = 'Contract Installment'
+    _order = 'due_date, order_id, sequence'
+    _rec_name = 'order_id'
+
+    order_id = fields.Many2one('sale.order', string="Contract", required=True, ondelete='cascade', index=True, readonly=True)
+    sequence = fields.Integer(string="Installment", required=True, readonly=True)
+    due_date = fields.Date(string="Due Date", required=True, index=True, readonly=True)
+    amount = fields.Monetary(string="Amount", currency_field='currency_id', readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Currency", readonly=True)
+    financing_agency_id = fields.Many2one('financing.agency', string="Financing Agency", index=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string="Customer", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    state = fields.Selection(
+        [('planned', 'Planned'), ('invoiced', 'Invoiced')],
+        string="Status", default='planned', required=True, readonly=True
+    )
+    move_id = fields.Many2one('account.move', string="Invoice", ondelete='set null', readonly=True)
+
+    _sql_constraints = [
+        ('order_sequence_unique', 'unique(order_id, sequence)', 'This installment already exists for the contract.'),
+    ]
+
+    def init(self):
+        super().init()
+        # "Lo que vence el mes que viene", por agencia: un rango sobre este índice
+        if not tools.index_exists(self._cr, 'sale_order_installment_due_agency_index'):
+            tools.create_index(
+                self._cr, 'sale_order_installment_due_agency_index', self._table,
+                ['due_date', 'financing_agency_id'], where="state = 'planned'",
+            )
+
+    @api.model
+    def _sync_schedule(self, order_ids):
+        """Bring the schedule of `order_ids` in line with the orders, in one statement.
+
+        Only the planned rows that differ from the plan are touched: missing
+        months are inserted, changed ones updated and the ones no longer in
+        the plan (shorter contract, order cancelled) deleted. Invoiced rows
+        are history and are never changed. Returns (deleted, updated, inserted).
+        """
+        if not order_ids:
+            return (0, 0, 0)
+        self.env['sale.order'].flush_model([
+            'state', 'installments', 'financing_start_date', 'financing_end_date', 'amount_untaxed',
+            'currency_id', 'financing_agency_id', 'partner_id', 'company_id',
+        ])
+        self.flush_model()
+        self.env.cr.execute(f"""
+            WITH plan AS ({SCHEDULE_PLAN}),
+            removed AS (
+                DELETE FROM sale_order_installment i
+                 WHERE i.order_id = ANY(%(ids)s)
+                   AND i.state = 'planned'
+                   AND NOT EXISTS (SELECT 1 FROM plan p WHERE p.order_id = i.order_id AND p.sequence = i.sequence)
+             RETURNING i.id
+            ),
+            changed AS (
+                UPDATE sale_order_installment i
+                   SET due_date = p.due_date, amount = p.amount, currency_id = p.currency_id,
+                       financing_agency_id = p.financing_agency_id, partner_id = p.partner_id,
+                       company_id = p.company_id, write_uid = %(uid)s, write_date = now() at time zone 'UTC'
+                  FROM plan p
+                 WHERE i.order_id = p.order_id
+                   AND i.sequence = p.sequence
+                   AND i.state = 'planned'
+                   AND (i.due_date, i.amount, i.currency_id, i.financing_agency_id, i.partner_id, i.company_id)
+                       IS DISTINCT FROM (p.due_date, p.amount, p.currency_id, p.financing_agency_id, p.partner_id, p.company_id)
+             RETURNING i.id
+            ),
+            added AS (
+                INSERT INTO sale_order_installment (order_id, sequence, due_date, amount, currency_id, financing_agency_id,
+                                                    partner_id, company_id, state, create_uid, create_date, write_uid, write_date)
+                     SELECT p.order_id, p.sequence, p.due_date, p.amount, p.currency_id, p.financing_agency_id,
+                            p.partner_id, p.company_id, 'planned',
+                            %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                       FROM plan p
+                      WHERE NOT EXISTS (SELECT 1 FROM sale_order_installment i
+                                         WHERE i.order_id = p.order_id AND i.sequence = p.sequence)
+                  RETURNING id
+            )
+            SELECT (SELECT count(*) FROM removed), (SELECT count(*) FROM changed), (SELECT count(*) FROM added)
+        """, {'ids': list(order_ids), 'uid': self.env.uid})
+        counts = self.env.cr.fetchone()
+        if any(counts):
+            self.invalidate_model()
+            self.env['sale.order'].invalidate_model(['installment_ids'])
+        return counts
+
+    @api.model
+    def _mark_invoiced(self, moves):
+        """Link the rent invoices `moves` to the installment of their contract and period."""
+        if not moves:
+            return
+        moves.flush_recordset(['rent_order_id', 'rent_period'])
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE sale_order_installment i
+               SET state = 'invoiced', move_id = m.id, write_uid = %s, write_date = now() at time zone 'UTC'
+              FROM account_move m
+             WHERE m.id = ANY(%s)
+               AND i.order_id = m.rent_order_id
+               AND date_trunc('month', i.due_date) = m.rent_period
+               AND i.state = 'planned'
+        """, [self.env.uid, moves.ids])
+        self.invalidate_model(['state', 'move_id'])
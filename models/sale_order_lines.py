@@ -1,12 +1,30 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+from collections import defaultdict
 from datetime import timedelta
 from odoo.tools.float_utils import float_round
+from babel import Locale
 from babel.numbers import format_currency
+from ..tools.metrics import track_compute
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# A partir de este número de pedidos las líneas se cargan con una sola consulta
+ORDER_TOTALS_BATCH_THRESHOLD = 50
+
+# Cambios que se notifican a WooCommerce a través de woocommerce.outbox
+WOO_OUTBOX_FIELDS = {'state', 'financing_agency_id'}
+
+# Cambios que rehacen el plan de cuotas (sale.order.installment)
+INSTALLMENT_FIELDS = {
+    'state', 'installments', 'financing_start_date', 'financing_duration', 'financing_agency_id',
+    'partner_id', 'currency_id', 'company_id', 'order_line', 'transport', 'full_service_warranty_percentage',
+}
+
+# Locale resuelto una sola vez (format_currency lo parsearía en cada llamada)
+FR_LOCALE = Locale.parse('fr_FR')
+
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
@@ -17,6 +35,9 @@ class SaleOrder(models.Model):
         help="Number of quotas for payment."
     )
 
+    # Idempotency key: WordPress retries /api/woocommerce/order on timeouts
+    woo_order_id = fields.Char(string="WooCommerce Order ID", copy=False, readonly=True)
+
     financing_duration = fields.Integer(string='Financing Duration (Months)')
     financing_start_date = fields.Date(string='Start Date')
     financing_end_date = fields.Date(
@@ -26,6 +47,7 @@ class SaleOrder(models.Model):
     financing_agency_id = fields.Many2one(
         'financing.agency', string="Financing Agency", ondelete='set null'
     )
+    installment_ids = fields.One2many('sale.order.installment', 'order_id', string="Installment Schedule")
 
     warranty_start_date = fields.Date(
         string='Warranty Start Date', compute='_compute_warranty_dates', store=True
@@ -40,20 +62,20 @@ class SaleOrder(models.Model):
     transport = fields.Float(string="Transport", default=0.0)
 
     margin_amount = fields.Monetary(
-        string="Margin (€)", compute="_compute_margin", store=True
+        string="Margin (€)", compute="_compute_order_totals", store=True
     )
     margin_percent = fields.Float(
-        string="Margin (%)", compute="_compute_margin", store=True
+        string="Margin (%)", compute="_compute_order_totals", store=True
     )
 
     amount_untaxed = fields.Monetary(
-        string='Untaxed Amount', compute='_amount_all', store=True, readonly=True
+        string='Untaxed Amount', compute='_compute_order_totals', store=True, readonly=True
     )
     amount_tax = fields.Monetary(
-        string='Taxes', compute='_amount_all', store=True, readonly=True
+        string='Taxes', compute='_compute_order_totals', store=True, readonly=True
     )
     amount_total = fields.Monetary(
-        string='Total', compute='_amount_all', store=True, readonly=True
+        string='Total', compute='_compute_order_totals', store=True, readonly=True
     )
 
     # Optional helper for UI refresh (can keep or remove)
@@ -64,13 +86,13 @@ class SaleOrder(models.Model):
 
     amount_vat_20 = fields.Monetary(
         string="IVA (20%)",
-        compute="_compute_vat_20",
+        compute="_compute_order_totals",
         store=True,
         currency_field='currency_id'
     )
     amount_total_incl_vat_20 = fields.Monetary(
         string="Total Incl. IVA",
-        compute="_compute_vat_20",
+        compute="_compute_order_totals",
         store=True,
         currency_field='currency_id'
     )
@@ -78,70 +100,108 @@ class SaleOrder(models.Model):
     amount_total_sans_tva = fields.Monetary(
         string='TOTAL (Sans TVA)',
         currency_field='currency_id',
-        compute='_compute_amount_total_sans_tva',
+        compute='_compute_order_totals',
         store=True
     )
 
     list_price_total = fields.Monetary(
         string='List Price Total',
         currency_field='currency_id',
-        compute='_compute_list_price_total',
+        compute='_compute_order_totals',
         store=True
     )
 
+    _sql_constraints = [
+        ('woo_order_id_unique', 'unique(woo_order_id)', 'This WooCommerce order has already been imported.'),
+    ]
+
     # ---------- COMPUTES (ORDER LEVEL) ----------
 
-    @api.depends('installments', 'order_line.effective_price_quote', 'order_line.product_uom_qty')
-    def _compute_amount_total_sans_tva(self):
+    @api.depends(
+        'order_line.price_subtotal',
+        'order_line.price_tax',
+        'order_line.effective_price_quote',
+        'order_line.product_id',
+        'order_line.product_uom_qty',
+        'installments',
+        'transport',
+        'currency_id',
+    )
+    @track_compute
+    def _compute_order_totals(self):
+        """All order-level aggregates (amounts, VAT 20%, TOTAL sans TVA, list price total, margin)."""
+        line_sums = self._get_order_line_sums()
         for order in self:
+            sums = line_sums[order.id]
+            rounding = order.currency_id.rounding
             months = int(order.installments or '1')
-            total = 0.0
-            for line in order.order_line:
-                # TOTAL (Sans TVA) = monthly final * months (no taxes)
-                total += (line.effective_price_quote or 0.0) * months
-            order.amount_total_sans_tva = total
 
-    @api.depends('order_line.product_id', 'order_line.product_uom_qty')
-    def _compute_list_price_total(self):
-        for order in self:
-            order.list_price_total = sum(
-                (l.product_id.list_price or 0.0) * (l.product_uom_qty or 0.0)
-                for l in order.order_line
+            # Importes (cuota mensual) + transporte
+            amount_untaxed = float_round(sums['subtotal'], precision_rounding=rounding)
+            order.amount_untaxed = amount_untaxed
+            order.amount_tax = float_round(sums['tax'], precision_rounding=rounding)
+            order.amount_total = float_round(
+                sums['subtotal'] + sums['tax'] + order.transport, precision_rounding=rounding
             )
+            order.display_amount_total = order.amount_total  # optional UI nudge
+
+            # IVA 20% sobre el importe sin impuestos ya redondeado
+            vat = amount_untaxed * 0.20
+            order.amount_vat_20 = float_round(vat, precision_rounding=rounding)
+            order.amount_total_incl_vat_20 = float_round(amount_untaxed + vat, precision_rounding=rounding)
+
+            # TOTAL (Sans TVA) = monthly final * months (no taxes)
+            order.amount_total_sans_tva = sums['effective_months']
+            order.list_price_total = sums['list_price']
 
-    @api.depends('order_line.price_subtotal', 'order_line.product_id', 'installments')
-    def _compute_margin(self):
-        for order in self:
             # price_subtotal on the line is monthly (final) * qty
-            monthly_total = sum(l.price_subtotal for l in order.order_line)
-            months = int(order.installments or '1')
-            full_quote = monthly_total * months
-            total_cost = sum((l.product_id.lst_price or 0.0) for l in order.order_line)
-            margin = full_quote - total_cost
+            margin = sums['subtotal'] * months - sums['cost']
+            order.margin_amount = float_round(margin, precision_rounding=rounding)
+            order.margin_percent = float_round((margin / sums['cost']) * 100, 2) if sums['cost'] else 0.0
 
-            currency = order.currency_id
-            order.margin_amount = float_round(margin, precision_rounding=currency.rounding)
-            order.margin_percent = float_round((margin / total_cost) * 100, 2) if total_cost else 0.0
+    def _get_order_line_sums(self):
+        """Per-order sums of the line values used by `_compute_order_totals`.
 
-    @api.depends('amount_untaxed')
-    def _compute_vat_20(self):
-        for order in self:
-            vat = order.amount_untaxed * 0.20
-            total = order.amount_untaxed + vat
-            order.amount_vat_20 = float_round(vat, precision_rounding=order.currency_id.rounding)
-            order.amount_total_incl_vat_20 = float_round(total, precision_rounding=order.currency_id.rounding)
+        Large recordsets of saved orders load all their lines with one
+        `search_fetch` (and their products with one `fetch`) instead of
+        reading `order_line` order by order; small or unsaved sets (onchange)
+        use `order_line`. Both sum the same per-line values in the same line
+        order, so an order stores the same totals whatever the size of the
+        batch it was computed in.
+        """
+        sums = {order.id: {'subtotal': 0.0, 'tax': 0.0, 'effective_months': 0.0,
+                           'list_price': 0.0, 'cost': 0.0} for order in self}
+        saved = self.filtered(lambda o: isinstance(o.id, int))
+        if len(saved) < ORDER_TOTALS_BATCH_THRESHOLD or len(saved) != len(self):
+            for order in self:
+                self._add_line_sums(sums[order.id], order.order_line, int(order.installments or '1'))
+            return sums
 
-    @api.depends('order_line.price_subtotal', 'order_line.price_tax', 'transport')
-    def _amount_all(self):
+        # Mismo orden que order.order_line (_order de sale.order.line)
+        lines = self.env['sale.order.line'].search_fetch(
+            [('order_id', 'in', saved.ids)],
+            ['order_id', 'price_subtotal', 'price_tax', 'effective_price_quote', 'product_id', 'product_uom_qty'],
+        )
+        lines.product_id.fetch(['list_price'])
+        lines_by_order = defaultdict(list)
+        for line in lines:
+            lines_by_order[line.order_id.id].append(line)
         for order in self:
-            amount_untaxed = sum(l.price_subtotal for l in order.order_line)
-            amount_tax = sum(l.price_tax for l in order.order_line)
-            total = amount_untaxed + amount_tax + order.transport
+            self._add_line_sums(sums[order.id], lines_by_order[order.id], int(order.installments or '1'))
+        return sums
 
-            order.amount_untaxed = float_round(amount_untaxed, precision_rounding=order.currency_id.rounding)
-            order.amount_tax = float_round(amount_tax, precision_rounding=order.currency_id.rounding)
-            order.amount_total = float_round(total, precision_rounding=order.currency_id.rounding)
-            order.display_amount_total = order.amount_total  # optional UI nudge
+    @staticmethod
+    def _add_line_sums(order_sums, lines, months):
+        order_sums['subtotal'] = sum(l.price_subtotal for l in lines)
+        order_sums['tax'] = sum(l.price_tax for l in lines)
+        total = 0.0
+        for line in lines:
+            total += (line.effective_price_quote or 0.0) * months
+        order_sums['effective_months'] = total
+        order_sums['list_price'] = sum(
+            (l.product_id.list_price or 0.0) * (l.product_uom_qty or 0.0) for l in lines
+        )
+        order_sums['cost'] = sum((l.product_id.lst_price or 0.0) for l in lines)
 
     @api.depends('date_order')
     def _compute_warranty_dates(self):
@@ -183,11 +243,48 @@ class SaleOrder(models.Model):
         """
         if 'installments' in vals:
             self.mapped('order_line').write({'manual_price_quote': 0.0})
-        return super().write(vals)
+        before = self._woo_outbox_snapshot() if WOO_OUTBOX_FIELDS.intersection(vals) else None
+        res = super().write(vals)
+        if before:
+            self._woo_outbox_notify(before)
+        # defer_installment_sync: quien escribe sincroniza él mismo tras recalcular los importes
+        if INSTALLMENT_FIELDS.intersection(vals) and not self.env.context.get('defer_installment_sync'):
+            # Al cambiar de estado también se limpian los planes de los pedidos cancelados
+            orders = self if 'state' in vals else self.filtered(lambda o: o.state == 'sale')
+            orders._sync_installments()
+        return res
+
+    def _sync_installments(self):
+        return self.env['sale.order.installment']._sync_schedule(self.ids)
+
+    # ---------- WOOCOMMERCE OUTBOX ----------
+
+    def _woo_outbox_snapshot(self):
+        return {order.id: (order.state, order.financing_agency_id.id) for order in self if order.woo_order_id}
+
+    def _woo_outbox_data(self):
+        self.ensure_one()
+        return {'order': {
+            'id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'financing_agency': self.financing_agency_id.name or None,
+        }}
+
+    def _woo_outbox_notify(self, before):
+        """Stage an outbox event for every WooCommerce order whose state or agency changed."""
+        events = []
+        for order in self.browse(list(before)):
+            state, agency_id = before[order.id]
+            if order.state != state:
+                events.append(('order.state', order, order.woo_order_id, order._woo_outbox_data()))
+            if order.financing_agency_id.id != agency_id:
+                events.append(('order.financing_agency', order, order.woo_order_id, order._woo_outbox_data()))
+        self.env['woocommerce.outbox']._enqueue(events)
 
-    @api.model
-    def create(self, vals):
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        return super().create(vals_list)
 
     def _prepare_invoice(self):
         invoice_vals = super()._prepare_invoice()
@@ -211,5 +308,5 @@ class SaleOrder(models.Model):
             tax_totals['amount_untaxed'] = float_round(
                 order.amount_untaxed, precision_rounding=order.currency_id.rounding
             )
-            tax_totals['formatted_amount_total'] = format_currency(new_total, 'EUR', locale='fr_FR')
+            tax_totals['formatted_amount_total'] = format_currency(new_total, 'EUR', locale=FR_LOCALE)
             order.tax_totals = tax_totals
\ No newline at end of file
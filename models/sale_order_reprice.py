@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Tiempo máximo de una ejecución del cron antes de re-dispararse
+CRON_TIME_BUDGET = 240
+
+# Campos almacenados que el repricing recalcula (cuotas, importes de línea y totales)
+REPRICE_LINE_FIELDS = ['price_quote', 'effective_price_quote', 'price_subtotal', 'price_tax', 'price_total']
+REPRICE_ORDER_FIELDS = [
+    'amount_untaxed', 'amount_tax', 'amount_total', 'amount_vat_20', 'amount_total_incl_vat_20',
+    'amount_total_sans_tva', 'list_price_total', 'margin_amount', 'margin_percent',
+]
+
+
+class SaleOrderRepriceJob(models.Model):
+    _name = 'sale.order.reprice.job'
+    _description = 'Quotation Repricing Job'
+    _order = 'id desc'
+
+    name = fields.Char(string="Description", required=True, default="Repricing")
+    domain = fields.Char(
+        string="Orders", required=True,
+        default="[('state', 'in', ['draft', 'sent'])]",
+        help="Domain of the sale orders to reprice."
+    )
+    installments = fields.Selection(
+        [('24', '24'), ('36', '36'), ('48', '48'), ('60', '60')],
+        string="New Quotas",
+        help="If set, applied to every order (manual monthly quotes are cleared, as in the form)."
+    )
+    full_service_warranty_percentage = fields.Float(
+        string="New Warranty Percentage",
+        help="If set, applied to every order before repricing."
+    )
+    set_warranty_percentage = fields.Boolean(string="Change Warranty Percentage")
+    chunk_size = fields.Integer(string="Orders per Chunk", default=200, required=True)
+
+    state = fields.Selection(
+        [('draft', 'Draft'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')],
+        string="Status", default='draft', required=True, readonly=True
+    )
+    last_order_id = fields.Integer(string="Last Processed Order", readonly=True, default=0)
+    total_count = fields.Integer(string="Orders to Reprice", readonly=True)
+    processed_count = fields.Integer(string="Orders Repriced", readonly=True)
+    line_count = fields.Integer(string="Lines Repriced", readonly=True)
+    progress = fields.Float(string="Progress (%)", compute='_compute_progress')
+    date_start = fields.Datetime(string="Started", readonly=True)
+    date_end = fields.Datetime(string="Finished", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    @api.depends('processed_count', 'total_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = (job.processed_count / job.total_count * 100.0) if job.total_count else 0.0
+
+    def _get_domain(self):
+        self.ensure_one()
+        return safe_eval(self.domain or '[]')
+
+    def _get_order_vals(self):
+        self.ensure_one()
+        vals = {}
+        if self.installments:
+            vals['installments'] = self.installments
+        if self.set_warranty_percentage:
+            vals['full_service_warranty_percentage'] = self.full_service_warranty_percentage
+        return vals
+
+    # ---------- ACTIONS ----------
+
+    def action_start(self):
+        for job in self:
+            if job.state != 'draft':
+                raise UserError("Only draft jobs can be started.")
+            job.write({
+                'state': 'running',
+                'total_count': self.env['sale.order'].search_count(job._get_domain()),
+                'date_start': fields.Datetime.now(),
+            })
+        self.env.ref('custom_woocommerce_api.ir_cron_run_reprice_jobs')._trigger()
+
+    def action_resume(self):
+        """Continue a failed job from its last committed chunk."""
+        self.filtered(lambda j: j.state == 'failed').write({'state': 'running', 'last_error': False})
+        self.env.ref('custom_woocommerce_api.ir_cron_run_reprice_jobs')._trigger()
+
+    # ---------- PROCESSING ----------
+
+    def _process_chunk(self):
+        """Reprice the next chunk of orders. Returns False once the job is finished."""
+        self.ensure_one()
+        SaleOrder = self.env['sale.order']
+        orders = SaleOrder.search(
+            self._get_domain() + [('id', '>', self.last_order_id)], order='id', limit=self.chunk_size
+        )
+        if not orders:
+            self.write({'state': 'done', 'date_end': fields.Datetime.now()})
+            return False
+
+        vals = self._get_order_vals()
+        if vals:
+            # Un solo write para todo el bloque (SaleOrder.write limpia las cuotas manuales);
+            # el plan de cuotas se sincroniza una vez, tras el recálculo
+            orders.with_context(defer_installment_sync=True).write(vals)
+
+        # Solo se encolan los campos calculados de este módulo: marcar como modificados
+        # los campos de entrada (cantidad...) haría que los computes estándar de venta
+        # reescribieran price_unit desde la tarifa y se perdería el precio de WooCommerce.
+        lines = orders.order_line
+        for fname in REPRICE_LINE_FIELDS:
+            self.env.add_to_compute(lines._fields[fname], lines)
+        for fname in REPRICE_ORDER_FIELDS:
+            self.env.add_to_compute(orders._fields[fname], orders)
+        self.env.flush_all()
+        # El importe de las cuotas planificadas es el amount_untaxed recién recalculado
+        orders.filtered(lambda o: o.state == 'sale')._sync_installments()
+
+        self.write({
+            'last_order_id': orders[-1].id,
+            'processed_count': self.processed_count + len(orders),
+            'line_count': self.line_count + len(lines),
+        })
+        return True
+
+    @api.model
+    def _cron_run_jobs(self, time_budget=CRON_TIME_BUDGET):
+        """Run the running jobs chunk by chunk, committing after every chunk.
+
+        The job keeps its position (last order id), so an interrupted run
+        continues where the last committed chunk ended.
+        """
+        started = time.monotonic()
+        for job_id in self.search([('state', '=', 'running')], order='id').ids:
+            while True:
+                job = self.browse(job_id)
+                try:
+                    more = job._process_chunk()
+                    self.env.cr.commit()
+                except Exception as e:
+                    self.env.cr.rollback()
+                    _logger.exception("Repricing job %s failed", job_id)
+                    self.browse(job_id).write({'state': 'failed', 'last_error': str(e)})
+                    self.env.cr.commit()
+                    break
+                # Liberamos la caché del ORM entre bloques
+                self.env.invalidate_all()
+                job = self.browse(job_id)
+                _logger.info("Repricing job %s: %s/%s orders (%.1f%%)",
+                             job_id, job.processed_count, job.total_count, job.progress)
+                if not more:
+                    break
+                if time.monotonic() - started > time_budget:
+                    self.env.ref('custom_woocommerce_api.ir_cron_run_reprice_jobs')._trigger()
+                    return
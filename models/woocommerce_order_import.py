@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+from psycopg2 import OperationalError, errorcodes
+from psycopg2.errors import UniqueViolation
+from .res_partner import normalize_email
+from ..tools import payload_schema
+from ..tools.payload_schema import PayloadError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# installments (quote) - normalize to the string keys used by the PALIER dict
+INSTALLMENT_TIERS = {'12', '24', '36', '48', '60'}
+DEFAULT_INSTALLMENTS = '24'
+
+# Errores que Odoo reintenta (con backoff) re-ejecutando la petición completa
+PG_CONCURRENCY_ERRORS_TO_RETRY = (
+    errorcodes.LOCK_NOT_AVAILABLE,
+    errorcodes.SERIALIZATION_FAILURE,
+    errorcodes.DEADLOCK_DETECTED,
+)
+
+
+def is_concurrency_error(error):
+    return isinstance(error, OperationalError) and error.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY
+
+
+class WooCommerceOrderImport(models.AbstractModel):
+    _name = 'woocommerce.order.import'
+    _description = 'WooCommerce Order Import'
+
+    # ---------- PARSING ----------
+
+    @api.model
+    def _parse_order(self, order_data):
+        """Normalize one WooCommerce order payload (the content of `order`).
+
+        The payload is checked by the compiled schema of
+        tools/payload_schema.py, which raises PayloadError listing every
+        invalid field. Nothing is read from or written to the database.
+        """
+        data = payload_schema.validate_order(order_data)
+        customer_data = data['customer']
+
+        # Datos de dirección: Billing (Principal) y Shipping (Entrega)
+        billing_data = {k: v for k, v in data['billing']['address'].items() if v is not None}
+        shipping_data = {k: v for k, v in data['shipping']['address'].items() if v is not None}
+
+        # Usamos Billing como dirección principal. Si falta, fallback a Shipping (por seguridad)
+        main_address = billing_data if billing_data.get('street') else shipping_data
+
+        installments = data['quote'] or DEFAULT_INSTALLMENTS
+        if installments not in INSTALLMENT_TIERS:
+            installments = DEFAULT_INSTALLMENTS  # default safe fallback
+
+        lines = [{
+            'sku': p['sku'],
+            'qty': p['quantity'] or 1,
+            'discount': p['price_discount'],
+            # price_quote from metadata (manual override per month)
+            'manual_quote': p['price_quote'] if p['price_quote'] > 0 else 0.0,
+        } for p in data['products']]
+
+        return {
+            'customer': customer_data,
+            'email': customer_data['email'].strip(),
+            'address': main_address,
+            'shipping': shipping_data,
+            'country': (main_address.get('country') or '').strip(),
+            'note': data['metadata']['order_note'],
+            'installments': installments,
+            'lines': lines,
+        }
+
+    # ---------- REFERENCE RESOLUTION ----------
+
+    @api.model
+    def _resolve_references(self, parsed_orders):
+        """Resolve every SKU and customer email with one query each.
+
+        Countries come from the in-memory map of res.country.
+        """
+        skus = {line['sku'] for order in parsed_orders for line in order['lines']}
+        countries = {order['country'] for order in parsed_orders if order['country']}
+        emails = {order['email'] for order in parsed_orders if order['email']}
+
+        products = {}
+        Product = self.env['product.product']
+        if len(parsed_orders) == 1:
+            # Pedido suelto: los SKUs se resuelven casi siempre desde el caché
+            ids = {sku: Product._get_id_by_sku(sku) for sku in skus}
+            products = {sku: Product.browse(product_id) for sku, product_id in ids.items() if product_id}
+        elif skus:
+            for product in Product.search([('default_code', 'in', list(skus))]):
+                products.setdefault(product.default_code, product)
+
+        Country = self.env['res.country']
+        country_ids = {country: Country._woo_resolve_country(country) for country in countries}
+
+        # Bloqueo por email antes de buscar: dos pedidos simultáneos del mismo
+        # cliente nuevo se serializan en lugar de crear dos contactos.
+        Partner = self.env['res.partner']
+        Partner._woo_lock_emails(emails)
+        partners = Partner._woo_find_by_emails(emails)
+
+        return {'products': products, 'countries': country_ids, 'partners': partners}
+
+    # ---------- WRITE PATH ----------
+
+    @api.model
+    def _create_orders(self, parsed_orders, refs):
+        """Create partners, orders and lines for already validated payloads.
+
+        Every model is written with a single multi-record `create`. Returns the
+        created `sale.order` records in the same order as `parsed_orders`.
+        """
+        Partner = self.env['res.partner']
+
+        # 1) Customers: one create for the new ones, one write per existing one.
+        #    Several orders of the same customer merge like successive updates.
+        new_vals, existing_vals = {}, {}
+        for order in parsed_orders:
+            customer, address = order['customer'], order['address']
+            country_id = refs['countries'].get(order['country'], False)
+            key = normalize_email(order['email']) or id(order)
+            if key in refs['partners']:
+                vals = existing_vals.setdefault(key, {})
+            elif key in new_vals:
+                vals = new_vals[key]
+            else:
+                new_vals[key] = {
+                    'name': customer.get('name') or 'Customer',
+                    'email': order['email'],
+                    'siren': customer.get('siren', '') or '',
+                    'street': address.get('street', '') or '',
+                    'city': address.get('city', '') or '',
+                    'zip': address.get('zip_code', '') or '',  # Mapeo zip_code -> zip
+                    'country_id': country_id,
+                }
+                continue
+            # Si el cliente existe, actualizamos su dirección con la nueva info (si la hay)
+            update = {
+                'street': address.get('street'),
+                'city': address.get('city'),
+                'zip': address.get('zip_code'),
+                'country_id': country_id,
+                'siren': customer.get('siren'),
+            }
+            vals.update({field: value for field, value in update.items() if value})
+
+        partners = dict(refs['partners'])
+        if new_vals:
+            partners.update(zip(new_vals, Partner._woo_create_customers(list(new_vals.values()))))
+        for key, vals in existing_vals.items():
+            if vals:
+                partners[key].write(vals)
+
+        order_partners = [partners[normalize_email(order['email']) or id(order)] for order in parsed_orders]
+
+        # 2) Shipping partners (optional): an identical address of the customer is reused
+        shipping_orders = [i for i, order in enumerate(parsed_orders) if any(order['shipping'].values())]
+        shipping_partners = Partner._woo_get_delivery_contacts([{
+            'name': order_partners[i].name,
+            'street': parsed_orders[i]['shipping'].get('street', '') or '',
+            'city': parsed_orders[i]['shipping'].get('city', '') or '',
+            'zip': parsed_orders[i]['shipping'].get('zip_code', '') or '',
+            # Usamos el country_id ya resuelto para evitar errores con códigos ISO
+            'country_id': refs['countries'].get(parsed_orders[i]['country'], False),
+            'parent_id': order_partners[i].id,
+        } for i in shipping_orders])
+        shipping_by_order = dict(zip(shipping_orders, shipping_partners))
+
+        # 3) Orders (installments set up-front: the parent has its value before the lines)
+        order_vals_list = []
+        for i, order in enumerate(parsed_orders):
+            vals = {
+                'partner_id': order_partners[i].id,
+                'note': order['note'],
+                'installments': order['installments'],
+                'woo_order_id': order.get('woo_order_id') or False,
+            }
+            if i in shipping_by_order:
+                vals['partner_shipping_id'] = shipping_by_order[i].id
+            order_vals_list.append(vals)
+        sale_orders = self.env['sale.order'].create(order_vals_list)
+
+        # 4) Lines for every order in one create
+        line_vals_list = []
+        for sale_order, order in zip(sale_orders, parsed_orders):
+            for line in order['lines']:
+                product = refs['products'][line['sku']]
+                line_vals_list.append({
+                    'order_id': sale_order.id,
+                    'product_id': product.id,
+                    'product_uom_qty': line['qty'],
+                    'price_unit': product.lst_price,
+                    'price_quote': line['manual_quote'],
+                    'display_price_quote': line['manual_quote'],
+                    'discount_price': line['discount'],
+                })
+        self.env['sale.order.line'].create(line_vals_list)
+
+        # Force ORM to flush so stored computes on lines are finalized (and fail) here
+        self.env.flush_all()
+
+        # Newly created customers can be reused by the following orders
+        for order, partner in zip(parsed_orders, order_partners):
+            if order['email']:
+                refs['partners'].setdefault(normalize_email(order['email']), partner)
+
+        return sale_orders
+
+    @api.model
+    def _order_response(self, sale_order):
+        return {
+            "status": "success",
+            "message": "Order created successfully",
+            "order_id": sale_order.id,
+            "order_name": sale_order.name,
+            "installments": sale_order.installments,
+        }
+
+    @api.model
+    def _order_key(self, order_data):
+        """WooCommerce order id, used as idempotency key ('' when not sent)."""
+        if not isinstance(order_data, dict):
+            return ''
+        return str(order_data.get('id') or order_data.get('order_id') or '').strip()
+
+    @api.model
+    def _find_imported_orders(self, keys):
+        """Responses of already imported orders, from one lookup on the unique index."""
+        if not keys:
+            return {}
+        self.env['sale.order'].flush_model(['woo_order_id', 'name', 'installments'])
+        self.env.cr.execute("""
+            SELECT woo_order_id, id, name, installments
+              FROM sale_order
+             WHERE woo_order_id = ANY(%s)
+        """, [list(keys)])
+        return {
+            key: {
+                "status": "success",
+                "message": "Order created successfully",
+                "order_id": order_id,
+                "order_name": name,
+                "installments": installments,
+                "replayed": True,
+            }
+            for key, order_id, name, installments in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def import_orders(self, orders):
+        """Import a list of WooCommerce order payloads.
+
+        Returns one response per order, in the same order, with the
+        `status`/`message` keys expected by the WordPress plugin. Orders whose
+        WooCommerce id was already imported get their original response back
+        without any write. The others are first created together; if that
+        fails, each order is retried in its own savepoint so that a bad order
+        does not roll back the others.
+        """
+        results = [None] * len(orders)
+        keys = [self._order_key(order_data) for order_data in orders]
+        imported = self._find_imported_orders({key for key in keys if key})
+
+        pending, first_index = {}, {}
+        for index, (key, order_data) in enumerate(zip(keys, orders)):
+            if key in imported:
+                results[index] = dict(imported[key])
+            elif key and key in first_index:
+                continue  # mismo pedido repetido en el lote: misma respuesta
+            else:
+                if key:
+                    first_index[key] = index
+                pending[index] = order_data
+
+        if pending:
+            for index, result in self._import_new_orders(pending).items():
+                results[index] = result
+
+        for index, key in enumerate(keys):
+            if results[index] is None:
+                results[index] = dict(results[first_index[key]])
+        return results
+
+    @api.model
+    def _import_new_orders(self, orders):
+        """Parse, resolve and create {index: payload}; returns {index: response}."""
+        results = {}
+        parsed = {}
+        for index, order_data in orders.items():
+            try:
+                parsed[index] = self._parse_order(order_data)
+                parsed[index]['woo_order_id'] = self._order_key(order_data) or False
+            except PayloadError as e:
+                results[index] = e.to_response()
+            except Exception as e:
+                results[index] = {"status": "error", "message": f"Error: {str(e)}"}
+
+        # Todas las referencias se resuelven antes de cualquier escritura
+        refs = self._resolve_references(list(parsed.values()))
+        for index, order in list(parsed.items()):
+            errors = [{"field": f"products[{position}].sku", "code": "not_found",
+                       "message": f"Product with SKU {line['sku']} not found"}
+                      for position, line in enumerate(order['lines']) if line['sku'] not in refs['products']]
+            if errors:
+                results[index] = PayloadError(errors).to_response()
+                del parsed[index]
+
+        if not parsed:
+            return results
+
+        if len(parsed) > 1:
+            try:
+                with self.env.cr.savepoint():
+                    sale_orders = self._create_orders(list(parsed.values()), refs)
+                for index, sale_order in zip(parsed, sale_orders):
+                    results[index] = self._order_response(sale_order)
+                return results
+            except Exception as e:
+                if is_concurrency_error(e):
+                    raise
+                _logger.info("Bulk import of %s WooCommerce orders failed, retrying one by one", len(parsed))
+
+        for index, order in parsed.items():
+            try:
+                with self.env.cr.savepoint():
+                    sale_order = self._create_orders([order], refs)
+                results[index] = self._order_response(sale_order)
+            except UniqueViolation as e:
+                if e.diag.constraint_name != 'sale_order_woo_order_id_unique':
+                    _logger.exception("WooCommerce order import failed")
+                    results[index] = {"status": "error", "message": f"Error: {str(e)}"}
+                    continue
+                # Otro worker importó este pedido mientras tanto; el siguiente reintento
+                # del plugin recibirá la respuesta original.
+                results[index] = {"status": "error",
+                                  "message": f"Order {order['woo_order_id']} is already being processed"}
+            except Exception as e:
+                if is_concurrency_error(e):
+                    raise
+                _logger.exception("WooCommerce order import failed")
+                results[index] = {"status": "error", "message": f"Error: {str(e)}"}
+        return results
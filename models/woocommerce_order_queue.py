@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import timedelta
+from .woocommerce_order_import import is_concurrency_error
+import json
+import logging
+import uuid
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 50
+# Lotes por ejecución del cron antes de ceder el hilo (se re-dispara si quedan filas)
+MAX_BATCHES_PER_RUN = 20
+
+
+class WooCommerceOrderQueue(models.Model):
+    _name = 'woocommerce.order.queue'
+    _description = 'WooCommerce Order Staging Queue'
+    _order = 'id desc'
+    _rec_name = 'ticket'
+
+    ticket = fields.Char(
+        string="Ticket", required=True, readonly=True, copy=False,
+        default=lambda self: uuid.uuid4().hex
+    )
+    woo_order_id = fields.Char(string="WooCommerce Order ID", readonly=True, index=True)
+    payload = fields.Text(string="Payload", readonly=True, help="Raw `order` object received from WooCommerce.")
+    state = fields.Selection(
+        [('pending', 'Pending'), ('done', 'Done'), ('dead', 'Dead Letter')],
+        string="Status", default='pending', required=True, index=True
+    )
+    attempts = fields.Integer(string="Attempts", default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string="Next Attempt", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+    response = fields.Text(string="Response", readonly=True)
+    sale_order_id = fields.Many2one('sale.order', string="Sale Order", readonly=True, ondelete='set null')
+
+    _sql_constraints = [
+        ('ticket_unique', 'unique(ticket)', 'The ticket must be unique.'),
+    ]
+
+    # ---------- INTAKE ----------
+
+    @api.model
+    def enqueue(self, order_data):
+        """Stage one order payload and return its queue row.
+
+        A payload whose WooCommerce id is already waiting in the queue
+        returns the existing row instead of a new one.
+        """
+        key = self.env['woocommerce.order.import']._order_key(order_data)
+        if key:
+            staged = self.search([('woo_order_id', '=', key), ('state', '=', 'pending')], limit=1)
+            if staged:
+                return staged
+        row = self.create({'woo_order_id': key or False, 'payload': json.dumps(order_data)})
+        cron = self.env.ref('custom_woocommerce_api.ir_cron_process_woocommerce_order_queue', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return row
+
+    def _status_response(self):
+        self.ensure_one()
+        if self.state == 'done':
+            return dict(json.loads(self.response or '{}'), ticket=self.ticket, state=self.state)
+        if self.state == 'dead':
+            return {"status": "error", "message": self.last_error or "Order could not be processed",
+                    "ticket": self.ticket, "state": self.state}
+        return {"status": "accepted", "message": "Order is queued for processing",
+                "ticket": self.ticket, "state": self.state, "attempts": self.attempts}
+
+    # ---------- WORKERS ----------
+
+    @api.model
+    def _claim_batch(self, limit=BATCH_SIZE):
+        """Lock the next pending rows; rows locked by another worker are skipped."""
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT id
+              FROM woocommerce_order_queue
+             WHERE state = 'pending'
+               AND (next_attempt_date IS NULL OR next_attempt_date <= (now() at time zone 'UTC'))
+          ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _process(self):
+        """Build the sale orders of the claimed rows with the shared import logic.
+
+        Rows rejected by validation (the response lists the invalid fields)
+        go straight to the dead letters; other failures are retried with
+        backoff up to MAX_ATTEMPTS.
+        """
+        payloads = []
+        for row in self:
+            try:
+                payloads.append(json.loads(row.payload or '{}'))
+            except ValueError:
+                payloads.append(None)
+
+        results = self.env['woocommerce.order.import'].sudo().import_orders(payloads)
+        now = fields.Datetime.now()
+        for row, result in zip(self, results):
+            if result.get('status') == 'success':
+                row.write({
+                    'state': 'done',
+                    'sale_order_id': result.get('order_id'),
+                    'response': json.dumps(result),
+                    'last_error': False,
+                    'attempts': row.attempts + 1,
+                })
+                continue
+            attempts = row.attempts + 1
+            # Un payload inválido (esquema, SKU desconocido) fallará igual en cada reintento
+            invalid = bool(result.get('errors'))
+            row.write({
+                'state': 'dead' if invalid or attempts >= MAX_ATTEMPTS else 'pending',
+                'attempts': attempts,
+                'last_error': result.get('message'),
+                # backoff exponencial: 1, 2, 4, 8... minutos
+                'next_attempt_date': False if invalid else now + timedelta(minutes=2 ** (attempts - 1)),
+            })
+
+    @api.model
+    def _cron_process_queue(self, batch_size=BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN):
+        """Drain the queue in committed batches.
+
+        Several workers can run this at the same time: rows are claimed with
+        FOR UPDATE SKIP LOCKED, so each batch is processed by one worker only.
+        """
+        for _ in range(max_batches):
+            rows = self._claim_batch(batch_size)
+            if not rows:
+                return
+            try:
+                rows._process()
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                if is_concurrency_error(e):
+                    _logger.info("WooCommerce queue batch hit a concurrency error, will retry: %s", e)
+                    return
+                _logger.exception("WooCommerce queue batch failed, processing rows one by one")
+                for row in rows:
+                    self._process_single(row.id)
+        # Quedan filas: pedir otra ejecución en lugar de bloquear el hilo del cron
+        self.env.ref('custom_woocommerce_api.ir_cron_process_woocommerce_order_queue')._trigger()
+
+    @api.model
+    def _process_single(self, row_id):
+        row = self._claim_rows([row_id])
+        if not row:
+            return
+        try:
+            row._process()
+            self.env.cr.commit()
+        except Exception as e:
+            self.env.cr.rollback()
+            row = self._claim_rows([row_id])
+            if not row:
+                return
+            attempts = row.attempts + 1
+            row.write({
+                'state': 'dead' if attempts >= MAX_ATTEMPTS else 'pending',
+                'attempts': attempts,
+                'last_error': f"Error: {str(e)}",
+                'next_attempt_date': fields.Datetime.now() + timedelta(minutes=2 ** (attempts - 1)),
+            })
+            self.env.cr.commit()
+
+    @api.model
+    def _claim_rows(self, ids):
+        self.env.cr.execute("""
+            SELECT id FROM woocommerce_order_queue
+             WHERE id = ANY(%s) AND state = 'pending'
+               FOR UPDATE SKIP LOCKED
+        """, [list(ids)])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    # ---------- ACTIONS ----------
+
+    def action_retry(self):
+        """Send dead-lettered rows back to the queue."""
+        self.filtered(lambda r: r.state == 'dead').write({
+            'state': 'pending', 'attempts': 0, 'next_attempt_date': False,
+        })
+        self.env.ref('custom_woocommerce_api.ir_cron_process_woocommerce_order_queue')._trigger()
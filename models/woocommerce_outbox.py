@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from datetime import timedelta
+import json
+import logging
+import queue
+import requests
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BATCH_SIZE = 200
+MAX_BATCHES_PER_RUN = 10
+REQUEST_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 4
+
+# Parámetros de sistema (Ajustes > Técnico > Parámetros del sistema)
+PARAM_URL = 'custom_woocommerce_api.outbox_url'
+PARAM_TOKEN = 'custom_woocommerce_api.outbox_token'
+PARAM_CONCURRENCY = 'custom_woocommerce_api.outbox_concurrency'
+
+# Sesiones HTTP (keep-alive) del proceso: sobreviven a los hilos de cada lote,
+# así las conexiones se reutilizan de una ejecución del cron a la siguiente
+MAX_IDLE_SESSIONS = 16
+_sessions = queue.LifoQueue(maxsize=MAX_IDLE_SESSIONS)
+
+
+def _acquire_session():
+    try:
+        return _sessions.get_nowait()
+    except queue.Empty:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+def _release_session(session):
+    try:
+        _sessions.put_nowait(session)
+    except queue.Full:
+        session.close()
+
+
+class WooCommerceOutbox(models.Model):
+    _name = 'woocommerce.outbox'
+    _description = 'WooCommerce Outbox Event'
+    _order = 'id desc'
+    _rec_name = 'event_type'
+
+    event_type = fields.Char(string="Event", required=True, readonly=True)
+    res_model = fields.Char(string="Model", readonly=True)
+    res_id = fields.Integer(string="Record ID", readonly=True)
+    woo_order_id = fields.Char(string="WooCommerce Order ID", readonly=True, index=True)
+    destination = fields.Char(string="Destination", required=True, readonly=True)
+    payload = fields.Text(string="Payload", readonly=True)
+    state = fields.Selection(
+        [('pending', 'Pending'), ('done', 'Sent'), ('dead', 'Dead Letter')],
+        string="Status", default='pending', required=True, index=True,
+        help="A dead letter holds back every later event of the same order until it is retried."
+    )
+    attempts = fields.Integer(string="Attempts", default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string="Next Attempt", readonly=True)
+    sent_date = fields.Datetime(string="Sent", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    # ---------- INTAKE (ORM write path: no network here) ----------
+
+    @api.model
+    def _enqueue(self, events):
+        """Stage events in the current transaction.
+
+        `events` is a list of (event_type, record, woo_order_id, data). The
+        rows commit or roll back with the state change that produced them;
+        delivery happens later in the dispatcher cron.
+        """
+        destination = self.env['ir.config_parameter'].sudo().get_param(PARAM_URL)
+        if not events or not destination:
+            return self.browse()
+        now = fields.Datetime.to_string(fields.Datetime.now())
+        return self.sudo().create([{
+            'event_type': event_type,
+            'res_model': record._name,
+            'res_id': record.id,
+            'woo_order_id': woo_order_id,
+            'destination': destination,
+            'payload': json.dumps(dict(data, event=event_type, woo_order_id=woo_order_id, occurred_at=now)),
+        } for event_type, record, woo_order_id, data in events])
+
+    # ---------- DISPATCHER ----------
+
+    @api.model
+    def _claim_batch(self, limit=BATCH_SIZE):
+        """Lock the next due events; events locked by another worker are skipped.
+
+        The events of a WooCommerce order are claimed as a chain: an event
+        is claimable only if every earlier open event of its order is due
+        and claimed in the same batch. An earlier event in backoff, dead, or
+        locked by another worker holds back the rest of the order, so
+        WordPress receives the events of an order in order.
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            WITH ready AS (
+                -- Prefijo de eventos vencidos de cada pedido, hasta el primero que espera o está muerto
+                SELECT id, woo_order_id,
+                       bool_and(state = 'pending' AND (next_attempt_date IS NULL OR next_attempt_date <= %(now)s))
+                           OVER (PARTITION BY woo_order_id, CASE WHEN woo_order_id IS NULL THEN id END
+                                 ORDER BY id) AS ready
+                  FROM woocommerce_outbox
+                 WHERE state IN ('pending', 'dead')
+            ),
+            locked AS (
+                SELECT o.id, o.woo_order_id
+                  FROM woocommerce_outbox o
+                  JOIN ready r ON r.id = o.id AND r.ready
+              ORDER BY o.id
+                 LIMIT %(limit)s
+                   FOR UPDATE OF o SKIP LOCKED
+            )
+            SELECT l.id
+              FROM locked l
+             WHERE l.woo_order_id IS NULL
+                OR NOT EXISTS (SELECT 1 FROM ready r
+                                WHERE r.woo_order_id = l.woo_order_id
+                                  AND r.id < l.id
+                                  AND r.id NOT IN (SELECT id FROM locked))
+          ORDER BY l.id
+        """, {'now': fields.Datetime.now(), 'limit': limit})
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @staticmethod
+    def _send_chain(destination, token, chain):
+        """POST the events of one order in order; stop at the first failure.
+
+        Runs in a worker thread: it only does HTTP and returns
+        [(event id, error or None)] for the events it attempted.
+        """
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        outcome = []
+        session = _acquire_session()
+        try:
+            for event_id, payload in chain:
+                try:
+                    response = session.post(destination, data=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+                    response.raise_for_status()
+                    outcome.append((event_id, None))
+                except requests.RequestException as e:
+                    outcome.append((event_id, str(e)))
+                    break
+        finally:
+            _release_session(session)
+        return outcome
+
+    def _dispatch(self):
+        """Deliver the claimed events, at most `concurrency` requests per destination at a time.
+
+        Events of the same WooCommerce order go through one thread in id
+        order, so WordPress never receives a state older than the last one.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        token = params.get_param(PARAM_TOKEN)
+        concurrency = max(1, int(params.get_param(PARAM_CONCURRENCY, DEFAULT_CONCURRENCY)))
+
+        chains = defaultdict(lambda: defaultdict(list))
+        for event in self.sorted('id'):
+            chains[event.destination][event.woo_order_id or f'event-{event.id}'].append((event.id, event.payload))
+
+        results = {}
+        for destination, by_order in chains.items():
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(by_order))) as pool:
+                futures = [pool.submit(self._send_chain, destination, token, chain)
+                           for chain in by_order.values()]
+                for future in futures:
+                    results.update(future.result())
+
+        now = fields.Datetime.now()
+        sent = self.browse([event_id for event_id, error in results.items() if error is None])
+        sent.write({'state': 'done', 'sent_date': now, 'last_error': False})
+        for event in self - sent:
+            # Los eventos no intentados (tras un fallo del mismo pedido) esperan sin contar intento
+            error = results.get(event.id, "Waiting for a previous event of the same order")
+            attempts = event.attempts + (1 if event.id in results else 0)
+            event.write({
+                'state': 'dead' if attempts >= MAX_ATTEMPTS else 'pending',
+                'attempts': attempts,
+                'last_error': error,
+                # backoff exponencial: 1, 2, 4, 8... minutos
+                'next_attempt_date': now + timedelta(minutes=2 ** max(attempts - 1, 0)),
+            })
+        return sent
+
+    @api.model
+    def _cron_dispatch(self, batch_size=BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN):
+        """Deliver pending events in committed batches."""
+        for _ in range(max_batches):
+            events = self._claim_batch(batch_size)
+            if not events:
+                return
+            events._dispatch()
+            self.env.cr.commit()
+        self.env.ref('custom_woocommerce_api.ir_cron_dispatch_woocommerce_outbox')._trigger()
+
+    # ---------- ACTIONS ----------
+
+    def action_retry(self):
+        """Send dead-lettered events back to the outbox.
+
+        A dead event holds back every later event of its order until it is
+        retried (or sent), since events of an order are delivered in order.
+        """
+        self.filtered(lambda e: e.state == 'dead').write({
+            'state': 'pending', 'attempts': 0, 'next_attempt_date': False,
+        })
+        self.env.ref('custom_woocommerce_api.ir_cron_dispatch_woocommerce_outbox')._trigger()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+from collections import defaultdict
+from ..tools import payload_schema
+from ..tools.payload_schema import PayloadError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class WooCommerceProductImport(models.AbstractModel):
+    _name = 'woocommerce.product.import'
+    _description = 'WooCommerce Product Import'
+
+    @api.model
+    def _prepare_create_vals(self, item):
+        """Same mapping as POST /api/product (`item` already validated by payload_schema)."""
+        sales_price = item.get('sales_price')
+        discount = item.get('discount')
+        return {
+            'default_code': item.get('sku'),
+            'name': item.get('name'),
+            'list_price': float(sales_price) if sales_price else 0.0,
+            'description': item.get('description'),
+            'x_brand_discount': float(discount) if discount else 0.0,
+            'x_product_url': item.get('product_url') or '',
+        }
+
+    @api.model
+    def _prepare_update_vals(self, item):
+        """Same mapping as PUT /api/product: only the fields sent are updated."""
+        update_vals = {}
+        if item.get('name'):
+            update_vals['name'] = item['name']
+        if item.get('sales_price'):
+            update_vals['list_price'] = float(item['sales_price'])
+        if item.get('description'):
+            update_vals['description'] = item['description']
+        if item.get('discount') is not None:
+            update_vals['x_brand_discount'] = float(item['discount'])
+        if item.get('product_url') is not None:
+            update_vals['x_product_url'] = item['product_url']
+        return update_vals
+
+    @api.model
+    def _is_unchanged(self, template, vals):
+        return all((template[field] or False) == (value or False) for field, value in vals.items())
+
+    @api.model
+    def _run_isolated(self, records_vals, operation):
+        """Run `operation` on all items at once, falling back to one savepoint per item.
+
+        `records_vals` is a list of (key, payload). Returns {key: result or exception}.
+        """
+        try:
+            with self.env.cr.savepoint():
+                results = operation([payload for key, payload in records_vals])
+                self.env.flush_all()
+            return dict(zip([key for key, payload in records_vals], results))
+        except Exception as e:
+            if len(records_vals) == 1:
+                _logger.exception("WooCommerce product import failed for %s", records_vals[0][0])
+                return {records_vals[0][0]: e}
+        outcome = {}
+        for key, payload in records_vals:
+            try:
+                with self.env.cr.savepoint():
+                    outcome[key] = operation([payload])[0]
+                    self.env.flush_all()
+            except Exception as e:
+                _logger.exception("WooCommerce product import failed for %s", key)
+                outcome[key] = e
+        return outcome
+
+    @api.model
+    def upsert_products(self, items):
+        """Create or update products by SKU.
+
+        Existing products are fetched with one `default_code IN (...)` query,
+        new ones are created with one multi-record `create` and updates with
+        the same values are grouped into a single `write`. When a SKU appears
+        more than once, its last item is applied and the earlier ones are
+        reported as errors. Returns one result per item plus the
+        created/updated/skipped counters.
+        """
+        results = [None] * len(items)
+        items = list(items)
+        last_index = {}
+        for index, item in enumerate(items):
+            try:
+                items[index] = item = payload_schema.validate_product_update(item)
+            except PayloadError as e:
+                # Sin SKU el elemento se omite; un valor inválido es un error
+                missing_only = all(error['code'] == 'required' for error in e.errors)
+                results[index] = dict(e.to_response(), status="skipped" if missing_only else "error",
+                                      sku=item.get('sku') if isinstance(item, dict) else None)
+                continue
+            last_index[item['sku']] = index
+
+        # SKU repetido en el lote: se aplica la última aparición y las anteriores se rechazan
+        valid, seen = {}, set(last_index)
+        for index, item in enumerate(items):
+            if results[index] is not None:
+                continue
+            sku = item['sku']
+            if index != last_index[sku]:
+                results[index] = {"sku": sku, "status": "error",
+                                  "message": f"Duplicate SKU {sku} in payload: item {last_index[sku]} was applied"}
+                continue
+            valid[index] = sku
+
+        existing = {}
+        if valid:
+            for product in self.env['product.product'].search([('default_code', 'in', list(seen))]):
+                existing.setdefault(product.default_code, product)
+
+        counters = {'created': 0, 'updated': 0}
+        to_create, to_write = [], defaultdict(list)
+        for index, sku in valid.items():
+            item = items[index]
+            try:
+                product = existing.get(sku)
+                if not product:
+                    if not item.get('name'):
+                        results[index] = {"sku": sku, "status": "skipped", "message": "Missing required field: name"}
+                        continue
+                    to_create.append((index, self._prepare_create_vals(item)))
+                    continue
+                vals = self._prepare_update_vals(item)
+                if not vals or self._is_unchanged(product.product_tmpl_id, vals):
+                    results[index] = {"sku": sku, "status": "skipped", "message": "Product is up to date",
+                                      "product_id": product.id}
+                    continue
+                to_write[tuple(sorted(vals.items()))].append(index)
+            except (TypeError, ValueError) as e:
+                results[index] = {"sku": sku, "status": "error", "message": f"Error: {str(e)}"}
+
+        if to_create:
+            created = self._run_isolated(to_create, lambda vals_list: self.env['product.product'].create(vals_list))
+            for index, product in created.items():
+                if isinstance(product, models.BaseModel):
+                    counters['created'] += 1
+                    results[index] = {"sku": valid[index], "status": "success",
+                                      "message": "Product created successfully", "product_id": product.id}
+                else:
+                    results[index] = {"sku": valid[index], "status": "error", "message": f"Error: {str(product)}"}
+
+        for vals_key, indexes in to_write.items():
+            vals = dict(vals_key)
+            # Escribimos en la plantilla: todos los campos pertenecen a product.template
+            templates = [(index, existing[valid[index]].product_tmpl_id) for index in indexes]
+
+            def write(template_list, vals=vals):
+                self.env['product.template'].union(*template_list).write(vals)
+                return [True] * len(template_list)
+
+            written = self._run_isolated(templates, write)
+            for index, outcome in written.items():
+                product = existing[valid[index]]
+                if outcome is True:
+                    counters['updated'] += 1
+                    results[index] = {"sku": valid[index], "status": "success",
+                                      "message": "Product updated successfully", "product_id": product.id}
+                else:
+                    results[index] = {"sku": valid[index], "status": "error", "message": f"Error: {str(outcome)}"}
+
+        counters['skipped'] = sum(1 for result in results if result['status'] == 'skipped')
+        counters['failed'] = sum(1 for result in results if result['status'] == 'error')
+        return results, counters
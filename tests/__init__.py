@@ -0,0 +1,8 @@
+from . import test_quote_engine
+from . import test_display_number
+from . import test_outbox
+from . import test_api_queries
+from . import test_pricing_queries
+from . import test_lead_import
+from . import test_signaled_cache
+from . import test_order_totals
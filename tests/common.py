@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase
+
+
+class QueryCountCase(TransactionCase):
+    """assertQueryCount against the query count of the same path on a smaller input.
+
+    The absolute counts depend on the installed modules, so the budget of a
+    big input is what the small one needed plus a fixed slack: an N+1 on the
+    path fails the test whatever the database.
+    """
+
+    def count_queries(self, func):
+        """Queries run by `func()`, measured like assertQueryCount does."""
+        self.env.invalidate_all()
+        self.env.flush_all()
+        self.env.cr.flush()
+        before = self.cr.sql_log_count
+        result = func()
+        self.env.flush_all()
+        self.env.cr.flush()
+        return self.cr.sql_log_count - before, result
+
+    def assertFlatQueryCount(self, small, large, slack=0):
+        """`large()` may not need more than `slack` queries above `small()`."""
+        budget, _result = self.count_queries(small)
+        self.env.invalidate_all()
+        with self.assertQueryCount(budget + slack):
+            return large()
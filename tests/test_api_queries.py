@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from ..benchmarks.common import make_products
+from ..benchmarks.payloads import order_payload, product_payload
+from .common import QueryCountCase
+
+# Consultas extra toleradas entre el pedido de 1 línea y el de 50
+ORDER_SLACK = 10
+
+
+@tagged('post_install', '-at_install')
+class TestApiQueryCount(QueryCountCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.OrderImport = cls.env['woocommerce.order.import'].sudo()
+        cls.ProductImport = cls.env['woocommerce.product.import'].sudo()
+        cls.skus = make_products(cls.env, 40, prefix='TAPI').mapped('default_code')
+
+    def _import(self, payloads):
+        results = self.OrderImport.import_orders(payloads)
+        self.assertTrue(all(r['status'] == 'success' for r in results), results)
+        return results
+
+    def test_import_order_lines(self):
+        """The queries of an order do not grow with its lines."""
+        self.assertFlatQueryCount(
+            lambda: self._import([order_payload(1, self.skus, 1, prefix='TAPI')]),
+            lambda: self._import([order_payload(2, self.skus, 50, prefix='TAPI')]),
+            slack=ORDER_SLACK,
+        )
+
+    def test_import_order_batch(self):
+        """A batch costs no more per order than the first one, customers included."""
+        self.assertFlatQueryCount(
+            lambda: self._import([order_payload(10 + i, self.skus, 5, prefix='TAPI') for i in range(2)]),
+            lambda: self._import([order_payload(20 + i, self.skus, 5, prefix='TAPI') for i in range(20)]),
+            slack=ORDER_SLACK,
+        )
+
+    def test_replay_order(self):
+        """Replaying an order is answered from its idempotency key, whatever its size."""
+        small = order_payload(30, self.skus, 1, prefix='TAPI')
+        large = order_payload(31, self.skus, 50, prefix='TAPI')
+        self._import([small, large])
+        results = self.assertFlatQueryCount(
+            lambda: self.OrderImport.import_orders([small]),
+            lambda: self.OrderImport.import_orders([large]),
+        )
+        self.assertTrue(results[0].get('replayed'), results)
+
+    def test_product_upsert(self):
+        """The bulk upsert of new and existing products does not query per product."""
+        def upsert(payloads):
+            _results, counters = self.ProductImport.upsert_products(payloads)
+            self.assertEqual(counters['failed'], 0, counters)
+
+        self.assertFlatQueryCount(
+            lambda: upsert([product_payload(i, prefix='TPRD') for i in range(5)]),
+            lambda: upsert([product_payload(i, prefix='TPRD') for i in range(50)]),
+            slack=5,
+        )
+
+    def test_product_lookup_by_sku(self):
+        """A repeated SKU lookup is served from the cache."""
+        Product = self.env['product.product']
+        Product._get_id_by_sku(self.skus[0])
+        # La secuencia de invalidación se lee una vez por transacción
+        with self.assertQueryCount(0):
+            self.assertTrue(Product._get_id_by_sku(self.skus[0]))
+
+    def test_product_export(self):
+        """A page of the export costs the same whatever its size."""
+        Template = self.env['product.template']
+
+        def export(limit):
+            keys = Template._woo_export_keys(None, limit)
+            self.assertEqual(len(keys), limit)
+            return Template._woo_export_rows([key[0] for key in keys])
+
+        self.assertFlatQueryCount(lambda: export(5), lambda: export(40))
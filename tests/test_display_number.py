@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import threading
+
+from odoo import api
+from odoo.service.model import retrying
+from odoo.tests import TransactionCase, tagged
+
+THREADS = 8
+ROUNDS = 10
+MOVE_TYPES = ('out_invoice', 'out_refund')
+
+
+@tagged('post_install', '-at_install')
+class TestDisplayNumberCounter(TransactionCase):
+
+    def test_reserve_is_gapless(self):
+        Counter = self.env['account.move.display.counter']
+        day = date(2099, 6, 1)
+        first = Counter._reserve({(day, 'out_invoice'): 3, (day, 'out_refund'): 1})
+        second = Counter._reserve({(day, 'out_invoice'): 2})
+        self.assertEqual(first, {(day, 'out_invoice'): 3, (day, 'out_refund'): 1})
+        self.assertEqual(second, {(day, 'out_invoice'): 5})
+
+
+@tagged('post_install', '-at_install', '-standard', 'display_number_concurrency')
+class TestDisplayNumberConcurrency(TransactionCase):
+    """Commits on real cursors from several threads; run with --test-tags display_number_concurrency."""
+
+    def test_concurrent_reservations_are_unique_and_gapless(self):
+        """Threads reserve numbers on their own cursors and commit, as concurrent postings do.
+
+        The counters of CHECK_DATE are committed for real and removed at the end.
+        """
+        check_date = date(2099, 12, 31)
+        registry, uid, dbname = self.registry, self.env.uid, self.env.cr.dbname
+
+        def cleanup():
+            with registry.cursor() as cr:
+                cr.execute("DELETE FROM account_move_display_counter WHERE date = %s", [check_date])
+        # Restos de una ejecución interrumpida
+        cleanup()
+        self.addCleanup(cleanup)
+
+        def reserve(thread_index):
+            threading.current_thread().dbname = dbname
+            taken = []
+            for round_index in range(ROUNDS):
+                counts = {(check_date, move_type): 1 + (thread_index + round_index) % 3 for move_type in MOVE_TYPES}
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, {})
+                    # Los fallos de serialización se reintentan en una transacción nueva
+                    last_numbers = retrying(lambda: env['account.move.display.counter']._reserve(counts), env)
+                for key, last in last_numbers.items():
+                    taken += [(key[1], number) for number in range(last - counts[key] + 1, last + 1)]
+            return taken
+
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            taken = [number for numbers in pool.map(reserve, range(THREADS)) for number in numbers]
+
+        self.assertEqual(len(taken), len(set(taken)), "duplicated numbers")
+        for move_type in MOVE_TYPES:
+            numbers = sorted(n for t, n in taken if t == move_type)
+            self.assertEqual(numbers, list(range(1, len(numbers) + 1)), f"gap in {move_type} numbers")
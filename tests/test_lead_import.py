@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from .common import QueryCountCase
+
+# Un lead de cada dos trae cliente y genera presupuesto
+PARTNER_RATIO = 2
+# Consultas extra toleradas entre el lote pequeño y el grande
+LEAD_SLACK = 20
+
+
+class LeadImportCase(QueryCountCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partners = cls.env['res.partner'].create([{'name': f'Lead Test Customer {i}'} for i in range(100)])
+
+    def _import_leads(self, count, prefix):
+        """Create `count` leads the way the CSV import does: one `create` call for the batch."""
+        leads = self.env['crm.lead'].create([{
+            'name': f'{prefix} Lead {i}',
+            'type': 'opportunity',
+            'partner_id': self.partners[i % len(self.partners)].id if i % PARTNER_RATIO == 0 else False,
+        } for i in range(count)])
+        linked = leads.filtered('sale_order_id')
+        self.assertEqual(linked, leads.filtered('partner_id'), "leads without their quotation")
+        for lead in linked:
+            self.assertEqual(lead.sale_order_id.opportunity_id, lead, "quotation linked to another lead")
+        return leads
+
+
+@tagged('post_install', '-at_install')
+class TestLeadImport(LeadImportCase):
+
+    def test_import_leads(self):
+        """The quotations of a lead import are created together: no query per lead."""
+        self.assertFlatQueryCount(
+            lambda: self._import_leads(10, 'Small'),
+            lambda: self._import_leads(1000, 'Large'),
+            slack=LEAD_SLACK,
+        )
+
+    def test_create_agencies(self):
+        """Agencies get their partner from one create, and their invoices resolve it in one read."""
+        def create_agencies(count, prefix):
+            agencies = self.env['financing.agency'].create([{
+                'name': f'{prefix} Agency {i}',
+                'email': f'{prefix.lower()}-agency{i}@example.com',
+                'address': 'Test street',
+                'phone': '0000',
+            } for i in range(count)])
+            self.assertTrue(all(agencies.mapped('partner_id')), "agency without partner")
+            return agencies
+
+        agencies = self.assertFlatQueryCount(
+            lambda: create_agencies(2, 'Small'),
+            lambda: create_agencies(50, 'Large'),
+        )
+
+        def create_moves(count):
+            moves = self.env['account.move'].create([{
+                'move_type': 'out_invoice',
+                'financing_agency_id': agencies[i % len(agencies)].id,
+                'invoice_date': '2099-01-15',
+            } for i in range(count)])
+            for move in moves:
+                self.assertEqual(move.partner_id, move.financing_agency_id.partner_id)
+
+        self.assertFlatQueryCount(lambda: create_moves(5), lambda: create_moves(200), slack=5)
+
+
+@tagged('post_install', '-at_install', '-standard', 'lead_import_10k')
+class TestLeadImportCampaign(LeadImportCase):
+    """A 10k-lead campaign import; run with --test-tags lead_import_10k."""
+
+    def test_import_campaign(self):
+        self.assertFlatQueryCount(
+            lambda: self._import_leads(100, 'Small'),
+            lambda: self._import_leads(10000, 'Campaign'),
+            slack=LEAD_SLACK,
+        )
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from ..benchmarks.common import make_order, make_products
+from ..models.sale_order_lines import ORDER_TOTALS_BATCH_THRESHOLD
+
+TOTAL_FIELDS = [
+    'amount_untaxed', 'amount_tax', 'amount_total', 'amount_vat_20', 'amount_total_incl_vat_20',
+    'amount_total_sans_tva', 'list_price_total', 'margin_amount', 'margin_percent',
+]
+
+
+@tagged('post_install', '-at_install')
+class TestOrderTotals(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partner = cls.env['res.partner'].create({'name': 'Totals Test Customer'})
+        products = make_products(cls.env, 40, prefix='TTOT')
+        tax = cls.env['account.tax'].create({'name': 'Totals Test 20%', 'amount': 20.0, 'type_tax_use': 'sale'})
+        cls.orders = cls.env['sale.order'].concat(*[
+            make_order(cls.env, partner, products, 1 + i % 12, taxes=tax if i % 2 else None,
+                       installments=('24', '36', '48', '60')[i % 4])
+            for i in range(ORDER_TOTALS_BATCH_THRESHOLD + 10)
+        ])
+
+    def _recompute(self, orders):
+        self.env.invalidate_all()
+        for fname in TOTAL_FIELDS:
+            self.env.add_to_compute(orders._fields[fname], orders)
+        orders.flush_recordset(TOTAL_FIELDS)
+        self.env.invalidate_all()
+        return {order.id: [order[fname] for fname in TOTAL_FIELDS] for order in orders}
+
+    def test_batch_and_per_order_paths_store_the_same_totals(self):
+        batch = self._recompute(self.orders)
+        per_order = {}
+        for start in range(0, len(self.orders), 5):
+            per_order.update(self._recompute(self.orders[start:start + 5]))
+        for order in self.orders:
+            # Igualdad exacta: el total guardado no puede depender del tamaño del lote
+            self.assertEqual(batch[order.id], per_order[order.id], order.name)
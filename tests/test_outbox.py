@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models import woocommerce_outbox
+
+ORDERS = 20
+EVENTS_PER_ORDER = 3
+CONCURRENCY = 4
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """WordPress stub: fails the first request of every order and records the others."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        state = self.server.state
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with state['lock']:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            fail = body['woo_order_id'] not in state['failed_once']
+            state['failed_once'].add(body['woo_order_id'])
+        time.sleep(0.01)
+        with state['lock']:
+            state['in_flight'] -= 1
+            if not fail:
+                state['received'].append(body)
+        self.send_response(503 if fail else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@tagged('post_install', '-at_install')
+class TestWooCommerceOutbox(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.state = {'lock': threading.Lock(), 'in_flight': 0, 'max_in_flight': 0,
+                            'failed_once': set(), 'received': []}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        params = cls.env['ir.config_parameter'].sudo()
+        params.set_param(woocommerce_outbox.PARAM_URL, f'http://127.0.0.1:{cls.server.server_port}/order-status')
+        params.set_param(woocommerce_outbox.PARAM_CONCURRENCY, CONCURRENCY)
+        cls.Outbox = cls.env['woocommerce.outbox']
+        cls.partner = cls.env['res.partner'].create({'name': 'Outbox Test'})
+
+    def _stage(self, prefix, orders, events_per_order):
+        return self.Outbox._enqueue([
+            (f'order.step{step}', self.partner, f'{prefix}-{i}', {'step': step})
+            for i in range(orders) for step in range(events_per_order)
+        ])
+
+    def test_retries_keep_order_and_concurrency(self):
+        staged = self._stage('OUTBOX', ORDERS, EVENTS_PER_ORDER)
+        for _ in range(4 * EVENTS_PER_ORDER):
+            pending = staged.filtered(lambda e: e.state == 'pending')
+            if not pending:
+                break
+            # Sin esperar el backoff: se comprueban el orden y los reintentos
+            pending.write({'next_attempt_date': False})
+            self.Outbox._claim_batch(len(staged))._dispatch()
+
+        state = self.server.state
+        steps = {}
+        for body in state['received']:
+            steps.setdefault(body['woo_order_id'], []).append(body['step'])
+        self.assertEqual(len(steps), ORDERS, "missing orders")
+        for woo_order_id, order_steps in steps.items():
+            self.assertEqual(order_steps, list(range(EVENTS_PER_ORDER)), f"{woo_order_id}: events out of order")
+        self.assertLessEqual(state['max_in_flight'], CONCURRENCY, "concurrency limit exceeded")
+        self.assertFalse(staged.filtered(lambda e: e.state != 'done'))
+
+    def test_claim_waits_for_earlier_events_of_the_order(self):
+        first, second, third = self._stage('BLOCKED', 1, 3)
+        other = self._stage('FREE', 1, 1)
+
+        first.write({'state': 'pending', 'next_attempt_date': '2099-01-01 00:00:00'})
+        claimed = self.Outbox._claim_batch()
+        self.assertIn(other, claimed)
+        self.assertFalse(claimed & (first | second | third), "later events claimed while the first one backs off")
+
+        first.write({'state': 'dead'})
+        self.assertFalse(self.Outbox._claim_batch() & (second | third), "later events claimed after a dead letter")
+
+        first.write({'state': 'done'})
+        claimed = self.Outbox._claim_batch()
+        self.assertEqual(claimed & (second | third), second | third, "the rest of the chain is claimed together")
+
+    def test_claim_takes_whole_chains(self):
+        """All the due events of an order are claimed in one batch, in order."""
+        events = self._stage('CHAIN', 2, EVENTS_PER_ORDER)
+        claimed = self.Outbox._claim_batch()
+        self.assertEqual(claimed & events, events)
+        self.assertEqual((claimed & events).ids, sorted(events.ids))
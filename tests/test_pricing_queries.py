@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from ..benchmarks.common import make_order, make_products
+from .common import QueryCountCase
+
+LINE_AMOUNT_FIELDS = ['effective_price_quote', 'price_subtotal', 'price_tax', 'price_total']
+ORDER_TOTAL_FIELDS = ['amount_untaxed', 'amount_tax', 'amount_total', 'margin_amount']
+
+
+@tagged('post_install', '-at_install')
+class TestPricingQueryCount(QueryCountCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Pricing Test Customer'})
+        cls.products = make_products(cls.env, 40, prefix='TPRC')
+        cls.orders = cls.env['sale.order'].concat(*[
+            make_order(cls.env, cls.partner, cls.products, 1 + i % 12) for i in range(60)
+        ])
+
+    def _recompute(self, records, fnames):
+        for fname in fnames:
+            self.env.add_to_compute(records._fields[fname], records)
+        records.flush_recordset(fnames)
+
+    def test_recompute_price_quote(self):
+        lines = self.orders.order_line
+        self.assertFlatQueryCount(
+            lambda: self._recompute(lines[:5], ['price_quote', 'display_price_quote']),
+            lambda: self._recompute(lines, ['price_quote', 'display_price_quote']),
+        )
+
+    def test_recompute_line_amounts(self):
+        lines = self.orders.order_line
+        self.assertFlatQueryCount(
+            lambda: self._recompute(lines[:5], LINE_AMOUNT_FIELDS),
+            lambda: self._recompute(lines, LINE_AMOUNT_FIELDS),
+        )
+
+    def test_recompute_order_totals(self):
+        self.assertFlatQueryCount(
+            lambda: self._recompute(self.orders[:3], ORDER_TOTAL_FIELDS),
+            lambda: self._recompute(self.orders, ORDER_TOTAL_FIELDS),
+            slack=5,
+        )
+
+    def test_action_post_numbering(self):
+        """action_post numbers every invoice; numbering a batch costs the same as a small one.
+
+        The posting of account itself numbers moves one by one, so only the
+        custom numbering is measured.
+        """
+        def make_moves(count):
+            return self.env['account.move'].create([{
+                'move_type': 'out_invoice',
+                'partner_id': self.partner.id,
+                'invoice_date': '2099-01-15',
+                'invoice_line_ids': [(0, 0, {'product_id': self.products[i % len(self.products)].id, 'quantity': 1,
+                                             'price_unit': 100.0, 'tax_ids': [(6, 0, [])]})],
+            } for i in range(count)])
+
+        small, large = make_moves(3), make_moves(30)
+        (small | large).action_post()
+        numbers = (small | large).mapped('custom_display_number')
+        self.assertTrue(all(numbers))
+        self.assertEqual(len(set(numbers)), len(numbers), "duplicated custom invoice numbers")
+
+        (small | large).custom_display_number = False
+        self.assertFlatQueryCount(small._compute_custom_display_number, large._compute_custom_display_number)
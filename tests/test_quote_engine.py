@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import itertools
+import random
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools.float_utils import float_round
+
+from ..tools import quote_engine
+
+
+# ---------- FÓRMULAS ANTERIORES (models/order.py antes del motor) ----------
+
+def legacy_price_quote(price_unit, installments, include_warranty, warranty_percentage):
+    total = (price_unit or 0.0) * 2.2
+    months = int(installments or 24)
+    rate = 0.05 / 12.0
+    base_quote = (total + (total * rate * months)) / months
+    if include_warranty and warranty_percentage:
+        base_quote += base_quote * (warranty_percentage / 100.0)
+    return float_round(base_quote, precision_digits=2)
+
+
+def legacy_effective_quote(manual_quote, auto_quote, include_warranty, warranty_percentage):
+    base = manual_quote or auto_quote or 0.0
+    if include_warranty and warranty_percentage:
+        base += base * (warranty_percentage / 100.0)
+    return float_round(base, precision_digits=2)
+
+
+def legacy_reduced_price(effective, price_unit, discount):
+    if effective and effective > 0.0:
+        unit_price_to_use = effective
+    else:
+        unit_price_to_use = price_unit
+    discount_factor = 1.0 - ((discount or 0.0) / 100.0)
+    return (unit_price_to_use or 0.0) * discount_factor
+
+
+def legacy_subtotal(effective, price_unit, discount, quantity, rounding):
+    subtotal = legacy_reduced_price(effective, price_unit, discount) * (quantity or 0.0)
+    return float_round(subtotal, precision_rounding=rounding)
+
+
+PRICES = [0.0, False, 0.01, 1.0, 9.99, 99.995, 123.455, 499.0, 1234.5678, 2727.27, 99999.99]
+INSTALLMENTS = [False, '12', '24', '36', '48', '60', 24, 36]
+WARRANTIES = [(False, 0.0), (True, 0.0), (False, 10.0), (True, 10.0), (True, 12.5), (True, 33.333)]
+DISCOUNTS = [False, 0.0, 5.0, 12.5, 33.333, 100.0]
+QUANTITIES = [0.0, 1.0, 3.0, 0.5, 7.0]
+ROUNDINGS = [0.01, 0.05, 1.0]
+
+
+@tagged('post_install', '-at_install')
+class TestQuoteEngine(TransactionCase):
+    """tools/quote_engine.py must give the same floats, bit for bit, as the former per-line code."""
+
+    def assertSameFloat(self, value, expected, inputs):
+        self.assertEqual(float(value).hex(), float(expected).hex(), f"{inputs}: {value!r} != {expected!r}")
+
+    def test_tiers_cover_the_selection(self):
+        for months in (24, 36, 48, 60):
+            self.assertIn(months, quote_engine.TIERS)
+        self.assertEqual(quote_engine.get_tier(False).months, quote_engine.DEFAULT_INSTALLMENTS)
+
+    def test_monthly_quote(self):
+        for price, installments, (warranty, percentage) in itertools.product(PRICES, INSTALLMENTS, WARRANTIES):
+            inputs = (price, installments, warranty, percentage)
+            self.assertSameFloat(quote_engine.monthly_quote(*inputs), legacy_price_quote(*inputs), inputs)
+
+    def test_effective_quote(self):
+        quotes = [0.0, False, 0.01, 45.675, 99.995, 1234.565]
+        for manual, auto, (warranty, percentage) in itertools.product(quotes, quotes, WARRANTIES):
+            inputs = (manual, auto, warranty, percentage)
+            self.assertSameFloat(quote_engine.effective_quote(*inputs), legacy_effective_quote(*inputs), inputs)
+
+    def test_reduced_price_and_subtotal(self):
+        effectives = [0.0, False, -1.0, 0.01, 45.675, 1234.565]
+        for effective, price, discount in itertools.product(effectives, PRICES, DISCOUNTS):
+            inputs = (effective, price, discount)
+            self.assertSameFloat(quote_engine.reduced_price(*inputs), legacy_reduced_price(*inputs), inputs)
+            for quantity, rounding in itertools.product(QUANTITIES, ROUNDINGS):
+                full = inputs + (quantity, rounding)
+                self.assertSameFloat(quote_engine.subtotal(*full), legacy_subtotal(*full), full)
+
+    def test_random_inputs(self):
+        rng = random.Random(20240601)
+        for _ in range(20000):
+            price = round(rng.uniform(0, 20000), rng.choice([0, 2, 3, 4]))
+            installments = rng.choice(INSTALLMENTS)
+            warranty, percentage = rng.choice(WARRANTIES)
+            inputs = (price, installments, warranty, percentage)
+            auto = quote_engine.monthly_quote(*inputs)
+            self.assertSameFloat(auto, legacy_price_quote(*inputs), inputs)
+            manual = rng.choice([0.0, round(rng.uniform(0, 2000), 2)])
+            effective = quote_engine.effective_quote(manual, auto, warranty, percentage)
+            self.assertSameFloat(effective, legacy_effective_quote(manual, auto, warranty, percentage), inputs)
+            discount, quantity = rng.choice(DISCOUNTS), rng.choice(QUANTITIES)
+            self.assertSameFloat(quote_engine.subtotal(effective, price, discount, quantity, 0.01),
+                                 legacy_subtotal(effective, price, discount, quantity, 0.01), inputs)
+
+    def test_batches_match_single_calls(self):
+        rows = [(price, installments, warranty, percentage)
+                for price, installments, (warranty, percentage) in itertools.product(PRICES, INSTALLMENTS, WARRANTIES)]
+        rows += rows[:10]  # filas repetidas: una sola evaluación, mismo resultado
+        self.assertEqual(quote_engine.monthly_quotes(rows), [quote_engine.monthly_quote(*row) for row in rows])
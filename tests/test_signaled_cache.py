@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from ..models.product import SKU_CACHE
+from ..models.res_country import COUNTRY_MAP_CACHE
+
+
+@tagged('post_install', '-at_install')
+class TestSkuCache(TransactionCase):
+
+    def test_uncommitted_changes_are_not_cached(self):
+        """Values computed by a transaction with its own pending invalidation stay out of the cache."""
+        Product = self.env['product.product']
+        self.assertFalse(Product._get_id_by_sku('SCACHE-00001'))
+        product = Product.create({'name': 'Signaled Cache Product', 'default_code': 'SCACHE-00001'})
+        self.assertEqual(Product._get_id_by_sku('SCACHE-00001'), product.id)
+        entries, storable = SKU_CACHE._entries_for(self.env.cr)
+        self.assertFalse(storable)
+        self.assertNotIn('SCACHE-00001', entries)
+
+    def test_signal_is_visible_to_later_snapshots(self):
+        """A signal committed before a transaction starts lets that transaction fill the cache."""
+        SKU_CACHE._signal(self.registry, {SKU_CACHE})
+        with self.registry.cursor() as cr:
+            _entries, storable = SKU_CACHE._entries_for(cr)
+            self.assertTrue(storable)
+
+
+@tagged('post_install', '-at_install')
+class TestCountryMapCache(TransactionCase):
+
+    def test_new_country_is_resolved_and_not_cached(self):
+        """A country created by the transaction resolves at once, without caching the uncommitted map."""
+        Country = self.env['res.country']
+        self.assertFalse(Country._woo_resolve_country('Signaledland'))
+        country = Country.create({'name': 'Signaledland', 'code': 'ZZ'})
+        self.assertEqual(Country._woo_resolve_country('Signaledland'), country.id)
+        self.assertEqual(Country._woo_resolve_country('zz'), country.id)
+        entries, storable = COUNTRY_MAP_CACHE._entries_for(self.env.cr)
+        self.assertFalse(storable)
+        self.assertNotIn(self.env.lang, entries)
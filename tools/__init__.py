@@ -0,0 +1,4 @@
+from . import quote_engine
+from . import payload_schema
+from . import metrics
+from . import signaled_cache
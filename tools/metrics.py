@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""Process metrics in the Prometheus text exposition format.
+
+Recording only touches a buffer of the current thread, without lock or
+I/O, so it can sit on hot compute methods. A thread adds its buffer to the
+totals of its process when a tracked request ends, and while recording at
+most every FLUSH_INTERVAL seconds. Each Odoo process (prefork worker, cron
+worker or threaded server) has a writer thread that writes those totals,
+when they changed, to `<pid>-<start>.json` in a shared directory every
+FLUSH_INTERVAL seconds, `<start>` being the start time of the process. The /metrics endpoint adds up the files of
+every process, so any worker can answer a scrape with totals for the whole
+server. The files of stopped workers (pid gone, or reused by a process
+started at another time) are folded into DEAD_FILENAME when a process
+starts writing and on every scrape, so the counters never go backwards and
+the directory does not grow with every worker recycled.
+
+The directory is the `metrics_dir` option of the Odoo configuration file,
+or `<data_dir>/metrics` by default.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import fcntl
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import psutil
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Totales de los procesos terminados
+DEAD_FILENAME = '_dead.json'
+LOCK_FILENAME = '_dead.lock'
+
+METRICS = {
+    'woo_api_request_duration_seconds': ('histogram', "API request latency.", LATENCY_BUCKETS),
+    'woo_api_request_queries': ('histogram', "SQL queries per API request.", QUERY_BUCKETS),
+    'woo_api_errors_total': ('counter', "API requests answered with an error.", None),
+    'odoo_compute_seconds_total': ('counter', "Time spent in the compute method.", None),
+    'odoo_compute_calls_total': ('counter', "Calls of the compute method.", None),
+    'odoo_compute_records_total': ('counter', "Records computed by the compute method.", None),
+}
+
+_lock = threading.Lock()
+_state = {}
+# Métricas de cada hilo aún no sumadas al proceso: registrar no toma ningún lock
+_local = threading.local()
+
+
+def _directory():
+    path = config.get('metrics_dir') or os.path.join(config.get('data_dir') or tempfile.gettempdir(), 'metrics')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _key(name, labels):
+    return name + '|' + ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+
+
+def _process_filename(pid):
+    """`<pid>-<start>.json` of the running process `pid`, None if there is none."""
+    try:
+        return f'{pid}-{int(psutil.Process(pid).create_time())}.json'
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        return None
+
+
+def _is_stale(filename):
+    """Whether `filename` belongs to a process that is no longer running."""
+    pid = filename[:-len('.json')].split('-', 1)[0]
+    if not pid.isdigit():
+        return False
+    try:
+        return _process_filename(int(pid)) != filename
+    except psutil.Error:
+        return False  # proceso de otro usuario: vivo
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(counters, histograms, data):
+    for key, value in data.get('counters', {}).items():
+        counters[key] += value
+    for key, value in data.get('histograms', {}).items():
+        total = histograms.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+        total['sum'] += value['sum']
+        total['count'] += value['count']
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Exclusive lock on the metrics directory, across processes.
+
+    Two processes folding the same file would count it twice, and a scrape
+    reading between the write of DEAD_FILENAME and the removal of the
+    folded files too.
+    """
+    with open(os.path.join(directory, LOCK_FILENAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _fold_stale(directory):
+    """Add the files of stopped processes to DEAD_FILENAME and remove them (caller holds the directory lock)."""
+    stale = [name for name in os.listdir(directory)
+             if name.endswith('.json') and name != DEAD_FILENAME and _is_stale(name)]
+    if not stale:
+        return
+    dead_path = os.path.join(directory, DEAD_FILENAME)
+    counters, histograms = defaultdict(float), {}
+    _merge(counters, histograms, _read(dead_path) or {})
+    for name in stale:
+        _merge(counters, histograms, _read(os.path.join(directory, name)) or {})
+    _write(dead_path, {'counters': counters, 'histograms': histograms})
+    for name in stale:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    _logger.debug("Folded the metrics files of %s stopped processes", len(stale))
+
+
+def _reset():
+    """Start with empty metrics: at import, and in every forked process.
+
+    The metrics inherited from the parent are already in the file of the
+    parent; the first flush of the new process writes its own file. The
+    lock may have been held by another thread of the parent at fork time.
+    """
+    global _lock, _local
+    _lock = threading.Lock()
+    _local = threading.local()
+    _state.update(counters=defaultdict(float), histograms={}, dirty=False, pid=os.getpid(), filename=None,
+                  writer=False)
+
+
+def _writer():
+    """Write the file of the process every FLUSH_INTERVAL (threads do not survive a fork)."""
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        _flush()
+
+
+def _flush(force=False):
+    """Write this process' metrics to its file if they changed (writer thread and scrapes only)."""
+    with _lock:
+        if not (_state['dirty'] or force):
+            return
+        _state['dirty'] = False
+        data = {'counters': dict(_state['counters']),
+                'histograms': {key: dict(value, buckets=list(value['buckets']))
+                               for key, value in _state['histograms'].items()}}
+        first = not _state['filename']
+        if first:
+            _state['filename'] = _process_filename(_state['pid'])
+        filename = _state['filename']
+    try:
+        directory = _directory()
+        if first:
+            with _directory_lock(directory):
+                _fold_stale(directory)
+        _write(os.path.join(directory, filename), data)
+    except OSError:
+        _logger.warning("Could not write metrics file", exc_info=True)
+
+
+def _buffer():
+    """Metrics recorded by the current thread since its last merge."""
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = {'counters': defaultdict(float), 'histograms': {}, 'merged': time.monotonic()}
+    return buffer
+
+
+def merge_thread_metrics(force=True):
+    """Add the metrics recorded by the current thread to the totals of the process.
+
+    Called when a request ends; recording merges on its own at most every
+    FLUSH_INTERVAL. Only memory is touched: the writer thread writes the file.
+    """
+    buffer = _buffer()
+    if not force and time.monotonic() - buffer['merged'] < FLUSH_INTERVAL:
+        return
+    _local.buffer = None
+    with _lock:
+        if buffer['counters'] or buffer['histograms']:
+            _merge(_state['counters'], _state['histograms'], buffer)
+            _state['dirty'] = True
+        if not _state['writer']:
+            _state['writer'] = True
+            threading.Thread(target=_writer, name='metrics-writer', daemon=True).start()
+
+
+_reset()
+os.register_at_fork(after_in_child=_reset)
+
+
+def inc(name, labels, value=1.0):
+    inc_many([(name, labels, value)])
+
+
+def inc_many(increments):
+    """Apply several (name, labels, value) increments to the thread's buffer (no lock, no I/O)."""
+    counters = _buffer()['counters']
+    for name, labels, value in increments:
+        counters[_key(name, labels)] += value
+    merge_thread_metrics(force=False)
+
+
+def observe(name, labels, value):
+    buckets = METRICS[name][2]
+    histogram = _buffer()['histograms'].setdefault(
+        _key(name, labels), {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            histogram['buckets'][index] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+    merge_thread_metrics(force=False)
+
+
+def collect():
+    """Sum of the metrics files of every process."""
+    merge_thread_metrics()
+    _flush(force=True)
+    counters, histograms = defaultdict(float), {}
+    directory = _directory()
+    with _directory_lock(directory):
+        try:
+            _fold_stale(directory)
+        except OSError:
+            _logger.warning("Could not fold stale metrics files", exc_info=True)
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            data = _read(os.path.join(directory, filename))
+            if data is not None:
+                _merge(counters, histograms, data)
+    return counters, histograms
+
+
+def render():
+    """Aggregated metrics in the text exposition format."""
+    counters, histograms = collect()
+    series = defaultdict(list)
+    for key in list(counters) + list(histograms):
+        series[key.split('|', 1)[0]].append(key)
+
+    lines = []
+    for name in sorted(series):
+        kind, help_text, buckets = METRICS.get(name, ('untyped', '', None))
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for key in sorted(series[name]):
+            labels = key.split('|', 1)[1]
+            pairs = [pair.split('=', 1) for pair in labels.split(',') if pair]
+            label_text = ','.join(f'{k}="{v}"' for k, v in pairs)
+            if key in counters:
+                lines.append(f'{name}{{{label_text}}} {counters[key]:g}')
+                continue
+            histogram = histograms[key]
+            prefix = label_text + ',' if label_text else ''
+            for bound, count in zip(buckets, histogram['buckets']):
+                lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{{label_text}}} {histogram["sum"]:g}')
+            lines.append(f'{name}_count{{{label_text}}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# ---------- DECORATORS ----------
+
+def _is_error(result):
+    if isinstance(result, dict):
+        return result.get('status') == 'error'
+    return getattr(result, 'status_code', 200) >= 400
+
+
+def track_endpoint(endpoint):
+    """Latency, SQL queries and errors of a controller method, labelled by `endpoint`.
+
+    Goes under @http.route so the route registers the measured function.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            from odoo.http import request
+            cr = request.env.cr if request and request.db else None
+            queries = cr.sql_log_count if cr else 0
+            started = time.perf_counter()
+            labels = {'endpoint': endpoint}
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = _is_error(result)
+                return result
+            finally:
+                observe('woo_api_request_duration_seconds', labels, time.perf_counter() - started)
+                if cr:
+                    observe('woo_api_request_queries', labels, cr.sql_log_count - queries)
+                if failed:
+                    inc('woo_api_errors_total', labels)
+                # Fin de la petición: lo registrado por el hilo (computes incluidos) pasa al proceso
+                merge_thread_metrics()
+        return wrapper
+    return decorator
+
+
+def track_compute(method):
+    """Time, calls and record count of a compute method (put @api.depends above it)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            labels = {'model': self._name, 'compute': method.__name__}
+            inc_many([
+                ('odoo_compute_seconds_total', labels, time.perf_counter() - started),
+                ('odoo_compute_calls_total', labels, 1),
+                ('odoo_compute_records_total', labels, len(self)),
+            ])
+    return wrapper
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Validation of the WooCommerce payloads (orders and products).
+
+Schemas are declared once with `Object`, `List` and `Value` and compiled at
+import time into nested closures: validating a payload is a walk over those
+closures, with no per-request interpretation of the declaration. The
+validator returns a normalized copy of the payload or raises PayloadError
+with one entry per invalid field, e.g.
+
+    {"field": "products[4].sku", "code": "required", "message": "One of the products is missing SKU"}
+
+The first error's message is the `message` returned to WordPress, so the
+plugin keeps receiving the texts it already knows. Nothing here touches
+the database.
+"""
+
+
+class PayloadError(ValueError):
+    """Invalid payload; `errors` lists every invalid field."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(errors[0]['message'])
+
+    @property
+    def message(self):
+        return self.args[0]
+
+    def to_response(self):
+        return {"status": "error", "message": self.message, "errors": self.errors}
+
+
+# ---------- DECLARATION ----------
+
+class Value:
+    """A scalar. `kind` is 'str', 'number', 'int' or 'any'.
+
+    `lenient=True` replaces an invalid value with the default instead of
+    failing (used where the historical code silently fell back).
+    """
+
+    def __init__(self, kind='any', required=False, default=None, message=None, lenient=False, empty_is_none=True):
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.message = message
+        self.lenient = lenient
+        self.empty_is_none = empty_is_none
+
+
+class Object:
+    def __init__(self, fields, required=False, message=None, default=None):
+        self.fields = fields
+        self.required = required
+        self.message = message
+        self.default = default if default is not None else {}
+
+
+class List:
+    def __init__(self, item, required=False, message=None):
+        self.item = item
+        self.required = required
+        self.message = message
+
+
+# ---------- COMPILATION ----------
+
+def _join(path, name):
+    return f"{path}.{name}" if path else name
+
+
+def _error(errors, path, code, message):
+    errors.append({"field": path, "code": code, "message": message})
+
+
+def _compile_value(spec):
+    kind, default, lenient = spec.kind, spec.default, spec.lenient
+    required, required_message = spec.required, spec.message
+    empty_is_none = spec.empty_is_none
+
+    if kind == 'str':
+        def convert(value):
+            if isinstance(value, (dict, list)):
+                raise ValueError
+            return str(value).strip() if not isinstance(value, str) else value
+    elif kind == 'number':
+        def convert(value):
+            if isinstance(value, bool):
+                raise ValueError
+            return float(value)
+    elif kind == 'int':
+        def convert(value):
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value)
+            if number != int(number):
+                raise ValueError
+            return int(number)
+    else:
+        def convert(value):
+            return value
+
+    def validate(value, path, errors):
+        if value is None or (empty_is_none and value == ''):
+            if required:
+                _error(errors, path, 'required', required_message or f"Missing required field: {path}")
+            return default
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            if lenient:
+                return default
+            _error(errors, path, 'invalid', f"Invalid value for {path}: expected {kind}")
+            return default
+    return validate
+
+
+def _compile_object(spec):
+    fields = [(name, compile_schema(field_spec)) for name, field_spec in spec.fields.items()]
+    required, message, default = spec.required, spec.message, spec.default
+
+    def validate(value, path, errors):
+        if value is None or value == {} or value == '':
+            if required:
+                _error(errors, path or 'body', 'required', message or f"Missing required field: {path}")
+                return None
+            value = default
+        if not isinstance(value, dict):
+            _error(errors, path or 'body', 'invalid', f"Invalid value for {path or 'body'}: expected object")
+            return None
+        clean = dict(value)  # se conservan las claves no declaradas
+        for name, validate_field in fields:
+            clean[name] = validate_field(value.get(name), _join(path, name), errors)
+        return clean
+    return validate
+
+
+def _compile_list(spec):
+    validate_item = compile_schema(spec.item)
+    required, message = spec.required, spec.message
+
+    def validate(value, path, errors):
+        if not value:
+            if required:
+                _error(errors, path, 'required', message or f"Missing required field: {path}")
+                return None
+            return []
+        if not isinstance(value, list):
+            _error(errors, path, 'invalid', f"Invalid value for {path}: expected list")
+            return None
+        return [validate_item(item, f"{path}[{index}]", errors) for index, item in enumerate(value)]
+    return validate
+
+
+def compile_schema(spec):
+    """Compile a declaration into a `validate(value, path, errors)` closure."""
+    if isinstance(spec, Object):
+        return _compile_object(spec)
+    if isinstance(spec, List):
+        return _compile_list(spec)
+    return _compile_value(spec)
+
+
+def validator(spec):
+    """Compile `spec` into `validate(payload) -> normalized payload` raising PayloadError."""
+    validate_root = compile_schema(spec)
+
+    def validate(payload):
+        errors = []
+        clean = validate_root(payload, '', errors)
+        if errors:
+            raise PayloadError(errors)
+        return clean
+    return validate
+
+
+# ---------- SCHEMAS ----------
+
+MISSING_ORDER_FIELDS = "Missing required fields: customer or products"
+
+ADDRESS = Object({
+    'address': Object({
+        'street': Value('str'),
+        'city': Value('str'),
+        'zip_code': Value('str'),
+        'country': Value('str'),
+    }),
+})
+
+# Contenido de `order` en /api/woocommerce/order (y de cada elemento del lote)
+validate_order = validator(Object({
+    'id': Value('str'),
+    'order_id': Value('str'),
+    'customer': Object({
+        'name': Value('str'),
+        'email': Value('str', default=''),
+        'siren': Value('str'),
+    }, required=True, message=MISSING_ORDER_FIELDS),
+    'products': List(Object({
+        'sku': Value('str', required=True, message="One of the products is missing SKU"),
+        'quantity': Value('number', default=1),
+        'price_discount': Value('number', default=0.0),
+        # Cuota manual: un valor no numérico se ignora, como antes
+        'price_quote': Value('number', default=0.0, lenient=True),
+    }, required=True, message="One of the products is missing SKU"), required=True, message=MISSING_ORDER_FIELDS),
+    'billing': ADDRESS,
+    'shipping': ADDRESS,
+    'metadata': Object({'order_note': Value('str', default='')}),
+    'quote': Value('str'),
+}, required=True, message=MISSING_ORDER_FIELDS))
+
+PRODUCT_FIELDS = {
+    'name': Value('str'),
+    'sales_price': Value('number'),
+    'description': Value('str', empty_is_none=False),
+    'discount': Value('number'),
+    'product_url': Value('str', empty_is_none=False),
+}
+
+# POST /api/product
+validate_product_create = validator(Object(dict(
+    PRODUCT_FIELDS,
+    sku=Value('str'),
+    name=Value('str', required=True, message="Missing required field: name"),
+), required=True, message="Missing required field: name"))
+
+# PUT /api/product, elementos de /api/product/bulk y del flujo NDJSON
+validate_product_update = validator(Object(dict(
+    PRODUCT_FIELDS,
+    sku=Value('str', required=True, message="Missing required field: sku"),
+), required=True, message="Missing required field: sku"))
+
+# DELETE /api/product
+validate_product_ref = validator(Object({
+    'sku': Value('str', required=True, message="Missing required field: sku"),
+}, required=True, message="Missing required field: sku"))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Monthly quote (leasing) engine.
+
+Single place for the financial formula documented in PROJECT_CONTEXT.md:
+
+    Base  = Precio Lista * 2.2
+    Cuota = (Base + (Base * Tasa * Plazo)) / Plazo
+
+The functions take plain values (no recordsets) so they can be used by the
+sale.order.line computes, the API and reports alike. The batch functions
+evaluate each distinct input once: lines of the same product and tier share
+one evaluation.
+
+The arithmetic keeps the exact evaluation order of the original per-line
+code. Folding the tier constants into one multiplier per tier would change
+the last bits of the result, so the tier table stores the operands
+(months and monthly rate) rather than a folded factor.
+"""
+from collections import namedtuple
+import logging
+
+from odoo.tools.float_utils import float_round
+
+_logger = logging.getLogger(__name__)
+
+LIST_PRICE_FACTOR = 2.2
+ANNUAL_RATE = 0.05
+DEFAULT_INSTALLMENTS = 24
+QUOTE_DIGITS = 2
+
+Tier = namedtuple('Tier', ['months', 'rate'])
+
+# Tabla de plazos: un registro por palier de cuotas
+TIERS = {months: Tier(months, ANNUAL_RATE / 12.0) for months in (12, 24, 36, 48, 60)}
+
+
+def get_tier(installments):
+    """Tier for an `installments` selection value ('24', 24, False...)."""
+    months = int(installments or DEFAULT_INSTALLMENTS)
+    return TIERS.get(months) or Tier(months, ANNUAL_RATE / 12.0)
+
+
+def warranty_uplift(amount, include_warranty, warranty_percentage):
+    if include_warranty and warranty_percentage:
+        amount += amount * (warranty_percentage / 100.0)
+    return amount
+
+
+def monthly_quote(price_unit, installments, include_warranty=False, warranty_percentage=0.0):
+    """Gross monthly quote of one unit (before discount), rounded to cents."""
+    tier = get_tier(installments)
+    total = (price_unit or 0.0) * LIST_PRICE_FACTOR
+    try:
+        base_quote = (total + (total * tier.rate * tier.months)) / tier.months
+        base_quote = warranty_uplift(base_quote, include_warranty, warranty_percentage)
+        return float_round(base_quote, precision_digits=QUOTE_DIGITS)
+    except Exception as e:
+        _logger.error("Error computing monthly quote for price %s / %s months: %s", price_unit, tier.months, e)
+        return 0.0
+
+
+def effective_quote(manual_quote, auto_quote, include_warranty=False, warranty_percentage=0.0):
+    """Final monthly quote: manual value if any, else the automatic one, plus warranty."""
+    base = manual_quote or auto_quote or 0.0
+    base = warranty_uplift(base, include_warranty, warranty_percentage)
+    return float_round(base, precision_digits=QUOTE_DIGITS)
+
+
+def unit_price(effective, price_unit):
+    """Unit price used for amounts: the monthly quote (leasing) or the list price (plain sale)."""
+    return effective if effective and effective > 0.0 else price_unit
+
+
+def reduced_price(effective, price_unit, discount):
+    """Unit price after the WooCommerce brand discount (%)."""
+    discount_factor = 1.0 - ((discount or 0.0) / 100.0)
+    return (unit_price(effective, price_unit) or 0.0) * discount_factor
+
+
+def subtotal(effective, price_unit, discount, quantity, rounding):
+    discount_factor = 1.0 - ((discount or 0.0) / 100.0)
+    amount = (unit_price(effective, price_unit) or 0.0) * discount_factor * (quantity or 0.0)
+    return float_round(amount, precision_rounding=rounding)
+
+
+def _batch(function, rows):
+    memo = {}
+    results = []
+    for row in rows:
+        row = tuple(row)
+        if row not in memo:
+            memo[row] = function(*row)
+        results.append(memo[row])
+    return results
+
+
+def monthly_quotes(rows):
+    """Batch `monthly_quote` over (price_unit, installments, include_warranty, warranty_percentage) rows."""
+    return _batch(monthly_quote, rows)
+
+
+def effective_quotes(rows):
+    """Batch `effective_quote` over (manual, auto, include_warranty, warranty_percentage) rows."""
+    return _batch(effective_quote, rows)
+
+
+def subtotals(rows):
+    """Batch `subtotal` over (effective, price_unit, discount, quantity, rounding) rows."""
+    return _batch(subtotal, rows)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Per-process caches invalidated across workers without the registry caches.
+
+`registry.clear_cache()` empties the whole 'default' ormcache (access
+rules, views, xmlids...) in every worker. A SignaledCache has its own
+PostgreSQL sequence instead: invalidating bumps the sequence after the
+commit, and every worker drops its copy the next time a transaction reads
+the cache, so only the data of this cache is reloaded.
+
+Sequences are not transactional: the version read inside a transaction
+may already count an invalidation that the transaction snapshot does not
+see, and a value computed from that snapshot would then be cached as
+current. The signal therefore stores the id of the signaling transaction,
+which starts after the invalidating one committed: when that id is below
+the xmax of the reader's snapshot, the invalidation is visible to the
+reader and its values may be cached. Otherwise they are returned without
+being cached. Signals are serialized so the stored ids only grow.
+
+The sequence is created by `create_sequence` from the `init()` of the
+model that owns the cache.
+"""
+from collections import OrderedDict
+import threading
+
+MISSING = object()
+# Serializa los avisos para que los ids guardados en las secuencias solo crezcan
+SIGNAL_LOCK = 'custom_woocommerce_api.signaled_cache'
+
+
+class SignaledCache:
+    def __init__(self, name, max_size=8192):
+        self.name = name
+        self.sequence = f'custom_woocommerce_api_{name}_signaling'
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._entries = {}   # dbname -> OrderedDict (LRU)
+        self._versions = {}  # dbname -> valor de la secuencia al llenar el caché
+
+    def create_sequence(self, cr):
+        cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {self.sequence}")
+
+    def _entries_for(self, cr):
+        """Entries of the database of `cr`, and whether values computed by `cr` may be stored.
+
+        Entries are dropped if another worker signaled a change. The
+        sequence is read once per transaction, together with the xmax of
+        the transaction snapshot.
+        """
+        dbname = cr.dbname
+        checked = cr.precommit.data.setdefault('signaled_cache.checked', {})
+        if self.name not in checked:
+            cr.execute(f"""
+                SELECT last_value, last_value < txid_snapshot_xmax(txid_current_snapshot())
+                  FROM {self.sequence}
+            """)
+            version, visible = cr.fetchone()
+            checked[self.name] = visible
+            with self._lock:
+                if self._versions.get(dbname) != version:
+                    self._versions[dbname] = version
+                    self._entries[dbname] = OrderedDict()
+        # Ni antes de ver el último aviso ni con cambios propios sin confirmar
+        storable = checked[self.name] and self not in cr.postcommit.data.get('signaled_cache.pending', ())
+        with self._lock:
+            return self._entries.setdefault(dbname, OrderedDict()), storable
+
+    def get(self, cr, key, compute):
+        """Cached value of `key`, computed by `compute()` on a miss. Returns (value, hit)."""
+        entries, storable = self._entries_for(cr)
+        with self._lock:
+            value = entries.get(key, MISSING)
+            if value is not MISSING:
+                entries.move_to_end(key)
+                return value, True
+        value = compute()
+        if storable:
+            with self._lock:
+                entries[key] = value
+                while len(entries) > self.max_size:
+                    entries.popitem(last=False)
+        return value, False
+
+    def invalidate(self, env, keys=None):
+        """Drop `keys` (all entries if None) here now and in every worker once committed."""
+        with self._lock:
+            entries = self._entries.get(env.cr.dbname)
+            if entries is not None:
+                if keys is None:
+                    entries.clear()
+                else:
+                    for key in keys:
+                        entries.pop(key, None)
+        # Un solo aviso por transacción, después del commit: un worker que leyera
+        # antes del commit volvería a guardar los valores antiguos
+        pending = env.cr.postcommit.data.setdefault('signaled_cache.pending', set())
+        if not pending:
+            registry, dbname = env.registry, env.cr.dbname
+            env.cr.postcommit.add(lambda: self._signal(registry, pending))
+            # Lo calculado dentro de una transacción deshecha tampoco vale
+            env.cr.postrollback.add(lambda: [cache._drop(dbname) for cache in pending])
+        pending.add(self)
+
+    def _drop(self, dbname):
+        with self._lock:
+            self._entries.pop(dbname, None)
+
+    @staticmethod
+    def _signal(registry, caches):
+        with registry.cursor() as cr:
+            # Esta transacción empieza tras el commit de la que invalidó: su id
+            # por debajo del xmax de un lector significa que el lector ve los cambios
+            cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [SIGNAL_LOCK])
+            for cache in caches:
+                cr.execute("SELECT setval(%s, txid_current())", [cache.sequence])
+                cache._drop(cr.dbname)